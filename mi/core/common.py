@@ -95,6 +95,52 @@ class Config(object):
     def as_dict(self):
         return self.config
     
+class BaseEnumMeta(type):
+    """
+    Metaclass of BaseEnum. Keeps the values of each enum class, worked out
+    the first time they are asked for, and forgets them when an attribute
+    of the class, or of a class it derives from, is set or deleted.
+    """
+    CACHE = '__enum_values__'
+
+    def __setattr__(cls, name, value):
+        type.__setattr__(cls, name, value)
+        if name != BaseEnumMeta.CACHE:
+            cls._clear_enum_values()
+
+    def __delattr__(cls, name):
+        type.__delattr__(cls, name)
+        cls._clear_enum_values()
+
+    def _clear_enum_values(cls):
+        classes = [cls]
+        while classes:
+            klass = classes.pop()
+            if BaseEnumMeta.CACHE in klass.__dict__:
+                type.__delattr__(klass, BaseEnumMeta.CACHE)
+            classes.extend(type.__subclasses__(klass))
+
+    def _enum_values(cls):
+        """
+        @retval (names, values, set of the hashable values, True if any
+        value isn't hashable) of the enum, in dir() order.
+        """
+        values = cls.__dict__.get(BaseEnumMeta.CACHE)
+        if values is None:
+            names = tuple(attr for attr in dir(cls) if
+                          not callable(getattr(cls, attr)) and not attr.startswith('__'))
+            items = tuple(getattr(cls, attr) for attr in names)
+            hashable = set()
+            unhashable = False
+            for item in items:
+                try:
+                    hashable.add(item)
+                except TypeError:
+                    unhashable = True
+            values = (names, items, frozenset(hashable), unhashable)
+            type.__setattr__(cls, BaseEnumMeta.CACHE, values)
+        return values
+
 class BaseEnum(object):
     """Base class for enums.
     
@@ -113,22 +159,21 @@ class BaseEnum(object):
     coupled with what the drivers can do. By putting the values here, they
     are quicker to execute and more compartmentalized so that code can be
     re-used more easily outside of a capability container as needed.
+
+    The values are found once per class, so has() is a set lookup.
     """
+    __metaclass__ = BaseEnumMeta
     
     @classmethod
     def list(cls):
         """List the values of this enum."""
-        return [getattr(cls,attr) for attr in dir(cls) if\
-                not callable(getattr(cls,attr)) and not attr.startswith('__')]
+        return list(cls._enum_values()[1])
 
     @classmethod
     def dict(cls):
         """Return a dict representation of this enum."""
-        result = {}
-        for attr in dir(cls):
-            if not callable(getattr(cls,attr)) and not attr.startswith('__'):
-                result[attr] = getattr(cls,attr)
-        return result
+        (names, items, hashable, unhashable) = cls._enum_values()
+        return dict(zip(names, items))
 
     @classmethod
     def has(cls, item):
@@ -143,7 +188,15 @@ class BaseEnum(object):
         @retval True if one of the class attributes has value item, false
         otherwise.
         """
-        return item in cls.list()
+        (names, items, hashable, unhashable) = cls._enum_values()
+        try:
+            if item in hashable:
+                return True
+        except TypeError:
+            return item in items
+
+        # An unhashable value may still equal a hashable item.
+        return unhashable and item in items
 
 class EventKey(BaseEnum):
     """Keys to the event dictionary fields as used by the InstrumentProtocol
@@ -82,6 +82,9 @@ class SampleException(InstrumentException):
 class SchedulerException(InstrumentException):
     """ An error occurred in the scheduler """
 
+class DriverLaunchException(InstrumentException):
+    """ A driver process could not be started """
+
 class UnexpectedError(InstrumentException):
     """ wrapper to send non-MI exceptions over zmq """
     def __init__ (self, msg=None):
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.async_port_agent_client
+@file mi/core/instrument/async_port_agent_client.py
+@brief Port agent client serviced by an IOLoop.
+
+PortAgentClient reads each connection on its own Listener thread and times
+heartbeats with a new threading.Timer per heartbeat. AsyncPortAgentClient
+reads from an IOLoop instead: the data socket is read when poll() reports it
+readable, heartbeats are timed with call_later, and send() queues data for
+the loop to write without blocking, so one loop thread services any number
+of connections.
+
+loop = IOLoop()
+loop.start()
+client = AsyncPortAgentClient(host, port, cmd_port, loop=loop)
+client.init_comms(protocol.got_data, protocol.got_raw, got_exception,
+                  heartbeat=10)
+client.send('ds\r\n').result(timeout=10)
+
+Callbacks run on the loop thread. Connecting to the port agent and sending
+port agent commands still block, briefly, as they do in PortAgentClient.
+"""
+
+__license__ = 'Apache 2.0'
+
+import socket
+import errno
+from collections import deque
+
+from mi.core.exceptions import InstrumentConnectionException
+from mi.core.instrument.io_loop import IOLoop
+from mi.core.instrument.io_loop import Future
+from mi.core.instrument.port_agent_client import PortAgentClient
+from mi.core.instrument.port_agent_client import PacketReceiver
+
+from mi.core.log import get_logger
+log = get_logger()
+
+class AsyncListener(PacketReceiver):
+    """
+    Receives packets from the port agent whenever the loop finds the socket
+    readable. Everything but start() runs on the loop thread.
+    """
+    def __init__(self, loop, sock, delim = None, heartbeat = 0,
+                 max_missed_heartbeats = None,
+                 callback_data = None, callback_raw = None,
+                 callback_error = None, verify_checksum = True):
+        """
+        @param loop The IOLoop to read on.
+        Other parameters as for PacketReceiver.
+        """
+        PacketReceiver.__init__(self, sock, delim, heartbeat, max_missed_heartbeats,
+                                callback_data, callback_raw, callback_error,
+                                verify_checksum)
+        self.loop = loop
+        self._reading = False
+
+    def start(self):
+        """
+        Start reading the socket. May be called from any thread.
+        """
+        self.loop.call_soon_threadsafe(self._start)
+
+    def _start(self):
+        if self._done:
+            return
+        log.info('Async port agent listener started.')
+        self.loop.add_reader(self.sock, self._on_readable)
+        self._reading = True
+        if self.heartbeat:
+            self.start_heartbeat_timer()
+
+    def is_alive(self):
+        return self._reading
+
+    def start_heartbeat_timer(self):
+        if self.heartbeat_timer:
+            self.heartbeat_timer.cancel()
+        self.heartbeat_timer = self.loop.call_later(self.heartbeat, self.heartbeat_timeout)
+
+    def done(self):
+        """
+        Stop reading the socket and timing heartbeats. Safe to call more
+        than once; the socket's descriptor may already belong to a new
+        connection by the second call.
+        """
+        self._done = True
+        if self.heartbeat_timer:
+            self.heartbeat_timer.cancel()
+            self.heartbeat_timer = None
+        if self._reading:
+            self._reading = False
+            self.loop.remove_reader(self.sock)
+            log.info('Async port agent listener done listening.')
+
+    def _on_readable(self):
+        try:
+            self.receive()
+        except socket.error as e:
+            if e.errno != errno.EWOULDBLOCK:
+                errorString = 'Socket error while receiving from port agent: %r' % (e)
+                log.error(errorString)
+                self.done()
+                self.callback_error(errorString)
+
+        if self._done:
+            self.done()
+
+class AsyncPortAgentClient(PortAgentClient):
+    """
+    Port agent client reading and writing its data socket from an IOLoop.
+    """
+    def __init__(self, host, port, cmd_port, delim=None, loop=None):
+        """
+        @param loop The IOLoop to service the connection, by default a new
+        one started here.
+        """
+        PortAgentClient.__init__(self, host, port, cmd_port, delim)
+        if loop is None:
+            loop = IOLoop()
+            loop.start()
+        self.loop = loop
+
+        # [data left to send, future, bytes in all] for each send
+        self._write_queue = deque()
+        self._writing = False
+
+    def _in_loop(self, callback, *args):
+        """
+        Run callback on the loop thread, waiting for it from others.
+        """
+        if self.loop.in_loop_thread():
+            return callback(*args)
+        return self.loop.submit(callback, *args).result()
+
+    def init_comms(self, user_callback_data = None, user_callback_raw = None,
+                   user_callback_error = None, heartbeat = 0,
+                   max_missed_heartbeats = None):
+        """
+        Connect to the port agent and start reading on the loop.
+        """
+        self._in_loop(PortAgentClient.init_comms, self, user_callback_data,
+                      user_callback_raw, user_callback_error, heartbeat,
+                      max_missed_heartbeats)
+
+    def _create_listener(self):
+        return AsyncListener(self.loop, self.sock, self.delim,
+                             self.heartbeat, self.max_missed_heartbeats,
+                             self.callback_data,
+                             self.callback_raw,
+                             self.callback_error)
+
+    def _recover_later(self, errorString):
+        """
+        Attempt recovery after RECOVERY_SLEEP_TIME without holding up the
+        loop.
+        """
+        self.loop.call_later(self.RECOVERY_SLEEP_TIME, self.callback_error, errorString)
+
+    def destroy_connection(self):
+        if self.listener_thread:
+            self.listener_thread.done()
+        self._fail_writes(InstrumentConnectionException('Port agent connection closed.'))
+        PortAgentClient.destroy_connection(self)
+
+    def stop_comms(self):
+        """
+        Stop reading and close the data socket.
+        """
+        log.info('Logger shutting down comms.')
+        self._in_loop(self.destroy_connection)
+        log.info('Port Agent Client stopped.')
+
+    def send(self, data, sock = None):
+        """
+        Queue data to be written to the port agent from the loop. Sends to
+        another socket, such as the command port, are written straight away
+        as PortAgentClient does.
+        @retval Future for the number of bytes sent, once all of them have
+        been.
+        """
+        if sock:
+            return PortAgentClient.send(self, data, sock)
+
+        future = Future()
+        self.loop.call_soon_threadsafe(self._queue_write, data, future)
+        return future
+
+    def _queue_write(self, data, future):
+        if not self.sock:
+            error_string = 'No socket defined!'
+            log.error(error_string)
+            future.set_exception(InstrumentConnectionException(error_string))
+            self.callback_error(error_string)
+            return
+
+        self._write_queue.append([data, future, len(data)])
+        if not self._writing:
+            self._write()
+
+    def _write(self):
+        """
+        Write queued data until the socket would block, then wait for it to
+        be writable again.
+        """
+        while self._write_queue:
+            entry = self._write_queue[0]
+            try:
+                sent = self.sock.send(entry[0])
+            except socket.error as e:
+                if e.errno == errno.EWOULDBLOCK:
+                    if not self._writing:
+                        self._writing = True
+                        self.loop.add_writer(self.sock, self._write)
+                    return
+                error_string = 'Socket error while sending to %s:%s: %r' % (self.host, self.port, e)
+                log.error(error_string)
+                self._fail_writes(InstrumentConnectionException(error_string))
+                self.callback_error(error_string)
+                return
+
+            entry[0] = entry[0][sent:]
+            if not entry[0]:
+                self._write_queue.popleft()
+                entry[1].set_result(entry[2])
+
+        if self._writing:
+            self._writing = False
+            self.loop.remove_writer(self.sock)
+
+    def _fail_writes(self, exception):
+        if self._writing:
+            self._writing = False
+            self.loop.remove_writer(self.sock)
+        while self._write_queue:
+            self._write_queue.popleft()[1].set_exception(exception)
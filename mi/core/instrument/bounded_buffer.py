@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.bounded_buffer
+@file mi/core/instrument/bounded_buffer.py
+@brief String buffer with a size limit that drops its oldest data.
+"""
+
+__license__ = 'Apache 2.0'
+
+from collections import deque
+
+from mi.core.exceptions import InstrumentParameterException
+
+# Default limit for the protocol line and prompt buffers.
+DEFAULT_BUFFER_SIZE = 1048576
+
+class BoundedBuffer(object):
+    """
+    Buffer for data read from an instrument holding at most max_size bytes.
+    Once it is full, the oldest bytes are dropped to make room for new ones.
+
+    Appended strings are kept as they are and only joined when the contents
+    are read. Appending never copies what is already buffered, and dropping
+    only moves an offset into the oldest string.
+    """
+    def __init__(self, max_size=DEFAULT_BUFFER_SIZE):
+        """
+        @param max_size the most bytes to hold
+        @raise InstrumentParameterException if max_size isn't a positive int
+        """
+        self._pieces = deque()
+
+        # Bytes of the first piece that have been dropped.
+        self._head = 0
+
+        self._size = 0
+        self._bytes_dropped = 0
+        self._max_size = None
+
+        self.max_size = max_size
+
+    def __len__(self):
+        return self._size
+
+    def _get_max_size(self):
+        return self._max_size
+
+    def _set_max_size(self, max_size):
+        if not isinstance(max_size, (int, long)) or max_size <= 0:
+            raise InstrumentParameterException("Invalid buffer size: %s" % max_size)
+
+        self._max_size = max_size
+        self._trim()
+
+    max_size = property(_get_max_size, _set_max_size)
+
+    @property
+    def bytes_dropped(self):
+        """
+        @retval bytes dropped to keep under max_size since the buffer was
+        created. Clearing the buffer doesn't count.
+        """
+        return self._bytes_dropped
+
+    def append(self, data):
+        """
+        Add data to the end of the buffer, dropping the oldest bytes if it
+        goes over max_size.
+        @param data string to add
+        @retval number of bytes dropped
+        """
+        if not data:
+            return 0
+
+        self._pieces.append(data)
+        self._size += len(data)
+
+        return self._trim()
+
+    def _trim(self):
+        """
+        Drop the oldest bytes until the buffer fits in max_size.
+        @retval number of bytes dropped
+        """
+        count = self._size - self._max_size
+        if count <= 0:
+            return 0
+
+        self._size -= count
+        self._bytes_dropped += count
+
+        head = self._head + count
+        while head >= len(self._pieces[0]):
+            head -= len(self._pieces.popleft())
+        self._head = head
+
+        return count
+
+    def clear(self):
+        """
+        Empty the buffer.
+        """
+        self._pieces.clear()
+        self._head = 0
+        self._size = 0
+
+    def getvalue(self, start=0):
+        """
+        Return the buffered data.
+        @param start offset to start from; only the pieces from there to
+        the end are joined.
+        @retval string of the buffer contents from start
+        """
+        if start <= 0:
+            if self._head or len(self._pieces) > 1:
+                value = ''.join(self._pieces)[self._head:]
+                self._pieces.clear()
+                self._pieces.append(value)
+                self._head = 0
+
+            if self._pieces:
+                return self._pieces[0]
+            return ''
+
+        # Collect pieces from the end back to start.
+        wanted = self._size - start
+        if wanted <= 0:
+            return ''
+
+        pieces = []
+        size = 0
+        for piece in reversed(self._pieces):
+            pieces.append(piece)
+            size += len(piece)
+            if size >= wanted:
+                break
+
+        pieces.reverse()
+        return ''.join(pieces)[size - wanted:]
@@ -11,9 +11,15 @@
 __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
+import re
+import sre_parse
+import sre_constants
+from collections import deque
+
 from mi.core.log import get_logger ; log = get_logger()
 
 from mi.core.exceptions import SampleException
+from mi.core.exceptions import NotImplementedException
 
 class Chunker(object):
     """
@@ -38,7 +44,9 @@ class Chunker(object):
             buffer[start_index:end_index] to properly describe the data block.
             If no data is present, return and empty list. If multiple data
             blocks are found, the returned list will contain multiple tuples,
-            IN SEQUENTIAL ORDER and WITHOUT OVERLAP.
+            IN SEQUENTIAL ORDER and WITHOUT OVERLAP. A tuple can also be
+            (start_index, end_index, SieveMatch) to tag the block with the
+            match that found it, see get_next_tagged_data.
         """
         self.sieve = data_sieve_fn
         
@@ -133,7 +141,8 @@ class Chunker(object):
         """
         log.debug("Generating data lists with start index %s", start_index)
         return_list = {'data_chunk_list':[], 'non_data_chunk_list':[]}
-        result = self.sieve(self.buffer[start_index:])
+        # drop any tags, this chunker doesn't carry them
+        result = [block[:2] for block in self.sieve(self.buffer[start_index:])]
         # assert no overlap!
         if (self.overlaps(result)):
             raise SampleException("Overlapping blocks in sieve list: %s" % result)
@@ -261,6 +270,18 @@ class Chunker(object):
                                                              next_end)
                 
         return (timestamp, next_block)
+
+    def get_next_tagged_data(self, clean=True):
+        """
+        Get the next chunk of data along with the SieveMatch the sieve tagged
+        it with. This chunker doesn't keep tags so the match is always None.
+
+        @param clean As in get_next_data
+        @return A tuple of (timestamp, data_chunk, match), (None, None, None)
+            if no data
+        """
+        (timestamp, next_block) = self.get_next_data(clean)
+        return (timestamp, next_block, None)
     
     def _clean_chunk_list(self, list, end_index):
         """
@@ -410,4 +431,1017 @@ class BinaryChunker(Chunker):
     def __init__(self, data_sieve_fn):
         Chunker.__init__(self, data_sieve_fn)
         self.buffer = []
-    
\ No newline at end of file
+    
+
+class SieveMatch(object):
+    """
+    The match a sieve found for a data block, carried through the chunker so
+    the block doesn't have to be matched again to be parsed. It acts like
+    an re match object for the pattern that matched, with group spans
+    relative to the block and group values taken from the block returned by
+    the chunker.
+    """
+    def __init__(self, particle_class, pattern, regs):
+        """
+        @param particle_class The particle class for the block, None if it
+            isn't a particle
+        @param pattern The compiled regex that matched, None if the sieve
+            isn't regex based
+        @param regs A tuple of (start, end) spans relative to the start of
+            the block for the whole match and each group of the pattern,
+            (-1, -1) for groups that didn't participate
+        """
+        self.particle_class = particle_class
+        self.re = pattern
+        self.regs = regs
+        # set by the chunker when the block is handed out
+        self.string = None
+
+    @staticmethod
+    def from_match(particle_class, match, pattern=None, offset=0):
+        """
+        Build from a match object.
+        @param particle_class The particle class for the block
+        @param match The match object
+        @param pattern The compiled regex for the part of the match that
+            counts, defaults to match.re
+        @param offset The group in match holding the whole match of pattern,
+            for matches of a combined regex
+        """
+        if pattern is None:
+            pattern = match.re
+
+        base = match.start(offset)
+        regs = tuple([(s - base, e - base) if s >= 0 else (-1, -1)
+                      for (s, e) in match.regs[offset:offset + pattern.groups + 1]])
+        return SieveMatch(particle_class, pattern, regs)
+
+    def _index(self, group):
+        if isinstance(group, basestring):
+            if self.re is None or group not in self.re.groupindex:
+                raise IndexError("no such group")
+            return self.re.groupindex[group]
+        if group < 0 or group >= len(self.regs):
+            raise IndexError("no such group")
+        return group
+
+    def _group(self, group, default=None):
+        (s, e) = self.regs[self._index(group)]
+        if s < 0:
+            return default
+        return self.string[s:e]
+
+    def group(self, *groups):
+        if not groups:
+            return self._group(0)
+        if len(groups) == 1:
+            return self._group(groups[0])
+        return tuple([self._group(g) for g in groups])
+
+    def groups(self, default=None):
+        return tuple([self._group(g, default) for g in range(1, len(self.regs))])
+
+    def groupdict(self, default=None):
+        if self.re is None:
+            return {}
+        return dict([(name, self._group(index, default))
+                     for (name, index) in self.re.groupindex.items()])
+
+    def start(self, group=0):
+        return self.regs[self._index(group)][0]
+
+    def end(self, group=0):
+        return self.regs[self._index(group)][1]
+
+    def span(self, group=0):
+        return self.regs[self._index(group)]
+
+
+class IncrementalSieve(object):
+    """
+    Base class for sieves that carry scanner state from one call to the next
+    so a chunker only has to show them the bytes appended since the last
+    call. Without this a record that arrives a few bytes at a time is
+    rescanned from its first byte on every packet.
+
+    The chunker keeps a scan origin, the end of the last data block found.
+    Every call gets the same origin and the state returned by the previous
+    call until a data block is found or the origin is consumed, at which
+    point the scan starts fresh with a state of None.
+    """
+    def scan(self, data, start, resume, state):
+        """
+        Look for data blocks from the scan origin to the end of the buffer.
+
+        @param data The chunker buffer. Only data[start:] belongs to this
+            scan, and it must be treated as read only.
+        @param start The index in data of the scan origin
+        @param resume The offset from start of the first byte not seen by the
+            previous call, 0 on a fresh scan
+        @param state What the previous call returned, None on a fresh scan
+        @retval A tuple of (block_list, state). block_list is a list of
+            (start_index, end_index) or (start_index, end_index, SieveMatch)
+            tuples relative to start, as returned by a sieve function. The state is handed back on the next call. It
+            must only hold offsets relative to start since the buffer can be
+            compacted between calls.
+        """
+        raise NotImplementedException("scan() not implemented")
+
+
+class FunctionSieve(IncrementalSieve):
+    """
+    Adapts a plain sieve function to the incremental sieve interface. The
+    function is handed everything from the scan origin on every call, just
+    as with the Chunker.
+    """
+    def __init__(self, sieve_fn, convert=None):
+        """
+        @param sieve_fn A stateless sieve function as described in Chunker
+        @param convert Optional function to convert the buffer slice into the
+            type the sieve function expects, like str
+        """
+        self._sieve_fn = sieve_fn
+        self._convert = convert
+
+    def scan(self, data, start, resume, state):
+        block = data[start:]
+        if self._convert:
+            block = self._convert(block)
+        return (self._sieve_fn(block), None)
+
+
+class MarkerSieve(IncrementalSieve):
+    """
+    An incremental sieve for records framed by a start and end marker, such
+    as "wave: start time =" ... "wave: end burst\\r\\n". Blocks run from the
+    start marker through the end marker. Each byte is looked at about once
+    no matter how many packets a record is split across.
+    """
+    def __init__(self, start_marker, end_marker):
+        """
+        @param start_marker The string a record starts with
+        @param end_marker The string a record ends with
+        """
+        self._start_marker = start_marker
+        self._end_marker = end_marker
+
+    def scan(self, data, start, resume, state):
+        """
+        The state is a tuple of (record_start, search_index). record_start is
+        where the record we are in started, or None if we are looking for a
+        start marker. search_index is where to pick up the search.
+        """
+        if state is None:
+            (record_start, index) = (None, start)
+        else:
+            (record_start, index) = state
+            index += start
+            if record_start is not None:
+                record_start += start
+
+        block_list = []
+        while True:
+            if record_start is None:
+                marker = self._start_marker
+            else:
+                marker = self._end_marker
+
+            found = data.find(marker, index)
+            if found < 0:
+                # a marker could still be split across the end of the buffer
+                index = max(index, len(data) - len(marker) + 1)
+                break
+
+            index = found + len(marker)
+            if record_start is None:
+                record_start = found
+            else:
+                block_list.append((record_start - start, index - start))
+                record_start = None
+
+        if record_start is not None:
+            record_start -= start
+
+        return (block_list, (record_start, index - start))
+
+
+# Python's re module only allows 100 groups in a pattern
+MAX_PATTERN_GROUPS = 99
+
+# Global flags at the start of a pattern, e.g. "(?s)"
+INLINE_FLAGS_REGEX = re.compile(r'^\(\?[iLmsux]+\)')
+
+def _embeddable_pattern(pattern, rewrite_dot):
+    """
+    Prepare a regex so it can be wrapped in a group and joined with other
+    patterns. Leading inline flags are dropped (they are carried in the
+    compiled flags) and, if the combined pattern is compiled with DOTALL
+    but this one wasn't, "." is rewritten to not match newlines.
+
+    @param pattern The regex string
+    @param rewrite_dot True to rewrite "." outside of character classes
+    @retval A tuple of (pattern, has_backref). has_backref is True if the
+        pattern uses numbered back references, which break when the pattern
+        is wrapped.
+    """
+    pattern = INLINE_FLAGS_REGEX.sub('', pattern, 1)
+
+    result = []
+    has_backref = False
+    in_class = False
+    class_first = 0
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            if not in_class and pattern[i+1:i+2] in list('123456789'):
+                has_backref = True
+            result.append(pattern[i:i+2])
+            i += 2
+            continue
+
+        if in_class:
+            if c == ']' and i > class_first:
+                in_class = False
+        elif c == '[':
+            in_class = True
+            class_first = i + 1
+            if pattern[class_first:class_first+1] == '^':
+                class_first += 1
+        elif c == '.' and rewrite_dot:
+            c = '[^\\n]'
+
+        result.append(c)
+        i += 1
+
+    return (''.join(result), has_backref)
+
+
+# Zero width assertions that only look at data before the current position
+BACKWARD_AT_CODES = (sre_constants.AT_BEGINNING, sre_constants.AT_BEGINNING_STRING)
+
+# Character categories that include a newline
+NEWLINE_CATEGORIES = (sre_constants.CATEGORY_SPACE, sre_constants.CATEGORY_NOT_DIGIT,
+                      sre_constants.CATEGORY_NOT_WORD, sre_constants.CATEGORY_LINEBREAK)
+
+def _flatten_groups(items):
+    """
+    @param items parsed regex items
+    @retval The items with the contents of groups spliced in their place
+    """
+    result = []
+    for (op, av) in items:
+        if op == sre_constants.SUBPATTERN:
+            result.extend(_flatten_groups(av[1]))
+        else:
+            result.append((op, av))
+    return result
+
+def _looks_ahead(items):
+    """
+    @retval True if matching the items can look past the end of the match,
+        so a match can depend on data that hasn't arrived yet
+    """
+    for (op, av) in items:
+        if op == sre_constants.AT:
+            if av not in BACKWARD_AT_CODES:
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            (direction, sub) = av
+            if direction > 0 or _looks_ahead(sub):
+                return True
+        elif op == sre_constants.SUBPATTERN:
+            if _looks_ahead(av[1]):
+                return True
+        elif op in (sre_constants.MIN_REPEAT, sre_constants.MAX_REPEAT):
+            if _looks_ahead(av[2]):
+                return True
+        elif op == sre_constants.BRANCH:
+            if [sub for sub in av[1] if _looks_ahead(sub)]:
+                return True
+        elif op == sre_constants.GROUPREF_EXISTS:
+            return True
+    return False
+
+def _matches_newline(items, dotall):
+    """
+    @retval True if any of the items can match a newline
+    """
+    newline = ord('\n')
+    for (op, av) in items:
+        if op == sre_constants.LITERAL:
+            found = av == newline
+        elif op == sre_constants.NOT_LITERAL:
+            found = av != newline
+        elif op == sre_constants.ANY:
+            found = dotall
+        elif op == sre_constants.IN:
+            found = False
+            negate = False
+            for (set_op, set_av) in av:
+                if set_op == sre_constants.NEGATE:
+                    negate = True
+                elif set_op == sre_constants.LITERAL:
+                    found = found or set_av == newline
+                elif set_op == sre_constants.RANGE:
+                    found = found or set_av[0] <= newline <= set_av[1]
+                elif set_op == sre_constants.CATEGORY:
+                    found = found or set_av in NEWLINE_CATEGORIES
+                else:
+                    found = True
+            found = found != negate
+        elif op == sre_constants.SUBPATTERN:
+            found = _matches_newline(av[1], dotall)
+        elif op in (sre_constants.MIN_REPEAT, sre_constants.MAX_REPEAT):
+            found = _matches_newline(av[2], dotall)
+        elif op == sre_constants.BRANCH:
+            found = bool([sub for sub in av[1] if _matches_newline(sub, dotall)])
+        elif op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            found = False
+        else:
+            found = True
+
+        if found:
+            return True
+    return False
+
+def _uses_groupref(items):
+    """
+    @retval True if the items use a back reference, which the width of a
+        parsed pattern doesn't count
+    """
+    for (op, av) in items:
+        if op == sre_constants.GROUPREF:
+            return True
+        elif op == sre_constants.SUBPATTERN:
+            if _uses_groupref(av[1]):
+                return True
+        elif op in (sre_constants.MIN_REPEAT, sre_constants.MAX_REPEAT):
+            if _uses_groupref(av[2]):
+                return True
+        elif op == sre_constants.BRANCH:
+            if [sub for sub in av[1] if _uses_groupref(sub)]:
+                return True
+    return False
+
+def _pattern_frame(pattern):
+    """
+    Work out what bounds where a match of a pattern can start, so a scan
+    can pick up near the end of the data it has already seen.
+
+    @param pattern A compiled regex
+    @retval None if a match can depend on data past its end, otherwise a
+        tuple of (prefix, suffix, max_width, single_line). prefix and suffix
+        are the literal strings every match starts and ends with, or None.
+        max_width is the longest a match can be, or None if unbounded.
+        single_line is True if a match can only hold a newline as its last
+        character.
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except (sre_constants.error, OverflowError, RuntimeError):
+        return None
+
+    if _looks_ahead(parsed.data):
+        return None
+
+    items = _flatten_groups(parsed.data)
+
+    # Only ASCII literals, which are the same bytes in the buffer
+    prefix = []
+    for (op, av) in items:
+        if op != sre_constants.LITERAL or av > 127:
+            break
+        prefix.append(chr(av))
+
+    suffix = []
+    for (op, av) in reversed(items[len(prefix):]):
+        if op != sre_constants.LITERAL or av > 127:
+            break
+        suffix.insert(0, chr(av))
+
+    max_width = parsed.getwidth()[1]
+    if max_width >= sre_constants.MAXREPEAT or _uses_groupref(parsed.data):
+        max_width = None
+
+    body = items[:len(items) - len(suffix)]
+    single_line = not _matches_newline(body, bool(pattern.flags & re.DOTALL)) and \
+                  '\n' not in suffix[:-1]
+
+    if pattern.flags & re.IGNORECASE:
+        # Literals can't be searched for as they are
+        (prefix, suffix) = ([], [])
+
+    return (''.join(prefix) or None, ''.join(suffix) or None, max_width, single_line)
+
+
+class PatternSieve(IncrementalSieve):
+    """
+    A sieve built from a list of (particle_class, pattern) pairs. The
+    patterns are compiled once into a single alternation so the buffer is
+    walked in one pass no matter how many sample types an instrument
+    emits. Blocks come back non-overlapping and can be tagged with the
+    particle class whose pattern matched.
+
+    At any position the first pattern in the list that matches wins, so
+    list more specific patterns first. Patterns whose flags (other than
+    DOTALL) differ, or that use numbered back references, can't share an
+    alternation and are scanned separately.
+
+    As an incremental sieve it picks up where a new match could still
+    start instead of rescanning from the origin. Each pattern is bounded
+    by the literal it must start with, the literal it must end with, its
+    width, and whether a match can only span one line. A record arriving a
+    packet at a time is then not rescanned until its end could be there.
+    Patterns that look ahead past their match are always rescanned from
+    the origin.
+
+    An instance can be used anywhere a sieve function is expected.
+    """
+    def __init__(self, pattern_list):
+        """
+        @param pattern_list A list of (particle_class, pattern) tuples where
+            pattern is a regex string or a compiled regex
+        """
+        # list of (compiled regex, {wrapper group index: (particle_class, pattern, group offset)})
+        self._scanners = []
+
+        buckets = []
+        for (particle_class, pattern) in pattern_list:
+            if isinstance(pattern, basestring):
+                pattern = re.compile(pattern)
+
+            key = pattern.flags & ~re.DOTALL
+            for bucket in buckets:
+                if bucket[0] == key:
+                    bucket[1].append((particle_class, pattern))
+                    break
+            else:
+                buckets.append((key, [(particle_class, pattern)]))
+
+        for (key, entries) in buckets:
+            flags = key
+            if [p for (c, p) in entries if p.flags & re.DOTALL]:
+                flags |= re.DOTALL
+            self._build_scanners(entries, flags)
+
+        self._frames = []
+        for (key, entries) in buckets:
+            self._frames.extend([_pattern_frame(p) for (c, p) in entries])
+
+    def _build_scanners(self, entries, flags):
+        """
+        Join patterns that share flags into as few alternations as the group
+        limit allows.
+        @param entries list of (particle_class, compiled pattern)
+        @param flags the flags to compile the alternations with
+        """
+        alternatives = []
+        index = {}
+        group_count = 0
+
+        for (particle_class, pattern) in entries:
+            rewrite_dot = bool(flags & re.DOTALL) and not pattern.flags & re.DOTALL
+            (text, has_backref) = _embeddable_pattern(pattern.pattern, rewrite_dot)
+
+            if has_backref:
+                # Numbering can't be shifted, so it gets a scanner to itself
+                self._scanners.append((re.compile(text, flags),
+                                       {None: (particle_class, pattern, 0)}))
+                continue
+
+            if group_count + pattern.groups + 1 > MAX_PATTERN_GROUPS:
+                self._add_scanner(alternatives, index, flags)
+                (alternatives, index, group_count) = ([], {}, 0)
+
+            if flags & re.VERBOSE:
+                text += '\n'
+
+            group_count += 1
+            index[group_count] = (particle_class, pattern, group_count)
+            alternatives.append('(%s)' % text)
+            group_count += pattern.groups
+
+        self._add_scanner(alternatives, index, flags)
+
+    def _add_scanner(self, alternatives, index, flags):
+        if alternatives:
+            self._scanners.append((re.compile('|'.join(alternatives), flags), index))
+
+    def _matches(self, data, start=0):
+        """
+        Walk the data and find non-overlapping matches.
+        @param data The string or bytearray to search
+        @param start The index to start searching from
+        @retval A list of (match, particle_class, pattern, group offset)
+            tuples in order of appearance
+        """
+        result = []
+        for (order, (regex, index)) in enumerate(self._scanners):
+            for match in regex.finditer(data, start):
+                if match.end() == match.start():
+                    continue
+                (particle_class, pattern, offset) = index.get(match.lastindex) or index[None]
+                result.append((match.start(), order, match, particle_class, pattern, offset))
+
+        if len(self._scanners) > 1:
+            result.sort()
+            filtered = []
+            last_end = start
+            for item in result:
+                if item[0] >= last_end:
+                    filtered.append(item)
+                    last_end = item[2].end()
+            result = filtered
+
+        return [(match, particle_class, pattern, offset)
+                for (s, order, match, particle_class, pattern, offset) in result]
+
+    def __call__(self, raw_data):
+        """
+        Sieve function interface
+        @param raw_data The data to search
+        @retval A list of (start, end) tuples
+        """
+        return [match.span() for (match, particle_class, pattern, offset)
+                in self._matches(raw_data)]
+
+    def tagged_sieve(self, raw_data):
+        """
+        Find the blocks in some data along with the class that matched them
+        @param raw_data The data to search
+        @retval A list of (start, end, particle_class) tuples
+        """
+        return [(match.start(), match.end(), particle_class)
+                for (match, particle_class, pattern, offset) in self._matches(raw_data)]
+
+    def scan(self, data, start, resume, state):
+        """
+        Incremental sieve interface. The buffer is searched in place, and
+        blocks are tagged with a SieveMatch for the pattern that found them.
+
+        After a scan that found nothing, no match can lie wholly in the data
+        already seen, so a new one has to end in the new bytes. The search
+        starts at the earliest place one could still begin, or is skipped.
+        The state holds, for each pattern, where its prefix was first seen
+        relative to start, or None.
+        """
+        if state is None:
+            (seen, prefixes) = (start, [None] * len(self._frames))
+        else:
+            (seen, prefixes) = (start + resume, list(state))
+
+        for (i, frame) in enumerate(self._frames):
+            if frame is not None and frame[0] is not None and prefixes[i] is None:
+                (prefix, suffix, max_width, single_line) = frame
+                found = data.find(prefix, max(start, seen - len(prefix) + 1))
+                if found >= 0:
+                    prefixes[i] = found - start
+
+        if state is None:
+            index = start
+        else:
+            index = min([self._resume_index(frame, prefix, data, start, seen)
+                         for (frame, prefix) in zip(self._frames, prefixes)] + [len(data)])
+
+        matches = []
+        if index < len(data):
+            matches = self._matches(data, index)
+        if not matches:
+            return ([], tuple(prefixes))
+
+        return ([(match.start() - start, match.end() - start,
+                  SieveMatch.from_match(particle_class, match, pattern, offset))
+                 for (match, particle_class, pattern, offset) in matches],
+                None)
+
+    @staticmethod
+    def _resume_index(frame, prefix_start, data, start, seen):
+        """
+        @param frame The _pattern_frame of a pattern
+        @param prefix_start Where the pattern's prefix was first seen,
+            relative to start, or None
+        @param data The buffer
+        @param start The index in data of the scan origin
+        @param seen The index in data of the first byte not yet scanned
+        @retval The earliest index in data a new match of the pattern can
+            start at, len(data) if there can't be one
+        """
+        if frame is None:
+            return start
+
+        (prefix, suffix, max_width, single_line) = frame
+        if suffix is not None and \
+           data.find(suffix, max(start, seen - len(suffix) + 1)) < 0:
+            return len(data)
+
+        index = start
+        if max_width is not None:
+            index = max(index, seen - max_width + 1)
+        if single_line:
+            index = max(index, data.rfind('\n', start, seen) + 1)
+
+        if prefix is not None:
+            if prefix_start is None:
+                return len(data)
+            if start + prefix_start < index:
+                found = data.find(prefix, index)
+                if found < 0:
+                    return len(data)
+                return found
+            return start + prefix_start
+
+        return index
+
+
+class RingBufferChunker(Chunker):
+    """
+    A chunker that keeps its data in a growable bytearray with a moving base
+    offset instead of rebuilding the buffer on every add. The index lists
+    are deques of (start, end, timestamp) tuples in absolute stream offsets,
+    so appending a packet and popping a chunk off the front are amortized
+    O(1) no matter how much data is waiting. Consumed bytes are compacted
+    away once they make up half of the buffer, so memory stays bounded as
+    long as chunks are being drained.
+
+    The sieve can be a plain sieve function or an IncrementalSieve, in which
+    case only the bytes added since the last packet need to be scanned.
+    SieveMatch tags on data blocks are kept and handed back by
+    get_next_tagged_data.
+
+    This is a drop in for StringChunker/BinaryChunker with one deliberate
+    difference: get_next_raw only drops the data chunks that the raw block
+    overlaps (the unconsumed tail of such a chunk becomes non-data) instead
+    of clearing out unrelated data chunks further down the buffer.
+    """
+    # Don't bother compacting until at least this many bytes are consumed
+    COMPACT_THRESHOLD = 4096
+
+    def __init__(self, data_sieve_fn):
+        """
+        Initialize the buffer and indexing structures.
+        @param data_sieve_fn A sieve function as described in Chunker, or an
+            IncrementalSieve
+        """
+        self.sieve = data_sieve_fn
+
+        if isinstance(data_sieve_fn, IncrementalSieve):
+            self._scanner = data_sieve_fn
+        else:
+            self._scanner = FunctionSieve(data_sieve_fn, self._convert)
+
+        # Absolute offsets of where the current scan started and how far it
+        # has seen, plus the state the scanner handed back.
+        self._scan_origin = None
+        self._scan_resume = None
+        self._scan_state = None
+
+        self.raw_chunk_list = deque()
+        self.data_chunk_list = deque()
+        self.nondata_chunk_list = deque()
+
+        # SieveMatch tags keyed by the absolute start of their data chunk
+        self._data_tags = {}
+
+        self._buffer = bytearray()
+
+        # Absolute stream offset of self._buffer[0]
+        self._base = 0
+
+        # Index into self._buffer of the first byte not yet consumed
+        self._head = 0
+
+    @property
+    def buffer(self):
+        """
+        The unconsumed contents of the buffer
+        """
+        return self._block(self._start(), self._end())
+
+    def _start(self):
+        """
+        @retval absolute offset of the first unconsumed byte
+        """
+        return self._base + self._head
+
+    def _end(self):
+        """
+        @retval absolute offset one past the last byte in the buffer
+        """
+        return self._base + len(self._buffer)
+
+    def _block(self, start, end):
+        """
+        Extract a block from the buffer in the format returned to the caller.
+        @param start absolute offset of the first byte
+        @param end absolute offset one past the last byte
+        """
+        return self._convert(self._buffer[start - self._base:end - self._base])
+
+    @staticmethod
+    def _convert(data):
+        """
+        Convert a slice of the bytearray into the format handed to sieve
+        functions and returned to the caller. Overridden by subclasses.
+        """
+        return data
+
+    def add_chunk(self, raw_data, timestamp):
+        """
+        Adds a chunk of data to the end of the buffer, includes the new indices
+        in the raw_chunk_list and sieves out any new data and non-data blocks.
+
+        @param raw_data The bunch of raw data as a string or sequence of bytes
+        @param timestamp The time (in NTP4 float format) that the data was
+            collected at the port agent
+        """
+        assert isinstance(timestamp, float)
+
+        if self.data_chunk_list:
+            last_data_index = self.data_chunk_list[-1][1]
+        else:
+            last_data_index = self._start()
+
+        start_index = self._end()
+        self._buffer.extend(raw_data)
+        self.raw_chunk_list.append((start_index, self._end(), timestamp))
+
+        (data_list, nondata_list) = self._sieve_buffer(timestamp, last_data_index)
+
+        for (s, e, t, tag) in data_list:
+            self.data_chunk_list.append((s, e, t))
+            if tag is not None:
+                self._data_tags[s] = tag
+
+            # remove first fragment part from non-data if we completed a
+            # fragment. Those can only be past the last data chunk.
+            tail = []
+            while self.nondata_chunk_list and \
+                  self.nondata_chunk_list[-1][0] >= last_data_index:
+                tail.append(self.nondata_chunk_list.pop())
+            tail.reverse()
+            self.nondata_chunk_list.extend([n for n in tail if n[0] != s])
+
+        # splice non-data blocks in, combining with the trailing block as
+        # needed
+        if nondata_list:
+            (first_new_s, first_new_e, first_new_t) = nondata_list[0]
+
+            merged = None
+            while self.nondata_chunk_list and \
+                  self.nondata_chunk_list[-1][1] >= first_new_s:
+                merged = self.nondata_chunk_list.pop()
+
+            if merged is not None:
+                self.nondata_chunk_list.append((merged[0], first_new_e, merged[2]))
+                nondata_list.pop(0)
+
+            self.nondata_chunk_list.extend(nondata_list)
+
+        log.debug("Added chunk, data_chunk_list: %s, nondata_chunk_list: %s",
+                  self.data_chunk_list, self.nondata_chunk_list)
+
+    def _sieve_buffer(self, timestamp, start_index):
+        """
+        Run the sieve from some absolute offset to the end of the buffer.
+
+        @param timestamp The timestamp to use for a non-data block when
+            nothing is found
+        @param start_index absolute offset to start sieving from
+        @retval A tuple of (data_list, nondata_list) in absolute offsets.
+            data_list has (start, end, time, tag) entries, nondata_list has
+            (start, end, time) entries.
+        """
+        data_list = []
+        nondata_list = []
+
+        if start_index != self._scan_origin:
+            self._scan_origin = start_index
+            self._scan_resume = start_index
+            self._scan_state = None
+
+        (result, self._scan_state) = self._scanner.scan(
+            self._buffer, start_index - self._base,
+            self._scan_resume - start_index, self._scan_state)
+        self._scan_resume = self._end()
+
+        tags = {}
+        for block in result:
+            if len(block) > 2:
+                tags[block[0]] = block[2]
+        if tags:
+            result = [block[:2] for block in result]
+
+        if self.overlaps(result):
+            raise SampleException("Overlapping blocks in sieve list: %s" % result)
+        result.sort()
+
+        if result == []:
+            nondata_list.append((start_index, self._end(), timestamp))
+
+        previous_end = start_index
+        for (s, e) in result:
+            tag = tags.get(s)
+            s += start_index
+            e += start_index
+
+            t = self._timestamp_at(s)
+            if t is not None:
+                data_list.append((s, e, t, tag))
+
+            if s > previous_end:
+                nondata_list.append((previous_end, s,
+                                     self._timestamp_at(previous_end)))
+            previous_end = e
+
+        return (data_list, nondata_list)
+
+    def _generate_data_lists(self, timestamp, start_index=0):
+        """
+        From some starting place in the unconsumed buffer, go through and
+        find the blocks of data and non-data in the list.
+
+        @param timestamp The timestamp to use if no data is found
+        @param start_index The index relative to the unconsumed buffer to
+            start from. Default is the beginning of the buffer
+        @retval A dict with keys "data_chunk_list" and "non_data_chunk_list"
+            with indices relative to the unconsumed buffer
+        """
+        origin = self._start()
+        (data_list, nondata_list) = self._sieve_buffer(timestamp,
+                                                       origin + start_index)
+
+        return {'data_chunk_list': [(s-origin, e-origin, t) for (s, e, t, tag) in data_list],
+                'non_data_chunk_list': [(s-origin, e-origin, t) for (s, e, t) in nondata_list]}
+
+    def _timestamp_at(self, index):
+        """
+        Find the timestamp of the raw chunk holding an absolute offset. Only
+        walks back from the newest raw chunk, which is where sieved data is.
+        @param index absolute offset into the buffer
+        @retval the timestamp, None if the index isn't in the buffer
+        """
+        timestamp = None
+        for (raw_s, raw_e, raw_t) in reversed(self.raw_chunk_list):
+            if raw_e <= index:
+                break
+            timestamp = raw_t
+        return timestamp
+
+    def get_next_data(self, clean=True):
+        """
+        Get the next chunk of data from the buffer. By default, it clears all
+        that comes before it.
+
+        @param clean If set to false, do not clear the buffer when fetching the
+            data, but simply return the data block and make no further changes.
+        @return A tuple of (timestamp, data_chunk), (None, None) if no data
+        """
+        (timestamp, next_block, match) = self.get_next_tagged_data(clean)
+        return (timestamp, next_block)
+
+    def get_next_tagged_data(self, clean=True):
+        """
+        Get the next chunk of data along with the SieveMatch the sieve tagged
+        it with, bound to the returned chunk.
+
+        @param clean As in get_next_data
+        @return A tuple of (timestamp, data_chunk, match), where match is None
+            if the sieve didn't tag the chunk. (None, None, None) if no data
+        """
+        if not self.data_chunk_list:
+            return (None, None, None)
+
+        if clean:
+            (next_start, next_end, timestamp) = self.data_chunk_list.popleft()
+            match = self._data_tags.pop(next_start, None)
+        else:
+            (next_start, next_end, timestamp) = self.data_chunk_list[0]
+            match = self._data_tags.get(next_start)
+
+        next_block = self._block(next_start, next_end)
+        if match is not None:
+            match.string = next_block
+
+        if clean:
+            self._consume(next_end)
+            self._trim_chunk_list(self.raw_chunk_list, next_end)
+            self._trim_chunk_list(self.data_chunk_list, next_end, self._data_tags)
+            self._trim_chunk_list(self.nondata_chunk_list, next_end)
+
+        return (timestamp, next_block, match)
+
+    def get_next_non_data(self, clean=True):
+        """
+        Get the next chunk of non-data from the buffer, clearing all that comes
+        before it.
+
+        @param clean Remove the buffer contents before and including this data
+        @return A tuple of (timestamp, data_chunk), (None, None) if no data
+        """
+        if not self.nondata_chunk_list:
+            return (None, None)
+
+        if clean:
+            (next_start, next_end, next_time) = self.nondata_chunk_list.popleft()
+        else:
+            (next_start, next_end, next_time) = self.nondata_chunk_list[0]
+
+        next_block = self._block(next_start, next_end)
+
+        if clean:
+            self._consume(next_end)
+            self._trim_chunk_list(self.raw_chunk_list, next_end)
+            self._trim_chunk_list(self.data_chunk_list, next_end, self._data_tags)
+            self._trim_chunk_list(self.nondata_chunk_list, next_end)
+
+        return (next_time, next_block)
+
+    def get_next_raw(self, clean=True):
+        """
+        Get the next chunk of raw characters from the buffer, clearing all
+        that comes before it. Data chunks cut by the raw block are dropped and
+        whatever is left of them becomes non-data.
+
+        @param clean Remove the buffer contents before and including this data
+        @return A tuple of (timestamp, data_chunk), (None, None) if empty
+        """
+        if not self.raw_chunk_list:
+            return (None, None)
+
+        if clean:
+            (next_start, next_end, next_time) = self.raw_chunk_list.popleft()
+        else:
+            (next_start, next_end, next_time) = self.raw_chunk_list[0]
+
+        next_block = self._block(next_start, next_end)
+
+        if clean:
+            self._consume(next_end)
+            self._trim_chunk_list(self.raw_chunk_list, next_end)
+            self._trim_chunk_list(self.nondata_chunk_list, next_end)
+
+            remainders = []
+            while self.data_chunk_list and self.data_chunk_list[0][0] < next_end:
+                (s, e, t) = self.data_chunk_list.popleft()
+                self._data_tags.pop(s, None)
+                if e > next_end:
+                    remainders.append((next_end, e, t))
+            self.nondata_chunk_list.extendleft(reversed(remainders))
+
+        return (next_time, next_block)
+
+    @staticmethod
+    def _trim_chunk_list(chunk_list, end_index, tags=None):
+        """
+        Drop entries that end at or before end_index from the front of a
+        chunk list, cutting an entry that straddles it down to start there.
+
+        @param chunk_list A deque of (start, end, time) in absolute offsets
+        @param end_index The absolute offset of what is being removed
+        @param tags Optional dict of tags keyed by start offset to drop the
+            tags of removed or cut entries from
+        """
+        trimmed = []
+        while chunk_list and chunk_list[0][0] < end_index:
+            (s, e, t) = chunk_list.popleft()
+            if tags:
+                tags.pop(s, None)
+            if e > end_index:
+                trimmed.append((end_index, e, t))
+        chunk_list.extendleft(reversed(trimmed))
+
+    def _consume(self, end_index):
+        """
+        Release the buffer up to an absolute offset, compacting the bytearray
+        when the consumed part is big enough to be worth moving memory for.
+        @param end_index absolute offset of the first byte to keep
+        """
+        self._head = end_index - self._base
+
+        if self._head >= len(self._buffer):
+            self._base += len(self._buffer)
+            self._head = 0
+            del self._buffer[:]
+        elif self._head >= self.COMPACT_THRESHOLD and \
+             self._head * 2 >= len(self._buffer):
+            del self._buffer[:self._head]
+            self._base += self._head
+            self._head = 0
+
+
+class RingStringChunker(RingBufferChunker):
+    """
+    Ring buffer chunker that hands strings to the sieve and back to the caller
+    like StringChunker.
+    """
+    @staticmethod
+    def _convert(data):
+        return str(data)
+
+
+class RingBinaryChunker(RingBufferChunker):
+    """
+    Ring buffer chunker that hands bytearrays to the sieve and back to the
+    caller for binary data streams.
+    """
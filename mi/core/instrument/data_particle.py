@@ -12,7 +12,6 @@ __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
 import time
-import copy
 import ntplib
 import base64
 import json
@@ -52,6 +51,143 @@ class DataParticleValue(BaseEnum):
     INVALID = "invalid"
     QUESTIONABLE = "questionable"
     
+class DataParticleField(object):
+    """
+    One value of a particle, decoded from groups of the regex match of the
+    raw data.
+    """
+    __slots__ = ('value_id', 'groups', 'decoder')
+
+    def __init__(self, value_id, groups, decoder=None):
+        """
+        @param value_id The value_id of the value.
+        @param groups The number or name of the regex group holding the
+        value, or a tuple of them for a value made from several groups.
+        @param decoder Called with the text of each group, in order, to get
+        the value. By default the value is the text of the group.
+        """
+        if not isinstance(groups, tuple):
+            groups = (groups,)
+        self.value_id = value_id
+        self.groups = groups
+        self.decoder = decoder
+
+class DataParticleSchema(object):
+    """
+    The values of a particle type, declared as DataParticleFields. A
+    builder is generated from them with the group indexes, decoders and
+    value_ids written in, so building the values of a sample is one pass
+    over the groups of its match.
+
+    class SampleParticle(DataParticle):
+        _data_particle_type = 'sample'
+        _schema = DataParticleSchema(SAMPLE_REGEX, [
+            DataParticleField('temp', 1, float),
+            DataParticleField('cond', 2, float)])
+    """
+    def __init__(self, regex, fields):
+        """
+        @param regex The compiled regex the raw data must match.
+        @param fields The DataParticleFields, in the order of the values.
+        @raise InstrumentParameterException if a field uses a group the
+        regex doesn't have, or several groups and no decoder.
+        """
+        self.regex = regex
+        self.fields = tuple(fields)
+        self.value_ids = tuple(field.value_id for field in self.fields)
+
+        # For each field, the indexes of its groups in match.groups()
+        self._indexes = []
+        for field in self.fields:
+            indexes = []
+            for group in field.groups:
+                if isinstance(group, basestring):
+                    number = regex.groupindex.get(group)
+                else:
+                    number = group
+                if not isinstance(number, int) or not 0 < number <= regex.groups:
+                    raise InstrumentParameterException(
+                        "Particle value %s uses group %r, not in pattern %s" %
+                        (field.value_id, group, regex.pattern))
+                indexes.append(number - 1)
+
+            if len(indexes) > 1 and field.decoder is None:
+                raise InstrumentParameterException(
+                    "Particle value %s uses several groups but has no decoder" % field.value_id)
+            self._indexes.append(tuple(indexes))
+
+        self._builder = self._make_builder()
+
+    def _make_builder(self):
+        """
+        @retval A function of match.groups() returning the value list, or
+        None if a value is None.
+        """
+        namespace = {}
+        lines = ['def build(groups):']
+        for (n, (field, indexes)) in enumerate(zip(self.fields, self._indexes)):
+            namespace['decoder%d' % n] = field.decoder
+            namespace['value_id%d' % n] = field.value_id
+            args = ', '.join(['groups[%d]' % index for index in indexes])
+            if field.decoder is None:
+                lines.append('    value%d = %s' % (n, args))
+            else:
+                lines.append('    value%d = decoder%d(%s)' % (n, n, args))
+
+        values = ['value%d' % n for n in range(len(self.fields))]
+        if values:
+            lines.append('    if %s:' % ' or '.join(['%s is None' % v for v in values]))
+            lines.append('        return None')
+        lines.append('    return [%s]' % ', '.join(
+            ['{%r: value_id%d, %r: value%d}' % (DataParticleKey.VALUE_ID, n, DataParticleKey.VALUE, n)
+             for n in range(len(values))]))
+
+        exec '\n'.join(lines) in namespace
+        return namespace['build']
+
+    def build_parsed_values(self, particle):
+        """
+        Build the values of a particle from its raw data.
+        @param particle The DataParticle.
+        @retval The list of value_id/value dicts.
+        @throws SampleException if the raw data doesn't match, or a value
+        can't be decoded.
+        """
+        match = particle._match_raw_data(self.regex)
+        if not match:
+            raise SampleException("No regex match of parsed sample data: [%s]" %
+                                  particle.raw_data)
+
+        groups = match.groups()
+        try:
+            values = self._builder(groups)
+        except (ValueError, TypeError):
+            values = None
+        if values is None:
+            self._raise_for(groups, particle)
+        return values
+
+    def _raise_for(self, groups, particle):
+        """
+        Find the value the builder failed on, one field at a time, and raise.
+        @throws SampleException for the first value that can't be decoded or
+        is None.
+        """
+        for (field, indexes) in zip(self.fields, self._indexes):
+            try:
+                value = [groups[index] for index in indexes]
+                if field.decoder is None:
+                    value = value[0]
+                else:
+                    value = field.decoder(*value)
+            except (ValueError, TypeError) as e:
+                raise SampleException("%s while decoding %s in data: [%s]" %
+                                      (e.__class__.__name__, field.value_id, particle.raw_data))
+            if value is None:
+                raise SampleException("No %s value parsed" % field.value_id)
+
+        raise SampleException("Could not build values of data: [%s]" % particle.raw_data)
+
 class DataParticle(object):
     """
     This class is responsible for storing and ultimately generating data
@@ -64,19 +200,31 @@ class DataParticle(object):
     code be called by the child class with just values overridden as needed.
     """
 
+    # Particles are made for every sample, so they keep their fields in
+    # slots rather than a per-instance dict. Subclasses that add no fields
+    # should declare empty __slots__ to keep it that way.
+    __slots__ = ('contents', 'raw_data', '_match', '_particle_dict')
+
     # data particle type is intended to be defined in each derived data particle class.  This value should be unique
     # for all data particles.  Best practice is to access this variable using the accessor method:
     # data_particle_type()
     _data_particle_type = None
 
+    # A DataParticleSchema declaring the particle's values, for classes that
+    # don't build them in their own _build_parsed_values.
+    _schema = None
+
     def __init__(self, raw_data,
                  port_timestamp=None,
                  internal_timestamp=None,
                  preferred_timestamp=DataParticleKey.PORT_TIMESTAMP,
-                 quality_flag=DataParticleValue.OK):
+                 quality_flag=DataParticleValue.OK,
+                 match=None):
         """ Build a particle seeded with appropriate information
         
         @param raw_data The raw data used in the particle
+        @param match A regex match (or SieveMatch) of the raw data found
+            while chunking, reused by _match_raw_data
         """
         self.contents = {
             DataParticleKey.PKT_FORMAT_ID: DataParticleValue.JSON_DATA,
@@ -88,6 +236,24 @@ class DataParticle(object):
             DataParticleKey.QUALITY_FLAG: quality_flag
         }
         self.raw_data = raw_data
+        self._match = match
+        self._particle_dict = None
+
+    def _match_raw_data(self, regex):
+        """
+        Match the raw data against a regex, reusing the match handed in when
+        the particle was built if it was made with the same pattern.
+
+        @param regex The compiled regex to match
+        @retval The match, None if the raw data doesn't match
+        """
+        match = self._match
+        if match is not None and match.re is not None and \
+           (match.re is regex or (match.re.pattern == regex.pattern and
+                                  match.re.flags == regex.flags)):
+            return match
+
+        return regex.match(self.raw_data)
 
     def set_internal_timestamp(self, timestamp=None, unix_time=None):
         """
@@ -107,6 +273,7 @@ class DataParticle(object):
         #    raise InstrumentParameterException("invalid timestamp")
 
         self.contents[DataParticleKey.INTERNAL_TIMESTAMP] = float(timestamp)
+        self._particle_dict = None
 
     def set_value(self, id, value):
         """
@@ -118,6 +285,7 @@ class DataParticle(object):
         """
         if (id == DataParticleKey.INTERNAL_TIMESTAMP) and (self._check_timestamp(value)):
             self.contents[DataParticleKey.INTERNAL_TIMESTAMP] = value
+            self._particle_dict = None
         else:
             raise ReadOnlyException("Parameter %s not able to be set to %s after object creation!" %
                                     (id, value))
@@ -144,17 +312,18 @@ class DataParticle(object):
 
         return self._data_particle_type
 
-    def generate(self):
+    def generate_dict(self):
         """
-        Generates a JSON_parsed packet from a sample dictionary of sensor data and
-        associates a timestamp with it
-        
-        @param portagent_time The timestamp from the instrument in NTP binary format 
-        @param data The actual data being sent in raw byte[] format
-        @return A JSON_raw string, properly structured with port agent time stamp
-           and driver timestamp
-        @throws InstrumentDriverException If there is a problem with the inputs
+        Generate the particle structure as a dict. The structure is only built
+        once, later calls return the same dict, so callers should treat it as
+        read only. Serializing it is left to whoever publishes it.
+
+        @return A dict of the particle, ready to be JSONified
+        @throws SampleException If there is a problem with the inputs
         """
+        if self._particle_dict is not None:
+            return self._particle_dict
+
         # Do we wan't downstream processes to check this?
         #for time in [DataParticleKey.INTERNAL_TIMESTAMP,
         #             DataParticleKey.DRIVER_TIMESTAMP,
@@ -172,13 +341,22 @@ class DataParticle(object):
         result[DataParticleKey.STREAM_NAME] = self.data_particle_type()
         result[DataParticleKey.VALUES] = values
 
-        log.debug("Serialize result: %s" % result)
+        log.debug("Serialize result: %s", result)
 
-        # JSONify response, sorting is nice for testing
-        json_result = json.dumps(result, sort_keys=True)
+        self._particle_dict = result
+        return result
+
+    def generate(self):
+        """
+        Generates a JSON_parsed packet from a sample dictionary of sensor data and
+        associates a timestamp with it
         
-        # return result
-        return json_result
+        @return A JSON_raw string, properly structured with port agent time stamp
+           and driver timestamp
+        @throws InstrumentDriverException If there is a problem with the inputs
+        """
+        # JSONify response, sorting is nice for testing
+        return json.dumps(self.generate_dict(), sort_keys=True)
         
     def _build_parsed_values(self):
         """
@@ -189,7 +367,9 @@ class DataParticle(object):
         @return the values tag for this data structure ready to JSONify
         @raises SampleException when parsed values can not be properly returned
         """
-        raise SampleException("Parsed values block not overridden")
+        if self._schema is None:
+            raise SampleException("Parsed values block not overridden")
+        return self._schema.build_parsed_values(self)
 
 
     def _build_base_structure(self):
@@ -199,12 +379,8 @@ class DataParticle(object):
         
         @return A fresh copy of a core structure to be exported
         """
-        # set the driver time
-        driver_time = ntplib.system_to_ntp_time(time.time())
-        result = {}
-        result[DataParticleKey.DRIVER_TIMESTAMP] = driver_time
-        
-        result = copy.deepcopy(self.contents)
+        # contents only holds scalars, a shallow copy is a fresh copy
+        result = dict(self.contents)
         # clean out optional fields that were missing
         if not self.contents[DataParticleKey.PORT_TIMESTAMP]:
             del result[DataParticleKey.PORT_TIMESTAMP]
@@ -264,6 +440,7 @@ class RawDataParticle(DataParticle):
 
     It essentially is a translation of the port agent packet
     """
+    __slots__ = ()
     _data_particle_type = CommonDataParticleType.RAW
 
     def _build_parsed_values(self):
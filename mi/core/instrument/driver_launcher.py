@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.driver_launcher
+@file mi/core/instrument/driver_launcher.py
+@brief Launch driver processes by forking warm, pre-imported interpreters.
+
+ZmqDriverProcess.launch_process starts a new interpreter per driver, which
+then imports the mi.core stack, and the launcher polls for port files. A
+DriverLauncher instead keeps a pool of fork servers: interpreters started
+once, with the common modules already imported, that fork a child per
+driver. The child reports its ports over a pipe as soon as its sockets are
+bound.
+
+To launch through a pool:
+from mi.core.instrument.driver_launcher import DriverLauncher
+launcher = DriverLauncher(pool_size=2)
+launcher.start()
+(dvr_proc, cmd_port, evt_port) = ZmqDriverProcess.launch_process(
+    'mi.instrument.seabird.sbe37smb.ooicore.driver', 'SBE37Driver',
+    launcher=launcher)
+
+The fork servers are plain interpreters, single threaded and without gevent,
+so forking them is safe.
+"""
+
+__license__ = 'Apache 2.0'
+
+import os
+import sys
+import time
+import json
+import errno
+import signal
+import Queue
+from threading import Lock
+from subprocess import Popen
+from subprocess import PIPE
+
+from mi.core.exceptions import DriverLaunchException
+from mi.core.exceptions import InstrumentParameterException
+
+import mi.core.instrument.driver_process as driver_process
+from mi.core.log import get_logger
+log = get_logger()
+
+# Modules imported by every fork server before it forks drivers.
+PRELOAD_MODULES = [
+    'ntplib',
+    'apscheduler.scheduler',
+    'mi.core.instrument.zmq_driver_process',
+    'mi.core.instrument.instrument_driver',
+    'mi.core.instrument.instrument_protocol',
+    'mi.core.instrument.instrument_fsm',
+    'mi.core.instrument.data_particle',
+    'mi.core.instrument.port_agent_client',
+    'mi.core.instrument.protocol_param_dict',
+]
+
+# Longest time in seconds a forked driver may take to bind its sockets.
+READY_TIMEOUT = 30
+
+# Reply from a fork server once it has preloaded its modules.
+SERVER_READY = 'ready'
+
+class LaunchedDriverProcess(object):
+    """
+    Handle on a driver process forked by a fork server, in place of the
+    Popen object launch_process returns. The driver is the fork server's
+    child, not ours, so its exit status isn't available: poll() and wait()
+    give 0 once it has exited.
+    """
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self):
+        """
+        @retval None while the process is running, 0 once it has exited.
+        """
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, 0)
+            except OSError as e:
+                if e.errno == errno.ESRCH:
+                    self.returncode = 0
+        return self.returncode
+
+    def wait(self, interval=.1):
+        """
+        Wait for the process to exit.
+        @param interval Seconds between checks.
+        @retval 0
+        """
+        while self.poll() is None:
+            time.sleep(interval)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.poll() is None:
+            os.kill(self.pid, sig)
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+class DriverLauncher(object):
+    """
+    Pool of fork servers launching driver processes. Launches are served
+    by whichever server is free, so up to pool_size can run at once.
+    """
+    def __init__(self, pool_size=1, preload=None, python=None):
+        """
+        @param pool_size Number of fork servers.
+        @param preload Further modules for the servers to import, such as
+        the driver modules to be launched.
+        @param python Interpreter for the servers, by default the one
+        launch_process uses.
+        """
+        if not isinstance(pool_size, int) or pool_size < 1:
+            raise InstrumentParameterException("Invalid launcher pool size: %s" % pool_size)
+
+        self.pool_size = pool_size
+        self.preload = list(preload or [])
+        self.python = python or driver_process.PYTHON
+        self._servers = []
+        self._idle = Queue.Queue()
+        self._lock = Lock()
+
+    def start(self):
+        """
+        Start the fork servers, returning once all of them have imported
+        their modules.
+        @raise DriverLaunchException if a server fails to start.
+        """
+        with self._lock:
+            while len(self._servers) < self.pool_size:
+                server = self._start_server()
+                self._servers.append(server)
+                self._idle.put(server)
+
+    def _start_server(self):
+        cmd_str = 'from %s import serve; serve(%r)' % (__name__, self.preload)
+        server = Popen([self.python, '-c', cmd_str], stdin=PIPE, stdout=PIPE, close_fds=True)
+        reply = server.stdout.readline().strip()
+        if reply != SERVER_READY:
+            server.kill()
+            server.wait()
+            raise DriverLaunchException('Driver fork server failed to start.')
+
+        log.info('Driver fork server %d started.', server.pid)
+        return server
+
+    def launch(self, driver_module, driver_class, ppid=None, **kwargs):
+        """
+        Fork a ZmqDriverProcess for a driver.
+        @param driver_module The python module containing the driver code.
+        @param driver_class The python driver class.
+        @param ppid ID of the parent process, used to self destruct when
+        parent dies in test cases.
+        @param kwargs Further ZmqDriverProcess constructor arguments, such
+        as batch_size.
+        @retval Tuple containing (LaunchedDriverProcess, cmd port, evt port)
+        @raise DriverLaunchException if the driver can't be constructed or
+        its server has died.
+        """
+        if not self._servers:
+            self.start()
+
+        request = json.dumps({'driver_module': driver_module,
+                              'driver_class': driver_class,
+                              'ppid': ppid,
+                              'kwargs': kwargs})
+        server = self._idle.get()
+        try:
+            if server.poll() is not None:
+                log.warning('Driver fork server %d has exited, restarting it.', server.pid)
+                server = self._replace_server(server)
+
+            server.stdin.write(request + '\n')
+            server.stdin.flush()
+            reply = server.stdout.readline()
+        except IOError:
+            reply = None
+        finally:
+            self._idle.put(server)
+
+        if not reply:
+            raise DriverLaunchException('Driver fork server %d died launching %s.%s' %
+                                        (server.pid, driver_module, driver_class))
+        reply = json.loads(reply)
+        if reply.get('error'):
+            raise DriverLaunchException('Could not launch %s.%s: %s' %
+                                        (driver_module, driver_class, reply['error']))
+
+        log.info('Launched driver %s.%s as process %d.', driver_module, driver_class, reply['pid'])
+        return (LaunchedDriverProcess(reply['pid']), reply['cmd_port'], reply['evt_port'])
+
+    def _replace_server(self, server):
+        with self._lock:
+            new_server = self._start_server()
+            self._servers[self._servers.index(server)] = new_server
+        return new_server
+
+    def stop(self):
+        """
+        Stop the fork servers. Drivers they launched keep running.
+        """
+        with self._lock:
+            for server in self._servers:
+                try:
+                    server.stdin.close()
+                except IOError:
+                    pass
+                server.wait()
+            self._servers = []
+            self._idle = Queue.Queue()
+
+def serve(preload=None):
+    """
+    Fork server entry point. Import the common modules, then read launch
+    requests, one JSON object per line, from stdin and write replies the
+    same way, until stdin closes. Replies go out on what was stdout, which
+    is pointed at stderr so drivers' output doesn't get in the way.
+    @param preload Further modules to import.
+    """
+    control = os.fdopen(os.dup(1), 'w', 0)
+    os.dup2(2, 1)
+
+    for name in PRELOAD_MODULES + list(preload or []):
+        try:
+            __import__(name)
+        except ImportError as e:
+            log.warning('Driver fork server could not preload %s: %s', name, e)
+
+    # Have exited drivers reaped straight away.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    control.write(SERVER_READY + '\n')
+    while True:
+        line = sys.stdin.readline()
+        if not line:
+            break
+        control.write(json.dumps(_fork_driver(json.loads(line), control)) + '\n')
+
+def _fork_driver(request, control):
+    """
+    Fork a driver process and wait for it to bind its sockets.
+    @param request Launch request from DriverLauncher.launch().
+    @param control The fork server's reply pipe, closed in the child.
+    @retval Reply dict with the driver pid and ports, or an error.
+    """
+    (read_fd, write_fd) = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os.close(read_fd)
+            control.close()
+            devnull = os.open(os.devnull, os.O_RDONLY)
+            os.dup2(devnull, 0)
+            os.close(devnull)
+            signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+            _run_driver(request, write_fd)
+        finally:
+            os._exit(1)
+
+    os.close(write_fd)
+    reply = ''
+    while True:
+        data = os.read(read_fd, 1024)
+        if not data:
+            break
+        reply += data
+    os.close(read_fd)
+
+    if not reply:
+        return {'pid': pid, 'error': 'driver could not be constructed or bound no sockets'}
+    (cmd_port, evt_port) = [int(port) for port in reply.split()]
+    return {'pid': pid, 'cmd_port': cmd_port, 'evt_port': evt_port}
+
+def _run_driver(request, ready_fd):
+    """
+    Run a driver process in a forked child, writing its ports to ready_fd
+    once its sockets are bound. Does not return.
+    """
+    from mi.core.instrument.zmq_driver_process import ZmqDriverProcess
+
+    kwargs = dict((str(key), value) for (key, value) in request['kwargs'].items())
+    dvr_proc = ZmqDriverProcess(str(request['driver_module']), str(request['driver_class']),
+                                None, None, request['ppid'], **kwargs)
+
+    def ready():
+        if dvr_proc.ports_ready.wait(READY_TIMEOUT):
+            os.write(ready_fd, '%d %d\n' % (dvr_proc.cmd_port, dvr_proc.evt_port))
+        else:
+            dvr_proc.stop_messaging()
+        os.close(ready_fd)
+
+    dvr_proc.run(ready)
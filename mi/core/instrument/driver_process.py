@@ -21,9 +21,15 @@ import time
 import traceback
 from mi.core.exceptions import InstrumentException, InstrumentCommandException
 from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.event_queue import EventQueue
+from mi.core.instrument.event_queue import OverflowPolicy
+from mi.core.instrument.event_queue import DEFAULT_MAX_EVENTS
 
 from ooi.logging import log
 
+# Interpreter driver processes are launched with.
+PYTHON = 'bin/python'
+
 class DriverProcess(object):
     """
     Base class for messaging enabled OS-level driver processes. Provides
@@ -44,19 +50,23 @@ class DriverProcess(object):
 
         # Launch a separate python interpreter, executing the calling
         # class command string.
-        spawnargs = ['bin/python', '-c', cmd_str]
+        spawnargs = [PYTHON, '-c', cmd_str]
         return Popen(spawnargs, close_fds=True)
         
-    def __init__(self, driver_module, driver_class, ppid):
+    def __init__(self, driver_module, driver_class, ppid,
+                 max_events=DEFAULT_MAX_EVENTS, overflow_policy=OverflowPolicy.DROP_OLDEST_RAW):
         """
         @param driver_module The python module containing the driver code.
         @param driver_class The python driver class.
+        @param max_events The most events to queue for sending.
+        @param overflow_policy The OverflowPolicy for events arriving while
+        the queue is full.
         """
         self.driver_module = driver_module
         self.driver_class = driver_class
         self.ppid = ppid
         self.driver = None
-        self.events = []
+        self.events = EventQueue(max_events, overflow_policy)
         self.messaging_started = False
         
     def construct_driver(self):
@@ -129,6 +139,8 @@ class DriverProcess(object):
         not forwarded to the driver are:
         'stop_driver_process' - signal to close messaging and terminate.
         'test_events' - populate event queue with test data.
+        'get_event_queue_stats' - return the event queue settings and
+        counters, including its high water mark and events dropped.
         'process_echo' - echos the message back.
         If the command is not found in the driver, an echo message is
         replied to the client.
@@ -145,8 +157,10 @@ class DriverProcess(object):
             return'stop_driver_process'
         elif cmd == 'test_events':
             events = kwargs['events']
-            self.events += events
+            self.events.put_all(events)
             reply = 'test_events'
+        elif cmd == 'get_event_queue_stats':
+            reply = self.events.get_stats()
         elif cmd == 'process_echo':
             reply = 'ping from resource ppid:%s, resource:%s' % (str(self.ppid), str(self.driver))
             #try:
@@ -187,15 +201,36 @@ class DriverProcess(object):
             
     def send_event(self, evt):
         """
-        Append an event to the list to be sent by the event threaed.
+        Queue an event to be sent by the event thread, in the control lane
+        ahead of samples unless it is a data event. If the queue is full
+        the overflow policy applies, and may block.
+        """
+        self.events.put(evt)
+
+    def get_events(self):
+        """
+        Wait for events to be queued and take all of them. Use
+        wake_event_thread() to end the wait early.
+        @retval List of events oldest first, empty if the wait was
+        interrupted.
+        """
+        return self.events.take()
+
+    def wake_event_thread(self):
+        """
+        Interrupt a get_events() wait, or the next one if there isn't one
+        now, e.g. so the sender sees it is being stopped.
         """
-        self.events.append(evt)
+        self.events.interrupt()
             
-    def run(self):
+    def run(self, ready=None):
         """
         Process entry point. Construct driver and start messaging loops.
         Periodically check messaging is going and parent exists if
         specified.
+        @param ready Called with no arguments once messaging has started,
+        e.g. to tell a launcher the process is up. Not called if the driver
+        can't be constructed.
         """
 
         from mi.core.log import LoggerManager
@@ -209,6 +244,8 @@ class DriverProcess(object):
 
         if self.construct_driver():
             self.start_messaging()
+            if ready:
+                ready()
             while self.messaging_started:
                 if self.check_parent():
                     time.sleep(2)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.event_queue
+@file mi/core/instrument/event_queue.py
+@brief Bounded queue of driver events awaiting publication.
+
+The driver process queues events from the driver threads and its event
+thread takes them all at once to publish them. Events go in one of two
+lanes: data for samples and direct access data, control for everything
+else, such as state changes, config changes and errors. Control events
+are taken ahead of data events, so they don't wait behind a backlog of
+particles; events keep their order within a lane.
+
+If the agent stops draining the event socket the queue fills; what happens
+to the next event then is set by the overflow policy:
+
+    block            the producer waits for room, holding up the driver
+    drop_oldest_raw  the oldest raw particle is dropped to make room, then
+                     the oldest other data event, then the oldest event
+    drop_newest      the new event is dropped
+"""
+
+__license__ = 'Apache 2.0'
+
+from collections import deque
+from threading import Condition
+
+from mi.core.common import BaseEnum
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.data_particle import DataParticleKey
+from mi.core.instrument.data_particle import CommonDataParticleType
+
+DEFAULT_MAX_EVENTS = 100000
+
+# How a raw particle reads in a sample event value already serialized by
+# DataParticle.generate(), which sorts its keys.
+RAW_STREAM_JSON = '"%s": "%s"' % (DataParticleKey.STREAM_NAME, CommonDataParticleType.RAW)
+
+class OverflowPolicy(BaseEnum):
+    """
+    What to do with an event that arrives while the queue is full
+    """
+    BLOCK = 'block'
+    DROP_OLDEST_RAW = 'drop_oldest_raw'
+    DROP_NEWEST = 'drop_newest'
+
+class EventQueueStatsKey(BaseEnum):
+    """
+    Keys for the event queue counters
+    """
+    MAX_EVENTS = 'max_events'
+    OVERFLOW_POLICY = 'overflow_policy'
+    QUEUED = 'queued'
+    QUEUED_CONTROL = 'queued_control'
+    HIGH_WATER_MARK = 'high_water_mark'
+    DROPPED = 'dropped'
+    DROPPED_RAW = 'dropped_raw'
+    BLOCKED = 'blocked'
+
+# Event types that go in the data lane.
+DATA_EVENT_TYPES = (DriverAsyncEvent.SAMPLE, DriverAsyncEvent.DIRECT_ACCESS)
+
+def is_sample(evt):
+    return isinstance(evt, dict) and evt.get('type') == DriverAsyncEvent.SAMPLE
+
+def is_data(evt):
+    """
+    @param evt A driver event.
+    @retval True if evt goes in the data lane, False for the control lane.
+    """
+    return isinstance(evt, dict) and evt.get('type') in DATA_EVENT_TYPES
+
+def is_raw_sample(evt):
+    """
+    @param evt A driver event.
+    @retval True if evt is a sample event carrying a raw particle, as a
+    particle dict or its JSON.
+    """
+    if not is_sample(evt):
+        return False
+    value = evt.get('value')
+    if isinstance(value, dict):
+        return value.get(DataParticleKey.STREAM_NAME) == CommonDataParticleType.RAW
+    return isinstance(value, basestring) and RAW_STREAM_JSON in value
+
+class EventQueue(object):
+    """
+    Bounded, thread safe queue of driver events in control and data lanes,
+    with one consumer taking all queued events at a time, control first.
+    """
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS,
+                 overflow_policy=OverflowPolicy.DROP_OLDEST_RAW, condition=None):
+        """
+        @param max_events The most events to hold in both lanes.
+        @param overflow_policy An OverflowPolicy value.
+        @param condition Condition to guard the queue with and notify when
+        events are queued, to share one between queues with a consumer
+        that waits on all of them. By default the queue has its own.
+        @raise InstrumentParameterException for a bad size or policy.
+        """
+        if not isinstance(max_events, int) or max_events < 1:
+            raise InstrumentParameterException("Invalid event queue size: %s" % max_events)
+        if not OverflowPolicy.has(overflow_policy):
+            raise InstrumentParameterException("Invalid overflow policy: %s" % overflow_policy)
+
+        self.max_events = max_events
+        self.overflow_policy = overflow_policy
+        self._control = deque()
+        self._data = deque()
+        # Raw particles in _data, only kept under DROP_OLDEST_RAW.
+        self._raw_count = 0
+        self._condition = condition or Condition()
+        self._interrupted = False
+        self._closed = False
+        self._stats = dict((key, 0) for key in EventQueueStatsKey.list())
+
+    def __len__(self):
+        return len(self._control) + len(self._data)
+
+    def put(self, evt):
+        """
+        Queue an event, applying the overflow policy if the queue is full.
+        Once the queue is closed, events that don't fit are dropped
+        whatever the policy.
+        @param evt A driver event.
+        @retval True if the event was queued, False if it was dropped.
+        """
+        with self._condition:
+            return self._put(evt)
+
+    def put_all(self, events):
+        """
+        Queue events in order.
+        @param events List of driver events.
+        @retval Number of events queued.
+        """
+        with self._condition:
+            return len([evt for evt in events if self._put(evt)])
+
+    def _put(self, evt):
+        stats = self._stats
+        if len(self) >= self.max_events:
+            if self.overflow_policy == OverflowPolicy.BLOCK and not self._closed:
+                stats[EventQueueStatsKey.BLOCKED] += 1
+                while len(self) >= self.max_events and not self._closed:
+                    self._condition.wait()
+
+            if len(self) >= self.max_events:
+                if self.overflow_policy != OverflowPolicy.DROP_OLDEST_RAW:
+                    stats[EventQueueStatsKey.DROPPED] += 1
+                    return False
+                self._drop_oldest()
+
+        if is_data(evt):
+            if self.overflow_policy == OverflowPolicy.DROP_OLDEST_RAW and is_raw_sample(evt):
+                self._raw_count += 1
+            self._data.append(evt)
+        else:
+            self._control.append(evt)
+
+        if len(self) > stats[EventQueueStatsKey.HIGH_WATER_MARK]:
+            stats[EventQueueStatsKey.HIGH_WATER_MARK] = len(self)
+        self._condition.notify_all()
+        return True
+
+    def _drop_oldest(self):
+        """
+        Make room by dropping the oldest raw particle, or failing that the
+        oldest data event, or failing that the oldest control event. A raw
+        particle is usually near the front of the data lane, so the search
+        for one is short.
+        """
+        if self._raw_count:
+            for (index, evt) in enumerate(self._data):
+                if is_raw_sample(evt):
+                    break
+            del self._data[index]
+            self._raw_count -= 1
+            self._stats[EventQueueStatsKey.DROPPED_RAW] += 1
+        elif self._data:
+            self._data.popleft()
+        else:
+            self._control.popleft()
+        self._stats[EventQueueStatsKey.DROPPED] += 1
+
+    def take(self, timeout=None):
+        """
+        Take all queued events, waiting for some if there are none. Waits
+        without a timeout don't poll, unlike a python 2 Condition.wait
+        with one, which polls in steps of up to 50ms. Use interrupt() to
+        end one early.
+        @param timeout Longest time in seconds to wait, None to wait until
+        events are queued or the wait is interrupted, 0 not to wait.
+        @retval List of control events then data events, each oldest first,
+        empty if none were queued in time or the wait was interrupted.
+        """
+        with self._condition:
+            if timeout is None:
+                while not len(self) and not self._interrupted and not self._closed:
+                    self._condition.wait()
+                self._interrupted = False
+            elif timeout > 0 and not len(self):
+                self._condition.wait(timeout)
+
+            events = list(self._control)
+            events.extend(self._data)
+            self._control.clear()
+            self._data.clear()
+            self._raw_count = 0
+            if events and self.overflow_policy == OverflowPolicy.BLOCK:
+                self._condition.notify_all()
+        return events
+
+    def interrupt(self):
+        """
+        Interrupt a take() wait, or the next one if there isn't one now.
+        """
+        with self._condition:
+            self._interrupted = True
+            self._condition.notify_all()
+
+    def close(self):
+        """
+        Stop waiting for the consumer: end take() waits and release
+        producers blocked on a full queue, whose events are then dropped.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def get_stats(self):
+        """
+        @retval dict of the queue settings and counters by
+        EventQueueStatsKey: events queued now, in total and in the control
+        lane, the most ever queued at once, events dropped in total and of
+        them raw particles, and producers that had to wait for room.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats[EventQueueStatsKey.MAX_EVENTS] = self.max_events
+            stats[EventQueueStatsKey.OVERFLOW_POLICY] = self.overflow_policy
+            stats[EventQueueStatsKey.QUEUED] = len(self)
+            stats[EventQueueStatsKey.QUEUED_CONTROL] = len(self._control)
+        return stats
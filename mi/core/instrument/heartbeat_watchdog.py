@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.heartbeat_watchdog
+@file mi/core/instrument/heartbeat_watchdog.py
+@brief One thread timing the heartbeats of any number of connections.
+
+Each connection registers a WatchdogTimer with a HeartbeatWatchdog and
+resets it on every heartbeat. A reset only moves the timer's deadline
+later; the watchdog thread finds out when the old deadline comes round and
+waits again for the new one. A timer whose deadline passes calls its
+callback once, on the watchdog thread, and stays quiet until it is reset.
+
+watchdog = get_watchdog()
+timer = watchdog.register(heartbeat, heartbeat_timeout)
+timer.reset()      # on each heartbeat
+timer.cancel()     # when the connection closes
+"""
+
+__license__ = 'Apache 2.0'
+
+import time
+import threading
+
+from mi.core.common import BaseEnum
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.instrument.io_loop import IOLoop
+
+from mi.core.log import get_logger
+log = get_logger()
+
+class WatchdogStatsKey(BaseEnum):
+    """
+    Keys of HeartbeatWatchdog.get_stats()
+    """
+    WATCHED = 'watched'
+    MISSED = 'missed'
+
+class WatchdogTimer(object):
+    """
+    A deadline, interval seconds after the last reset, watched by a
+    HeartbeatWatchdog.
+    """
+    def __init__(self, watchdog, interval, callback):
+        self.interval = interval
+        self.callback = callback
+        self.deadline = None
+        self.armed = False
+        self.cancelled = False
+        self.missed = 0
+        self._watchdog = watchdog
+        # Counts armings, so checks left over from an earlier one are ignored.
+        self._generation = 0
+
+    def reset(self, interval=None):
+        """
+        Move the deadline to interval seconds from now, arming the timer if
+        it isn't.
+        @param interval New interval in seconds, by default the last one.
+        """
+        self._watchdog._reset(self, interval)
+
+    def cancel(self):
+        """
+        Stop watching the deadline.
+        """
+        self._watchdog._cancel(self)
+
+class HeartbeatWatchdog(object):
+    """
+    Watches the deadlines of WatchdogTimers from a single thread.
+    """
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+        self._timers = set()
+        self._missed = 0
+
+    def register(self, interval, callback):
+        """
+        Start watching a deadline interval seconds from now.
+        @param interval Seconds between heartbeats.
+        @param callback Called with no arguments, on the watchdog thread,
+        when the deadline passes. It must not block, other timers wait on it.
+        @retval The armed WatchdogTimer.
+        @raise InstrumentParameterException if interval isn't positive.
+        """
+        timer = WatchdogTimer(self, interval, callback)
+        self._reset(timer, interval)
+        return timer
+
+    def _reset(self, timer, interval):
+        if interval is not None:
+            if interval <= 0:
+                raise InstrumentParameterException("Invalid heartbeat interval: %s" % interval)
+            timer.interval = interval
+
+        with self._lock:
+            timer.deadline = time.time() + timer.interval
+            timer.cancelled = False
+            if not timer.armed:
+                timer.armed = True
+                timer._generation += 1
+                self._timers.add(timer)
+                if self._loop is None:
+                    self._loop = IOLoop()
+                    self._loop.start()
+                self._loop.call_later(timer.interval, self._check, timer, timer._generation)
+
+    def _cancel(self, timer):
+        with self._lock:
+            timer.cancelled = True
+            timer.armed = False
+            self._timers.discard(timer)
+
+    def _check(self, timer, generation):
+        """
+        On the watchdog thread, when a deadline the timer had comes round:
+        wait again if it has been reset since, or call it missed.
+        """
+        with self._lock:
+            if not timer.armed or timer._generation != generation:
+                return
+
+            remaining = timer.deadline - time.time()
+            if remaining > 0:
+                self._loop.call_later(remaining, self._check, timer, generation)
+                return
+
+            timer.armed = False
+            timer.missed += 1
+            self._missed += 1
+
+        try:
+            timer.callback()
+        except Exception:
+            log.error('Exception in heartbeat watchdog callback %r', timer.callback, exc_info=True)
+
+    def get_stats(self):
+        """
+        @retval dict of WatchdogStatsKey => value: the number of armed
+        timers, and the deadlines missed by all timers.
+        """
+        with self._lock:
+            return {
+                WatchdogStatsKey.WATCHED: len([t for t in self._timers if t.armed]),
+                WatchdogStatsKey.MISSED: self._missed,
+            }
+
+    def stop(self):
+        """
+        Stop the watchdog thread. Armed timers stay quiet; it is started
+        again by the next reset.
+        """
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+            for timer in self._timers:
+                timer.armed = False
+            self._timers.clear()
+
+        if loop:
+            loop.stop()
+            loop.join()
+            loop.close()
+
+_watchdog = None
+_watchdog_lock = threading.Lock()
+
+def get_watchdog():
+    """
+    @retval The HeartbeatWatchdog shared by the process.
+    """
+    global _watchdog
+    with _watchdog_lock:
+        if _watchdog is None:
+            _watchdog = HeartbeatWatchdog()
+        return _watchdog
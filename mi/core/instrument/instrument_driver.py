@@ -32,6 +32,8 @@ class DriverConfigKey(BaseEnum):
     """
     PARAMETERS = 'parameters'
     SCHEDULER = 'scheduler'
+    BUFFER_SIZE = 'buffer_size'
+    DELTA_CONFIG_EVENTS = 'delta_config_events'
 
 # This is a copy since we can't import from pyon.
 class ResourceAgentState(BaseEnum):
@@ -182,6 +184,11 @@ class InstrumentDriver(object):
         self._send_event = event_callback
         self._test_mode = False
 
+        # Send only changed parameters with config change events, and the
+        # parameter dict version the last one was sent at.
+        self._delta_config_events = False
+        self._config_version = None
+
 
     #############################################################
     # Device connection interface.
@@ -327,6 +334,13 @@ class InstrumentDriver(object):
     # Event interface.
     ########################################################################
 
+    def _get_config_change(self):
+        """
+        Get the value of a config change event.
+        @retval parameter : value dict, or None if there is no event to send.
+        """
+        return self.get_resource(DriverParameter.ALL)
+
     def _driver_event(self, type, val=None):
         """
         Construct and send an asynchronous driver event.
@@ -344,9 +358,10 @@ class InstrumentDriver(object):
             self._send_event(event)
             
         elif type == DriverAsyncEvent.CONFIG_CHANGE:
-            config = self.get_resource(DriverParameter.ALL)
-            event['value'] = config
-            self._send_event(event)
+            config = self._get_config_change()
+            if config is not None:
+                event['value'] = config
+                self._send_event(event)
         
         elif type == DriverAsyncEvent.SAMPLE:
             event['value'] = val
@@ -537,6 +552,14 @@ class SingleConnectionInstrumentDriver(InstrumentDriver):
             if(param_config):
                 self._protocol.set_init_params(param_config)
                 self._protocol.initialize_scheduler()
+
+                buffer_size = param_config.get(DriverConfigKey.BUFFER_SIZE)
+                if(buffer_size):
+                    self._protocol.set_buffer_size(buffer_size)
+
+                delta_config_events = param_config.get(DriverConfigKey.DELTA_CONFIG_EVENTS)
+                if(delta_config_events is not None):
+                    self._delta_config_events = bool(delta_config_events)
                 
         self._startup_config = config
     
@@ -572,6 +595,19 @@ class SingleConnectionInstrumentDriver(InstrumentDriver):
         if self._protocol:
             return self._protocol.get_cached_config()
                 
+    def get_buffer_stats(self, *args, **kwargs):
+        """
+        Return the protocol input buffer counters: how many bytes are in the
+        line and prompt buffers and how many have been dropped to keep them
+        under the configured size.
+        @retval dict of BufferStatsKey => value, empty if there is no
+        protocol yet.
+        """
+        if self._protocol:
+            return self._protocol.get_buffer_stats()
+
+        return {}
+
     def restore_direct_access_params(self, config):
         """
         Restore the correct values out of the full config that is given when
@@ -735,6 +771,28 @@ class SingleConnectionInstrumentDriver(InstrumentDriver):
         # know which is better.
         self._protocol._protocol_fsm.current_state = state
 
+    def _get_config_change(self):
+        """
+        Get the value of a config change event. With delta config events on,
+        this is the parameters changed in the protocol parameter dict since
+        the last event, and the first event has them all.
+        @retval parameter : value dict, or None if no parameter has changed.
+        """
+        param_dict = getattr(self._protocol, '_param_dict', None)
+        if param_dict is None:
+            return InstrumentDriver._get_config_change(self)
+
+        version = param_dict.get_current_version()
+        if not self._delta_config_events or self._config_version is None:
+            config = InstrumentDriver._get_config_change(self)
+        else:
+            config = param_dict.get_changes_since(self._config_version)
+            if not config:
+                return None
+
+        self._config_version = version
+        return config
+
     ########################################################################
     # Unconfigured handlers.
     ########################################################################
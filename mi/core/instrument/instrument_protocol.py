@@ -14,14 +14,19 @@ __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
 import time
-import json
+import threading
 from functools import partial
+from collections import deque
 
 from mi.core.log import get_logger ; log = get_logger()
 
 from mi.core.common import BaseEnum, InstErrorCode
 from mi.core.instrument.data_particle import DataParticleKey
 from mi.core.instrument.data_particle import RawDataParticle
+from mi.core.instrument.prompt_matcher import PromptMatcher
+from mi.core.instrument.bounded_buffer import BoundedBuffer
+from mi.core.instrument.bounded_buffer import DEFAULT_BUFFER_SIZE
+from mi.core.instrument.io_loop import Future
 from mi.core.instrument.instrument_driver import DriverConfigKey
 from mi.core.driver_scheduler import DriverScheduler
 from mi.core.driver_scheduler import DriverSchedulerConfigKey
@@ -86,7 +91,7 @@ class InstrumentProtocol(object):
         log.error("base got_data.  Who called me?")
         pass
 
-    def _extract_sample(self, particle_class, regex, line, timestamp, publish=True):
+    def _extract_sample(self, particle_class, regex, line, timestamp, publish=True, match=None):
         """
         Extract sample from a response line if present and publish
         parsed particle
@@ -100,23 +105,29 @@ class InstrumentProtocol(object):
         @param publish boolean to publish samples (default True). If True,
                two different events are published: one to notify raw data and
                the other to notify parsed data.
-
-        @retval dict of dicts {'parsed': parsed_sample, 'raw': raw_sample} if
-                the line can be parsed for a sample. Otherwise, None.
+        @param match A match of the line already found by the chunker sieve
+               (a SieveMatch). If given, the regex isn't run again. Either
+               way the match is handed to the particle so it doesn't need to
+               match the line itself.
+
+        @retval The particle dict if the line can be parsed for a sample,
+                otherwise None. The same dict is published as the sample
+                event value, it is serialized when the event leaves the
+                driver process.
         @todo Figure out how the agent wants the results for a single poll
             and return them that way from here
         """
         sample = None
-        if regex.match(line):
-        
-            particle = particle_class(line, port_timestamp=timestamp)
-            parsed_sample = particle.generate()
+        if match is None:
+            match = regex.match(line)
+
+        if match:
+            particle = particle_class(line, port_timestamp=timestamp, match=match)
+            sample = particle.generate_dict()
 
             if publish and self._driver_event:
-                self._driver_event(DriverAsyncEvent.SAMPLE, parsed_sample)
-    
-            sample = json.loads(parsed_sample)
-            return sample
+                self._driver_event(DriverAsyncEvent.SAMPLE, sample)
+
         return sample
 
     def get_current_state(self):
@@ -337,6 +348,22 @@ class InstrumentProtocol(object):
     ########################################################################
     # Command build and response parse handlers.
     ########################################################################            
+    def set_buffer_size(self, buffer_size):
+        """
+        Change the size limit of the protocol input buffers. The base
+        protocol doesn't buffer input.
+        @param buffer_size new limit in bytes
+        """
+        pass
+
+    def get_buffer_stats(self):
+        """
+        Return counters for the protocol input buffers. The base protocol
+        doesn't buffer input.
+        @retval dict of BufferStatsKey => value
+        """
+        return {}
+
     def _add_response_handler(self, cmd, func, state=None):
         """
         Insert a handler class responsible for handling the response to a
@@ -454,18 +481,30 @@ class InstrumentProtocol(object):
         else:
             return '%e' % v
 
+class BufferStatsKey(BaseEnum):
+    """
+    Keys for the line and prompt buffer counters
+    """
+    BUFFER_SIZE = 'buffer_size'
+    LINE_BYTES_BUFFERED = 'line_bytes_buffered'
+    LINE_BYTES_DROPPED = 'line_bytes_dropped'
+    PROMPT_BYTES_BUFFERED = 'prompt_bytes_buffered'
+    PROMPT_BYTES_DROPPED = 'prompt_bytes_dropped'
+
 class CommandResponseInstrumentProtocol(InstrumentProtocol):
     """
     Base class for text-based command-response instruments.
     """
     
-    def __init__(self, prompts, newline, driver_event):
+    def __init__(self, prompts, newline, driver_event, buffer_size=DEFAULT_BUFFER_SIZE):
         """
         Constructor.
         @param prompts Enum class containing possible device prompts used for
         command response logic.
         @param newline The device newline.
         @driver_event The callback for asynchronous driver events.
+        @param buffer_size The most bytes to keep in each of the line and
+        prompt buffers. The oldest data is dropped past that.
         """
         
         # Construct superclass.
@@ -477,12 +516,22 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         # Class of prompts used by device.
         self._prompts = prompts
     
+        # Longest first prompt list, built from self._prompts when needed.
+        self._sorted_prompts = None
+
+        # Notified each time data is added to the line and prompt buffers.
+        self._buffer_condition = threading.Condition()
+
+        # Prompt automatons keyed by prompt list, reset with the prompt
+        # buffer.
+        self._prompt_matchers = {}
+
         # Line buffer for input from device.
-        self._linebuf = ''
+        self._line_buffer = BoundedBuffer(buffer_size)
         
         # Short buffer to look for prompts from device in command-response
         # mode.
-        self._promptbuf = ''
+        self._prompt_buffer = BoundedBuffer(buffer_size)
         
         # Lines of data awaiting further processing.
         self._datalines = []
@@ -501,14 +550,120 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         assumption is the longer is more specific.
         @return: list of prompts orders by length.
         """
-        if(isinstance(self._prompts, list)):
-            prompts = self._prompts
-        else:
-            prompts = self._prompts.list()
+        if self._sorted_prompts is None or self._sorted_prompts[0] is not self._prompts:
+            if(isinstance(self._prompts, list)):
+                prompts = self._prompts
+            else:
+                prompts = self._prompts.list()
+
+            self._sorted_prompts = (self._prompts,
+                                    sorted(prompts, key=len, reverse=True))
+
+        return self._sorted_prompts[1]
 
-        prompts.sort(lambda x,y: cmp(len(y), len(x)))
+    def _get_linebuf(self):
+        with self._buffer_condition:
+            return self._line_buffer.getvalue()
+
+    def _set_linebuf(self, value):
+        """
+        Replace the line buffer, usually to clear it.
+        """
+        with self._buffer_condition:
+            self._line_buffer.clear()
+            self._line_buffer.append(value)
+
+    _linebuf = property(_get_linebuf, _set_linebuf)
+
+    def _get_promptbuf(self):
+        with self._buffer_condition:
+            return self._prompt_buffer.getvalue()
+
+    def _set_promptbuf(self, value):
+        """
+        Replace the prompt buffer, usually to clear it, and start the prompt
+        automatons over on the new contents.
+        """
+        with self._buffer_condition:
+            self._prompt_buffer.clear()
+            self._prompt_buffer.append(value)
+            self._reset_prompt_matchers()
 
-        return prompts
+    _promptbuf = property(_get_promptbuf, _set_promptbuf)
+
+    def _reset_prompt_matchers(self):
+        for matcher in self._prompt_matchers.itervalues():
+            matcher.reset()
+
+    def set_buffer_size(self, buffer_size):
+        """
+        Change the most bytes kept in each of the line and prompt buffers.
+        @param buffer_size new limit in bytes
+        @raise InstrumentParameterException if buffer_size isn't a positive int
+        """
+        with self._buffer_condition:
+            self._line_buffer.max_size = buffer_size
+            self._prompt_buffer.max_size = buffer_size
+            self._reset_prompt_matchers()
+
+    def get_buffer_stats(self):
+        """
+        Return the line and prompt buffer counters.
+        @retval dict of BufferStatsKey => value
+        """
+        with self._buffer_condition:
+            return {
+                BufferStatsKey.BUFFER_SIZE: self._line_buffer.max_size,
+                BufferStatsKey.LINE_BYTES_BUFFERED: len(self._line_buffer),
+                BufferStatsKey.LINE_BYTES_DROPPED: self._line_buffer.bytes_dropped,
+                BufferStatsKey.PROMPT_BYTES_BUFFERED: len(self._prompt_buffer),
+                BufferStatsKey.PROMPT_BYTES_DROPPED: self._prompt_buffer.bytes_dropped,
+            }
+
+    def _find_prompt(self, prompt_list):
+        """
+        Look for prompts in the prompt buffer. Only the bytes added since the
+        last look are scanned.
+        @param prompt_list prompts in priority order, as from _get_prompts()
+        @retval (prompt, index) of the first prompt in the list found in the
+        prompt buffer, None if there isn't one there.
+        """
+        with self._buffer_condition:
+            key = tuple(prompt_list)
+            matcher = self._prompt_matchers.get(key)
+            if matcher is None:
+                matcher = PromptMatcher(key)
+                self._prompt_matchers[key] = matcher
+
+            if matcher.offset < len(self._prompt_buffer):
+                matcher.feed(self._prompt_buffer.getvalue(matcher.offset))
+
+            return matcher.match()
+
+    def _wait_for_buffer(self, match, timeout):
+        """
+        Wait for something to show up in the line or prompt buffers. match is
+        called now and again each time data is added to the buffers, so the
+        wait ends as soon as the data arrives rather than on the next poll.
+        
+        @param match Callable checking the buffers, returning None until what
+        it is looking for is there
+        @param timeout The timeout in seconds
+        @retval The first result of match that isn't None, None on timeout
+        """
+        deadline = time.time() + timeout
+
+        with self._buffer_condition:
+            while True:
+                result = match()
+                if result is not None:
+                    return result
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+
+                self._buffer_condition.wait(remaining)
 
     def _get_response(self, timeout=10, expected_prompt=None):
         """
@@ -523,9 +678,6 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         presented by this string
         @throw InstrumentProtocolExecption on timeout
         """
-        # Grab time for timeout and wait for prompt.
-
-        starttime = time.time()
         if expected_prompt == None:
             prompt_list = self._get_prompts()
         else:
@@ -534,17 +686,17 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
             else:
                 prompt_list = expected_prompt
 
-        while True:
-            for item in prompt_list:
-                index = self._promptbuf.find(item)
-                if index >= 0:
-                    result = self._promptbuf[0:index+len(item)]
-                    return (item, result)
-                else:
-                    time.sleep(.1)
+        def find_prompt():
+            found = self._find_prompt(prompt_list)
+            if found is not None:
+                (item, index) = found
+                return (item, self._promptbuf[0:index+len(item)])
 
-            if time.time() > starttime + timeout:
-                raise InstrumentTimeoutException("in InstrumentProtocol._get_response()")
+        response = self._wait_for_buffer(find_prompt, timeout)
+        if response is None:
+            raise InstrumentTimeoutException("in InstrumentProtocol._get_response()")
+
+        return response
 
     def _get_raw_response(self, timeout=10, expected_prompt=None):
         """
@@ -556,10 +708,8 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         presented by this string
         @throw InstrumentProtocolExecption on timeout
         """
-        # Grab time for timeout and wait for prompt.
         strip_chars = "\t "
 
-        starttime = time.time()
         if expected_prompt == None:
             prompt_list = self._get_prompts()
         else:
@@ -568,15 +718,16 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
             else:
                 prompt_list = expected_prompt
 
-        while True:
+        def find_prompt():
             for item in prompt_list:
                 if self._promptbuf.rstrip(strip_chars).endswith(item.rstrip(strip_chars)):
                     return (item, self._linebuf)
-                else:
-                    time.sleep(.1)
 
-            if time.time() > starttime + timeout:
-                raise InstrumentTimeoutException("in InstrumentProtocol._get_raw_response()")
+        response = self._wait_for_buffer(find_prompt, timeout)
+        if response is None:
+            raise InstrumentTimeoutException("in InstrumentProtocol._get_raw_response()")
+
+        return response
 
     def _do_cmd_resp(self, cmd, *args, **kwargs):
         """
@@ -713,10 +864,30 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
 
             self._chunker.add_chunk(data, timestamp)
 
-            (timestamp, chunk) = self._chunker.get_next_data()
+            (timestamp, chunk, match) = self._chunker.get_next_tagged_data()
             while(chunk):
-                self._got_chunk(chunk, timestamp)
-                (timestamp, chunk) = self._chunker.get_next_data()
+                if match is None:
+                    self._got_chunk(chunk, timestamp)
+                else:
+                    self._got_tagged_chunk(chunk, timestamp, match)
+                (timestamp, chunk, match) = self._chunker.get_next_tagged_data()
+
+    def _got_tagged_chunk(self, chunk, timestamp, match):
+        """
+        Called instead of _got_chunk for chunks the sieve tagged with a
+        SieveMatch. The chunk goes straight to the particle class the sieve
+        matched without being matched again. Chunks that aren't tagged with
+        a particle class are passed to _got_chunk.
+
+        @param chunk The data chunk
+        @param timestamp The port agent timestamp of the chunk
+        @param match The SieveMatch for the chunk
+        """
+        if match.particle_class is None:
+            self._got_chunk(chunk, timestamp)
+        else:
+            self._extract_sample(match.particle_class, match.re, chunk,
+                                 timestamp, match=match)
 
     ########################################################################
     # Incomming raw data callback.
@@ -737,17 +908,22 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
                                    port_timestamp=port_agent_packet.get_timestamp())
 
         if self._driver_event:
-            self._driver_event(DriverAsyncEvent.SAMPLE, particle.generate())
+            self._driver_event(DriverAsyncEvent.SAMPLE, particle.generate_dict())
 
     def add_to_buffer(self, data):
         '''
         Add a chunk of data to the internal data buffers
         @param data: bytes to add to the buffer
         '''
-        # Update the line and prompt buffers.
-        self._linebuf += data
-        self._promptbuf += data
-        self._last_data_timestamp = time.time()
+        # Update the line and prompt buffers and wake anyone waiting on them.
+        # Prompt offsets are lost along with any data dropped from the front
+        # of the prompt buffer, so the automatons start over on what is left.
+        with self._buffer_condition:
+            self._line_buffer.append(data)
+            if self._prompt_buffer.append(data):
+                self._reset_prompt_matchers()
+            self._last_data_timestamp = time.time()
+            self._buffer_condition.notify_all()
 
     ########################################################################
     # Wakeup helpers.
@@ -764,7 +940,8 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         """
         Clear buffers and send a wakeup command to the instrument
         @param timeout The timeout to wake the device.
-        @param delay The time to wait between consecutive wakeups.
+        @param delay The longest time to wait for a prompt before sending
+        another wakeup.
         @throw InstrumentTimeoutException if the device could not be woken.
         """
         # Clear the prompt buffer.
@@ -773,24 +950,26 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
         
         # Grab time for timeout.
         starttime = time.time()
+
+        prompts = self._get_prompts()
+        log.debug("Prompts: %s" % prompts)
+
+        def find_prompt():
+            found = self._find_prompt(prompts)
+            if found is not None:
+                return found[0]
         
         while True:
-            # Send a line return and wait a sec.
+            # Send a line return and wait for a prompt, at most delay.
             log.trace('Sending wakeup. timeout=%s' % timeout)
             self._send_wakeup()
-            time.sleep(delay)
 
-            log.debug("Prompts: %s" % self._get_prompts())
-
-            for item in self._get_prompts():
-                log.debug("buffer: %s" % self._promptbuf)
-                log.debug("find prompt: %s" % item)
-                index = self._promptbuf.find(item)
-                log.debug("Got prompt (index: %s): %s " % (index, repr(self._promptbuf)))
-                if index >= 0:
-                    log.trace('wakeup got prompt: %s' % repr(item))
-                    return item
+            prompt = self._wait_for_buffer(find_prompt, delay)
+            if prompt is not None:
+                log.trace('wakeup got prompt: %s' % repr(prompt))
+                return prompt
 
+            log.debug("no prompt in buffer: %s" % repr(self._promptbuf))
             if time.time() > starttime + timeout:
                 raise InstrumentTimeoutException("in _wakeup()")
 
@@ -817,7 +996,219 @@ class CommandResponseInstrumentProtocol(InstrumentProtocol):
                 count += 1
                 if count >= no_tries:
                     raise InstrumentProtocolException('Incorrect prompt.')
-                    
+
+
+class AsyncCommandResponse(object):
+    """
+    Runs command-response exchanges with a CommandResponseInstrumentProtocol
+    device on an IOLoop instead of blocking a thread in _get_response.
+    Give got_data to the port agent client as its data callback in place of
+    the protocol's; it feeds the protocol, then checks the exchange under
+    way for its prompt. Exchanges run one at a time in the order they are
+    made, each timed by the loop.
+
+    adapter = AsyncCommandResponse(protocol, loop)
+    client.init_comms(adapter.got_data, protocol.got_raw, got_exception)
+    future = adapter.do_cmd_resp(Command.DS, timeout=10)
+    status = future.result()
+    """
+
+    class Exchange(object):
+        """
+        One command-response exchange.
+        """
+        WAKEUP = 'wakeup'
+        RESPONSE = 'response'
+
+        def __init__(self, cmd, cmd_line, future, timeout=10, expected_prompt=None,
+                     write_delay=0, wakeup_delay=1):
+            self.cmd = cmd
+            self.cmd_line = cmd_line
+            self.future = future
+            self.timeout = timeout
+            self.expected_prompt = expected_prompt
+            self.write_delay = write_delay
+            self.wakeup_delay = wakeup_delay
+            self.phase = None
+            self.deadline = None
+            self.timer = None
+
+    def __init__(self, protocol, loop):
+        """
+        @param protocol The CommandResponseInstrumentProtocol to exchange
+        commands for.
+        @param loop The IOLoop delivering the protocol's data.
+        """
+        self._protocol = protocol
+        self._loop = loop
+        self._pending = deque()
+        self._exchange = None
+
+    def got_data(self, port_agent_packet):
+        """
+        Port agent data callback, called on the loop thread.
+        """
+        self._protocol.got_data(port_agent_packet)
+        if self._exchange is not None:
+            self._check()
+
+    def do_cmd_resp(self, cmd, *args, **kwargs):
+        """
+        Perform a command-response on the device, as _do_cmd_resp does.
+        May be called from any thread.
+        @param cmd The command to execute.
+        @param args positional arguments to pass to the build handler.
+        @param timeout=timeout optional wakeup and command timeout.
+        @param expected_prompt=prompt optional prompt or prompts ending the
+        response.
+        @param write_delay=delay optional delay between characters sent.
+        @retval Future for the (possibly parsed) response result, failing
+        with InstrumentTimeoutException if the device could not be woken or
+        the response did not occur in time, or InstrumentProtocolException
+        if the command could not be built.
+        """
+        future = Future()
+        build_handler = self._protocol._build_handlers.get(cmd, None)
+        if not build_handler:
+            future.set_exception(InstrumentProtocolException('Cannot build command: %s' % cmd))
+            return future
+
+        exchange = self.Exchange(cmd, build_handler(cmd, *args), future, **kwargs)
+        self._loop.call_soon_threadsafe(self._queue, exchange)
+        return future
+
+    def _queue(self, exchange):
+        self._pending.append(exchange)
+        if self._exchange is None:
+            self._next()
+
+    def _next(self):
+        if not self._pending:
+            return
+
+        exchange = self._pending.popleft()
+        self._exchange = exchange
+        exchange.phase = self.Exchange.WAKEUP
+        exchange.deadline = self._loop.time() + exchange.timeout
+        self._protocol._promptbuf = ''
+        self._send_wakeup(exchange)
+
+    def _send_wakeup(self, exchange):
+        """
+        Send a wakeup, then another every wakeup_delay until a prompt comes
+        back or the timeout passes.
+        """
+        exchange.timer = None
+        log.trace('Sending wakeup. timeout=%s' % exchange.timeout)
+        self._protocol._send_wakeup()
+        if self._check() or exchange is not self._exchange:
+            return
+
+        if self._loop.time() > exchange.deadline:
+            self._finish(exception=InstrumentTimeoutException("in _wakeup()"))
+        else:
+            exchange.timer = self._loop.call_later(exchange.wakeup_delay,
+                                                   self._send_wakeup, exchange)
+
+    def _send_command(self, exchange):
+        """
+        Clear the buffers and send the command, a character at a time if
+        it has a write delay, then wait for the response.
+        """
+        self._protocol._linebuf = ''
+        self._protocol._promptbuf = ''
+        exchange.phase = None
+
+        log.debug('do_cmd_resp: %s, timeout=%s, write_delay=%s, expected_prompt=%s,' %
+                  (repr(exchange.cmd_line), exchange.timeout, exchange.write_delay,
+                   exchange.expected_prompt))
+
+        if exchange.write_delay == 0:
+            self._protocol._connection.send(exchange.cmd_line)
+            self._wait_for_response(exchange)
+        else:
+            self._send_char(exchange, 0)
+
+    def _send_char(self, exchange, index):
+        self._protocol._connection.send(exchange.cmd_line[index])
+        if index + 1 < len(exchange.cmd_line):
+            exchange.timer = self._loop.call_later(exchange.write_delay, self._send_char,
+                                                   exchange, index + 1)
+        else:
+            exchange.timer = self._loop.call_later(exchange.write_delay,
+                                                   self._wait_for_response, exchange)
+
+    def _wait_for_response(self, exchange):
+        exchange.phase = self.Exchange.RESPONSE
+        exchange.timer = self._loop.call_later(exchange.timeout, self._finish, None,
+            InstrumentTimeoutException("in InstrumentProtocol._get_response()"))
+        self._check()
+
+    def _check(self):
+        """
+        Look for the prompt the exchange under way is waiting for, and move
+        it on if it's there.
+        @retval True if the prompt was found.
+        """
+        exchange = self._exchange
+        if exchange.phase == self.Exchange.WAKEUP:
+            found = self._protocol._find_prompt(self._protocol._get_prompts())
+            if found is None:
+                return False
+
+            log.trace('wakeup got prompt: %s' % repr(found[0]))
+            if exchange.timer:
+                exchange.timer.cancel()
+            self._send_command(exchange)
+            return True
+
+        if exchange.phase == self.Exchange.RESPONSE:
+            if exchange.expected_prompt is None:
+                prompt_list = self._protocol._get_prompts()
+            elif isinstance(exchange.expected_prompt, str):
+                prompt_list = [exchange.expected_prompt]
+            else:
+                prompt_list = exchange.expected_prompt
+
+            found = self._protocol._find_prompt(prompt_list)
+            if found is None:
+                return False
+
+            (prompt, index) = found
+            self._finish((prompt, self._protocol._promptbuf[0:index+len(prompt)]))
+            return True
+
+        return False
+
+    def _finish(self, response=None, exception=None):
+        """
+        End the exchange under way with its parsed response or an
+        exception, and start the next.
+        """
+        exchange = self._exchange
+        self._exchange = None
+        if exchange.timer:
+            exchange.timer.cancel()
+
+        if exception is None:
+            (prompt, result) = response
+            protocol = self._protocol
+            resp_handler = protocol._response_handlers.get((protocol.get_current_state(), exchange.cmd), None) or \
+                protocol._response_handlers.get(exchange.cmd, None)
+            try:
+                resp_result = None
+                if resp_handler:
+                    resp_result = resp_handler(result, prompt)
+            except Exception as e:
+                exception = e
+
+        if exception is None:
+            exchange.future.set_result(resp_result)
+        else:
+            exchange.future.set_exception(exception)
+
+        self._next()
+
                 
 class MenuInstrumentProtocol(CommandResponseInstrumentProtocol):
     """
@@ -934,11 +1325,14 @@ class MenuInstrumentProtocol(CommandResponseInstrumentProtocol):
         @param driver_event The callback for asynchronous driver events.
         @param read_delay optional kwarg specifying amount of time to delay before
                attempting to read response from instrument (in _get_response).
+        @param buffer_size optional kwarg specifying the most bytes to keep in
+               each of the line and prompt buffers.
 
         """
         
         # Construct superclass.
-        CommandResponseInstrumentProtocol.__init__(self, prompts, newline, driver_event)
+        CommandResponseInstrumentProtocol.__init__(self, prompts, newline, driver_event,
+                                                   kwargs.get('buffer_size', DEFAULT_BUFFER_SIZE))
         self._menu = menu
 
         # The end of line delimiter.                
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.io_loop
+@file mi/core/instrument/io_loop.py
+@brief Single threaded event loop for socket I/O and timers.
+
+An IOLoop polls any number of sockets and runs timed callbacks from one
+thread, so many instrument connections can be serviced without a thread, or
+a timer thread, per connection. Futures carry results from the loop back to
+the threads waiting on them.
+
+loop = IOLoop()
+loop.start()
+handle = loop.call_later(5, callback, arg)
+handle.cancel()
+future = loop.submit(function, arg)
+result = future.result(timeout=10)
+loop.stop()
+
+Readers, writers and timers are only added and removed from the loop
+thread; other threads hand work to the loop with call_soon_threadsafe() or
+submit().
+"""
+
+__license__ = 'Apache 2.0'
+
+import os
+import time
+import heapq
+import errno
+import fcntl
+import select
+import thread
+import threading
+from collections import deque
+
+from mi.core.exceptions import InstrumentTimeoutException
+
+from mi.core.log import get_logger
+log = get_logger()
+
+POLL_READ = select.POLLIN | select.POLLPRI | select.POLLHUP | select.POLLERR
+POLL_WRITE = select.POLLOUT | select.POLLHUP | select.POLLERR
+
+def _fileno(fd):
+    """
+    @param fd A file descriptor or an object with a fileno() method.
+    @retval The file descriptor.
+    """
+    if isinstance(fd, (int, long)):
+        return fd
+    return fd.fileno()
+
+class TimerHandle(object):
+    """
+    A callback scheduled by IOLoop.call_later().
+    """
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Keep the callback from running, if it hasn't already.
+        """
+        self.cancelled = True
+
+    def __lt__(self, other):
+        return self.when < other.when
+
+class Future(object):
+    """
+    The result of work done on the loop, set once by the loop and waited for
+    by any thread.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        return self._done
+
+    def result(self, timeout=None):
+        """
+        Wait for the result. Don't call this from the loop thread, which
+        would never get to set it.
+        @param timeout Longest time to wait in seconds, None for no limit.
+        @retval The result.
+        @raise The exception the work failed with.
+        @raise InstrumentTimeoutException if the result isn't set in time.
+        """
+        with self._condition:
+            if not self._done:
+                if timeout is None:
+                    while not self._done:
+                        self._condition.wait()
+                else:
+                    deadline = time.time() + timeout
+                    while not self._done:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise InstrumentTimeoutException("in Future.result()")
+                        self._condition.wait(remaining)
+
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        """
+        @retval The exception the work failed with, None if it hasn't
+        (yet).
+        """
+        return self._exception
+
+    def set_result(self, result):
+        self._set(result, None)
+
+    def set_exception(self, exception):
+        self._set(None, exception)
+
+    def _set(self, result, exception):
+        with self._condition:
+            if self._done:
+                return
+            self._result = result
+            self._exception = exception
+            self._done = True
+            self._condition.notify_all()
+            callbacks = self._callbacks
+            self._callbacks = []
+
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        """
+        Call callback(future) once the future is done, straight away if it
+        already is.
+        """
+        with self._condition:
+            if not self._done:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+class IOLoop(object):
+    """
+    poll() based reactor running socket callbacks and timers on one thread.
+    """
+    def __init__(self):
+        self._poll = select.poll()
+        self._handlers = {}
+        self._timers = []
+        self._ready = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_id = None
+        self._stopping = False
+
+        # Writing to the wakeup pipe breaks the loop out of poll() when
+        # another thread hands it work.
+        (self._wakeup_read, self._wakeup_write) = os.pipe()
+        for fd in (self._wakeup_read, self._wakeup_write):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        self._poll.register(self._wakeup_read, select.POLLIN)
+
+    def time(self):
+        return time.time()
+
+    def in_loop_thread(self):
+        return self._thread_id == thread.get_ident()
+
+    def start(self):
+        """
+        Run the loop in a daemon thread.
+        @retval The thread.
+        """
+        self._thread = threading.Thread(target=self.run_forever, name='IOLoop')
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """
+        Stop the loop once it has run the callbacks that are ready. May be
+        called from any thread.
+        """
+        self._stopping = True
+        self._wakeup()
+
+    def join(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+
+    def close(self):
+        """
+        Release the wakeup pipe once the loop has stopped.
+        """
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+
+    def _wakeup(self):
+        if not self.in_loop_thread():
+            try:
+                os.write(self._wakeup_write, 'x')
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+
+    def call_soon(self, callback, *args):
+        """
+        Run callback(*args) on the next pass of the loop. Callbacks run in
+        the order they are added.
+        """
+        self._ready.append((callback, args))
+
+    def call_soon_threadsafe(self, callback, *args):
+        """
+        call_soon() for threads other than the loop's.
+        """
+        self._ready.append((callback, args))
+        self._wakeup()
+
+    def call_later(self, delay, callback, *args):
+        """
+        Run callback(*args) after delay seconds.
+        @retval TimerHandle to cancel the callback with.
+        """
+        handle = TimerHandle(self.time() + delay, callback, args)
+        with self._lock:
+            heapq.heappush(self._timers, handle)
+        self._wakeup()
+        return handle
+
+    def submit(self, callback, *args):
+        """
+        Run callback(*args) on the loop.
+        @retval Future for what callback returns or raises.
+        """
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(callback(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.call_soon_threadsafe(run)
+        return future
+
+    def add_reader(self, fd, callback, *args):
+        """
+        Run callback(*args) whenever fd is readable.
+        """
+        self._set_handler(_fileno(fd), 0, (callback, args))
+
+    def remove_reader(self, fd):
+        self._set_handler(_fileno(fd), 0, None)
+
+    def add_writer(self, fd, callback, *args):
+        """
+        Run callback(*args) whenever fd is writable.
+        """
+        self._set_handler(_fileno(fd), 1, (callback, args))
+
+    def remove_writer(self, fd):
+        self._set_handler(_fileno(fd), 1, None)
+
+    def _set_handler(self, fd, index, handler):
+        handlers = self._handlers.get(fd, [None, None])
+        handlers[index] = handler
+
+        mask = 0
+        if handlers[0]:
+            mask |= POLL_READ
+        if handlers[1]:
+            mask |= POLL_WRITE
+
+        if mask:
+            self._handlers[fd] = handlers
+            self._poll.register(fd, mask)
+        elif fd in self._handlers:
+            del self._handlers[fd]
+            self._poll.unregister(fd)
+
+    def run_forever(self):
+        """
+        Run the loop until stop() is called.
+        """
+        self._thread_id = thread.get_ident()
+        log.debug('IOLoop started.')
+        try:
+            while not self._stopping:
+                self._run_once()
+        finally:
+            self._thread_id = None
+            self._stopping = False
+            log.debug('IOLoop stopped.')
+
+    def _run_once(self):
+        timeout = -1
+        if self._ready:
+            timeout = 0
+        else:
+            with self._lock:
+                while self._timers and self._timers[0].cancelled:
+                    heapq.heappop(self._timers)
+                if self._timers:
+                    timeout = max(0, int((self._timers[0].when - self.time()) * 1000) + 1)
+
+        try:
+            events = self._poll.poll(timeout)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            events = []
+
+        for (fd, mask) in events:
+            if fd == self._wakeup_read:
+                self._drain_wakeup()
+                continue
+
+            # Look the handlers up as each event is dispatched, an earlier
+            # callback may have removed them.
+            if mask & POLL_READ:
+                handlers = self._handlers.get(fd)
+                if handlers and handlers[0]:
+                    self._run_callback(*handlers[0])
+            if mask & POLL_WRITE:
+                handlers = self._handlers.get(fd)
+                if handlers and handlers[1]:
+                    self._run_callback(*handlers[1])
+
+        now = self.time()
+        due = []
+        with self._lock:
+            while self._timers and self._timers[0].when <= now:
+                due.append(heapq.heappop(self._timers))
+        for handle in due:
+            if not handle.cancelled:
+                self._run_callback(handle.callback, handle.args)
+
+        # Only run the callbacks that were ready at this point, ones they
+        # add wait for the next pass.
+        for i in range(len(self._ready)):
+            (callback, args) = self._ready.popleft()
+            self._run_callback(callback, args)
+
+    def _drain_wakeup(self):
+        try:
+            while os.read(self._wakeup_read, 4096):
+                pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def _run_callback(self, callback, args):
+        try:
+            callback(*args)
+        except Exception:
+            log.error('Exception in IOLoop callback %r', callback, exc_info=True)
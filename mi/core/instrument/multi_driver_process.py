@@ -0,0 +1,394 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.multi_driver_process
+@file mi/core/instrument/multi_driver_process.py
+@brief Driver process hosting many instrument drivers.
+
+A MultiDriverProcess runs several drivers in one OS process behind one
+command socket and one event socket, for nodes serving many low rate
+instruments. Each driver has an id. Command messages carry it as
+'driver_id' and are routed to that driver; events go out with it as the
+first frame of each message, so a client subscribes to its own driver's
+events. ZmqDriverClient does both given a driver_id.
+
+Commands for different drivers run concurrently, each driver's in order on
+a worker thread of its own. Each driver has its own event queue, with the
+queue settings of the host, and its own negotiated codec.
+
+Messages without a driver_id are for the host itself:
+'add_driver' - given a driver id, module and class, construct and start
+another driver.
+'remove_driver' - given a driver id, stop routing to that driver and drop
+it.
+'list_drivers' - return the ids of the hosted drivers.
+'get_event_queue_stats' - return event queue stats by driver id.
+'process_echo' - echos the message back.
+'stop_driver_process' - signal to close messaging and terminate.
+A driver's own 'stop_driver_process' removes just that driver.
+
+To launch a host:
+import mi.core.instrument.multi_driver_process as mdp
+(p, cmd_port, evt_port) = mdp.MultiDriverProcess.launch_process(
+    [('sbe37_1', 'mi.instrument.seabird.sbe37smb.ooicore.driver', 'SBE37Driver'),
+     ('sbe37_2', 'mi.instrument.seabird.sbe37smb.ooicore.driver', 'SBE37Driver')])
+"""
+
+__license__ = 'Apache 2.0'
+
+import uuid
+import Queue
+import cPickle as pickle
+from threading import Thread
+from threading import Condition
+
+import zmq
+
+from mi.core.exceptions import InstrumentCommandException
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.exceptions import DriverLaunchException
+from mi.core.util import zmq_module
+from mi.core.instrument import zmq_codec
+from mi.core.instrument.event_queue import EventQueue
+from mi.core.instrument.event_queue import OverflowPolicy
+from mi.core.instrument.event_queue import DEFAULT_MAX_EVENTS
+
+import mi.core.instrument.driver_process as driver_process
+import mi.core.instrument.zmq_driver_process as zmq_driver_process
+from mi.core.instrument.zmq_driver_process import ZmqDriverProcess
+from mi.core.instrument.zmq_driver_process import STOP_CHECK_INTERVAL
+from mi.core.log import get_logger
+log = get_logger()
+
+class HostedDriver(driver_process.DriverProcess):
+    """
+    A driver in a MultiDriverProcess, with its own event queue, negotiated
+    codec and queue of commands for its worker thread.
+    """
+    def __init__(self, driver_id, driver_module, driver_class, ppid, condition,
+                 max_events=DEFAULT_MAX_EVENTS, overflow_policy=OverflowPolicy.DROP_OLDEST_RAW):
+        """
+        @param driver_id The id commands and events for the driver carry.
+        @param driver_module The python module containing the driver code.
+        @param driver_class The python driver class.
+        @param ppid ID of the parent process.
+        @param condition The host's event condition, shared by the event
+        queues of all its drivers.
+        @param max_events The most events to queue for sending.
+        @param overflow_policy The OverflowPolicy for events arriving while
+        the queue is full.
+        """
+        driver_process.DriverProcess.__init__(self, driver_module, driver_class, ppid)
+        self.driver_id = driver_id
+        self.events = EventQueue(max_events, overflow_policy, condition)
+        self.codec = None
+        self.requests = Queue.Queue()
+        self.worker = None
+
+class MultiDriverProcess(ZmqDriverProcess):
+    """
+    A OS-level driver process hosting many drivers, with a ZMQ ROUTER
+    socket for commands and a PUB socket for events.
+    """
+
+    @classmethod
+    def launch_process(cls, drivers, workdir='/tmp/', ppid=None, batch_size=None,
+                       max_events=DEFAULT_MAX_EVENTS, overflow_policy=OverflowPolicy.DROP_OLDEST_RAW):
+        """
+        Class method constructor to launch MultiDriverProcess as a
+        separate OS process.
+        @param drivers List of (driver id, driver module, driver class).
+        @param workdir The work directory when temporary port files are written.
+        @param ppid ID of the parent process, used to self destruct when
+        parent dies in test cases.
+        @param batch_size The most events from one driver to send in one
+        message. None or 1 sends each event on its own.
+        @param max_events The most events to queue for sending per driver.
+        @param overflow_policy The OverflowPolicy for events arriving while
+        a queue is full.
+        @retval Tuple containing (Popen object for the process, cmd port,
+            evt_port)
+        """
+        tag = str(uuid.uuid4())
+        cmd_port_fname = workdir + 'dvr_cmd_port_%s.txt' % tag
+        evt_port_fname = workdir + 'dvr_evt_port_%s.txt' % tag
+        cmd_str = 'from %s import %s; dp = %s(%r, "%s", "%s", %s, %s, %r, %r);dp.run()' \
+            % (__name__, cls.__name__, cls.__name__, list(drivers),
+               cmd_port_fname, evt_port_fname, str(ppid), str(batch_size),
+               max_events, overflow_policy)
+
+        dvr_proc = driver_process.DriverProcess.launch_process(cmd_str)
+        dvr_cmd_port = zmq_driver_process._read_port_file(cmd_port_fname)
+        dvr_evt_port = zmq_driver_process._read_port_file(evt_port_fname)
+
+        return (dvr_proc, dvr_cmd_port, dvr_evt_port)
+
+    def __init__(self, drivers, cmd_port_fname, evt_port_fname, ppid, batch_size=None,
+                 max_events=DEFAULT_MAX_EVENTS, overflow_policy=OverflowPolicy.DROP_OLDEST_RAW):
+        """
+        @param drivers List of (driver id, driver module, driver class) to
+        host from the start.
+        @param cmd_port_fname Filename for temp cmd port file, None for
+        none.
+        @param evt_port_fname Filename for temp evt port file, None for
+        none.
+        @param ppid ID of the parent process, used to self destruct when
+        parent dies in test cases.
+        @param batch_size The most events from one driver to send in one
+        message. None or 1 sends each event on its own.
+        @param max_events The most events to queue for sending per driver.
+        @param overflow_policy The OverflowPolicy for events arriving while
+        a queue is full.
+        """
+        ZmqDriverProcess.__init__(self, None, None, cmd_port_fname, evt_port_fname, ppid,
+                                  batch_size, max_events=max_events,
+                                  overflow_policy=overflow_policy)
+        self.driver_specs = list(drivers)
+        self.drivers = {}
+        self.max_events = max_events
+        self.overflow_policy = overflow_policy
+        # Notified when any driver queues an event.
+        self.event_condition = Condition()
+        # Drivers removed, whose workers may still be finishing.
+        self.removed_drivers = []
+        self.context = None
+        self.reply_address = 'inproc://driver_replies_%s' % uuid.uuid4()
+
+    def construct_driver(self):
+        """
+        Construct the drivers the host starts with. Drivers that can't be
+        constructed are logged and left out.
+        @retval True
+        """
+        for (driver_id, driver_module, driver_class) in self.driver_specs:
+            try:
+                self.add_driver(driver_id, driver_module, driver_class)
+            except DriverLaunchException as e:
+                log.error('%s', e)
+        return True
+
+    def add_driver(self, driver_id, driver_module, driver_class):
+        """
+        Construct a driver and, if messaging has started, its worker.
+        @param driver_id The id for the driver's commands and events.
+        @param driver_module The python module containing the driver code.
+        @param driver_class The python driver class.
+        @retval driver_id
+        @raise InstrumentParameterException if the id is taken.
+        @raise DriverLaunchException if the driver can't be constructed.
+        """
+        if not isinstance(driver_id, basestring) or driver_id in self.drivers:
+            raise InstrumentParameterException('Invalid or duplicate driver id: %s' % driver_id)
+
+        hosted = HostedDriver(driver_id, driver_module, driver_class, self.ppid,
+                              self.event_condition, self.max_events, self.overflow_policy)
+        if not hosted.construct_driver():
+            raise DriverLaunchException('Could not construct driver %s: %s.%s' %
+                                        (driver_id, driver_module, driver_class))
+
+        self.drivers[driver_id] = hosted
+        if self.context:
+            self.start_worker(hosted)
+        log.info('Hosting driver %s: %s.%s', driver_id, driver_module, driver_class)
+        return driver_id
+
+    def remove_driver(self, driver_id):
+        """
+        Stop routing commands to a driver and drop it, along with any
+        events it has queued.
+        @param driver_id The driver id.
+        @raise InstrumentParameterException if there is no such driver.
+        """
+        hosted = self.drivers.pop(driver_id, None)
+        if hosted is None:
+            raise InstrumentParameterException('Unknown driver id: %s' % driver_id)
+
+        hosted.requests.put(None)
+        self.removed_drivers.append(hosted)
+        hosted.events.close()
+        hosted.shutdown()
+        log.info('Removed driver %s', driver_id)
+
+    def start_worker(self, hosted):
+        """
+        Start the thread running a driver's commands, replying through the
+        command thread.
+        @param hosted The HostedDriver.
+        """
+        def run_cmds(multi_driver_process, hosted):
+            sock = multi_driver_process.context.socket(zmq.PUSH)
+            sock.connect(multi_driver_process.reply_address)
+            while True:
+                request = hosted.requests.get()
+                if request is None:
+                    break
+
+                (envelope, msg) = request
+                cmd = msg.get('cmd', None)
+                codec = hosted.codec
+                if cmd == 'negotiate_codec':
+                    name = zmq_codec.negotiate(msg.get('args')[0])
+                    if name:
+                        hosted.codec = zmq_codec.get_codec(name)
+                    reply = name
+                elif cmd == 'stop_driver_process':
+                    multi_driver_process.remove_driver(hosted.driver_id)
+                    reply = 'stop_driver_process'
+                else:
+                    reply = hosted.cmd_driver(msg)
+                sock.send_multipart(envelope + zmq_driver_process._encode_reply(reply, codec))
+
+            sock.setsockopt(zmq.LINGER, 0)
+            sock.close()
+
+        hosted.worker = Thread(target=run_cmds, args=(self, hosted))
+        hosted.worker.start()
+
+    def start_messaging(self):
+        """
+        Start the command and event threads and the drivers' workers. The
+        command thread polls the ROUTER socket, passing each command to
+        its driver's worker, and the socket the workers send replies back
+        on. The event thread waits on the shared event condition and
+        publishes what each driver has queued, driver by driver.
+        """
+        zmq_lib = zmq_module()
+        self.context = zmq_lib.Context()
+
+        def route_cmd_msg(multi_driver_process):
+            context = multi_driver_process.context
+            sock = context.socket(zmq.ROUTER)
+            multi_driver_process.cmd_port = sock.bind_to_random_port(multi_driver_process.cmd_host_string)
+            log.info('Driver host cmd socket bound to %i', multi_driver_process.cmd_port)
+            replies = context.socket(zmq.PULL)
+            replies.bind(multi_driver_process.reply_address)
+
+            for hosted in multi_driver_process.drivers.values():
+                multi_driver_process.start_worker(hosted)
+
+            if multi_driver_process.cmd_port_fname:
+                file(multi_driver_process.cmd_port_fname,'w+').write(str(multi_driver_process.cmd_port)+'\n')
+            multi_driver_process.port_bound()
+
+            poller = zmq_lib.Poller()
+            poller.register(sock, zmq.POLLIN)
+            poller.register(replies, zmq.POLLIN)
+
+            while not multi_driver_process.stop_cmd_thread:
+                for (ready, flags) in poller.poll(STOP_CHECK_INTERVAL * 1000):
+                    if ready is replies:
+                        sock.send_multipart(replies.recv_multipart())
+                        continue
+
+                    frames = sock.recv_multipart()
+                    split = frames.index('') + 1
+                    (envelope, msg) = (frames[:split], pickle.loads(frames[split]))
+                    log.trace('Routing message %s', msg)
+                    hosted = multi_driver_process.drivers.get(msg.get('driver_id'))
+                    if hosted:
+                        hosted.requests.put((envelope, msg))
+                    else:
+                        reply = multi_driver_process.cmd_driver(msg)
+                        sock.send_multipart(envelope + zmq_driver_process._encode_reply(reply, None))
+
+            for driver_id in multi_driver_process.drivers.keys():
+                multi_driver_process.remove_driver(driver_id)
+            for hosted in multi_driver_process.removed_drivers:
+                if hosted.worker:
+                    hosted.worker.join()
+            sock.setsockopt(zmq.LINGER, 0)
+            sock.close()
+            replies.close()
+            context.term()
+            log.info('Driver host cmd socket closed.')
+
+        def send_evt_msg(multi_driver_process):
+            context = multi_driver_process.context
+            sock = context.socket(zmq.PUB)
+            multi_driver_process.evt_port = sock.bind_to_random_port(multi_driver_process.event_host_string)
+            log.info('Driver host event socket bound to %i', multi_driver_process.evt_port)
+            if multi_driver_process.evt_port_fname:
+                file(multi_driver_process.evt_port_fname,'w+').write(str(multi_driver_process.evt_port)+'\n')
+            multi_driver_process.port_bound()
+
+            condition = multi_driver_process.event_condition
+            while not multi_driver_process.stop_evt_thread:
+                with condition:
+                    while not multi_driver_process.stop_evt_thread and \
+                          not multi_driver_process.events_queued():
+                        condition.wait()
+
+                for hosted in multi_driver_process.drivers.values():
+                    events = hosted.events.take(0)
+                    if events:
+                        multi_driver_process.publish_events(sock, events, hosted.codec,
+                                                            hosted.driver_id)
+
+            sock.setsockopt(zmq.LINGER, 0)
+            sock.close()
+            log.info('Driver host event socket closed')
+
+        # Cleared before the threads start, so a stop requested as soon as
+        # the ports are bound isn't lost.
+        self.stop_cmd_thread = False
+        self.stop_evt_thread = False
+        self.cmd_thread = Thread(target=route_cmd_msg, args=(self, ))
+        self.evt_thread = Thread(target=send_evt_msg, args=(self, ))
+        self.cmd_thread.start()
+        self.evt_thread.start()
+        self.messaging_started = True
+
+    def events_queued(self):
+        """
+        @retval True if any driver has events queued. Call holding the
+        event condition.
+        """
+        for hosted in self.drivers.values():
+            if len(hosted.events):
+                return True
+        return False
+
+    def cmd_driver(self, msg):
+        """
+        Process a command message for the host itself, one with no driver
+        id or an unknown one.
+        @param msg A driver command message.
+        @retval The command result.
+        """
+        cmd = msg.get('cmd', None)
+        args = msg.get('args', None) or ()
+        driver_id = msg.get('driver_id', None)
+        try:
+            if driver_id is not None:
+                raise InstrumentParameterException('Unknown driver id: %s' % driver_id)
+            elif cmd == 'stop_driver_process':
+                self.stop_messaging()
+                return 'stop_driver_process'
+            elif cmd == 'add_driver':
+                return self.add_driver(*args)
+            elif cmd == 'remove_driver':
+                self.remove_driver(*args)
+                return 'remove_driver'
+            elif cmd == 'list_drivers':
+                return sorted(self.drivers.keys())
+            elif cmd == 'get_event_queue_stats':
+                return dict((driver_id, hosted.events.get_stats())
+                            for (driver_id, hosted) in self.drivers.items())
+            elif cmd == 'process_echo':
+                return 'ping from driver host ppid:%s, drivers:%s' % (str(self.ppid),
+                                                                       sorted(self.drivers.keys()))
+            else:
+                return InstrumentCommandException('Unknown driver host command.')
+        except Exception as e:
+            return e
+
+    def stop_messaging(self):
+        """
+        Set flags to cause the command and event threads to conclude,
+        removing the drivers, and wake the event thread.
+        """
+        self.stop_cmd_thread = True
+        self.stop_evt_thread = True
+        with self.event_condition:
+            self.event_condition.notify_all()
+        self.messaging_started = False
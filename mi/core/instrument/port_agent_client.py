@@ -19,32 +19,73 @@ import datetime
 import struct
 import array
 import binascii
-import ctypes
 
 from mi.core.log import get_logger ; log = get_logger()
+from mi.core.common import BaseEnum
 from mi.core.exceptions import InstrumentConnectionException
+from mi.core.exceptions import NotImplementedException
+from mi.core.instrument.heartbeat_watchdog import get_watchdog
 
 HEADER_SIZE = 16 # BBBBHHLL = 1 + 1 + 1 + 1 + 2 + 2 + 4 + 4 = 16
 
+"""
+Port agent packet header: three sync bytes, packet type, packet size
+(including header), checksum and an NTP 32.32 fixed point timestamp.
+"""
+HEADER_STRUCT = struct.Struct('>BBBBHHII')
+SYNC_BYTES = (0xa3, 0x9d, 0x7a)
+
+"""
+The packet size field (including header) and where it sits in the header
+"""
+PACKET_SIZE_OFFSET = 4
+PACKET_SIZE_STRUCT = struct.Struct('>H')
+
+"""
+Listener receive buffer size; at least the largest packet the 16 bit size
+field can describe, so a partial packet always fits.
+"""
+RECV_BUFFER_SIZE = 65536
 
 OFFSET_P_CHECKSUM_LOW = 6
 OFFSET_P_CHECKSUM_HIGH = 7
+CHECKSUM_MASK = 0xffff
 
 """
 Offsets into the unpacked header fields
 """
 SYNC_BYTE1_INDEX = 0
-SYNC_BYTE1_INDEX = 1
-SYNC_BYTE1_INDEX = 2
+SYNC_BYTE2_INDEX = 1
+SYNC_BYTE3_INDEX = 2
 TYPE_INDEX = 3
 LENGTH_INDEX = 4 # packet size (including header)
 CHECKSUM_INDEX = 5
 TIMESTAMP_UPPER_INDEX = 6
-TIMESTAMP_LOWER_INDEX = 6
+TIMESTAMP_LOWER_INDEX = 7
 
 SYSTEM_EPOCH = datetime.date(*time.gmtime(0)[0:3])
 NTP_EPOCH = datetime.date(1900, 1, 1)
 NTP_DELTA = (SYSTEM_EPOCH - NTP_EPOCH).days * 24 * 3600
+NTP_FRACTION = float(2**32)
+
+def ntp_from_fixed(seconds, fraction):
+    """
+    Convert an NTP 32.32 fixed point timestamp to a float NTP time.
+    @param seconds The upper 32 bits, whole seconds
+    @param fraction The lower 32 bits, fractions of a second in 1/2^32
+    @retval NTP time as a float
+    """
+    return seconds + fraction / NTP_FRACTION
+
+def ntp_to_fixed(timestamp):
+    """
+    Convert a float NTP time to an NTP 32.32 fixed point timestamp.
+    @param timestamp NTP time as a float
+    @retval (seconds, fraction) tuple for the upper and lower 32 bits
+    """
+    seconds = int(timestamp)
+    fraction = int((timestamp - seconds) * NTP_FRACTION)
+    return (seconds, min(fraction, 0xffffffff))
 
 
 MAX_SEND_ATTEMPTS = 15              # Max number of times we can get EAGAIN
@@ -79,19 +120,12 @@ class PortAgentPacket():
 
     def unpack_header(self, header):
         self.__header = header
-        #@TODO may want to switch from big endian to network order '!' instead of '>' note network order is big endian.
-        # B = unsigned char size 1 bytes
-        # H = unsigned short size 2 bytes
-        # L = unsigned long size 4 bytes
-        # d = float size8 bytes
-        variable_tuple = struct.unpack_from('>BBBBHHII', header)
-        # change offset to index.
+        variable_tuple = HEADER_STRUCT.unpack_from(header)
         self.__type = variable_tuple[TYPE_INDEX]
-        self.__length = int(variable_tuple[LENGTH_INDEX]) - HEADER_SIZE
-        self.__recv_checksum  = int(variable_tuple[CHECKSUM_INDEX])
-        upper = variable_tuple[TIMESTAMP_UPPER_INDEX]
-        lower = variable_tuple[TIMESTAMP_LOWER_INDEX]
-        self.__port_agent_timestamp = float("%s.%s" % (upper, lower))
+        self.__length = variable_tuple[LENGTH_INDEX] - HEADER_SIZE
+        self.__recv_checksum  = variable_tuple[CHECKSUM_INDEX]
+        self.__port_agent_timestamp = ntp_from_fixed(variable_tuple[TIMESTAMP_UPPER_INDEX],
+                                                     variable_tuple[TIMESTAMP_LOWER_INDEX])
 
     def pack_header(self):
         """
@@ -109,24 +143,11 @@ class PortAgentPacket():
             if self.__type == None:
                 self.__type = self.DATA_FROM_DRIVER
             self.__length = len(self.__data)
-            self.__port_agent_timestamp = time.time() + NTP_DELTA
-
-
-            variable_tuple = (0xa3, 0x9d, 0x7a, self.__type, 
-                              self.__length + HEADER_SIZE, 0x0000, 
-                              self.__port_agent_timestamp)
-
-            # B = unsigned char size 1 bytes
-            # H = unsigned short size 2 bytes
-            # L = unsigned long size 4 bytes
-            # d = float size 8 bytes
-            format = '>BBBBHHd'
-            size = struct.calcsize(format)
-            temp_header = ctypes.create_string_buffer(size)
-            struct.pack_into(format, temp_header, 0, *variable_tuple)
-            self.__header = temp_header.raw
-            #print "here it is: ", binascii.hexlify(self.__header)
-            
+            if self.__port_agent_timestamp == None:
+                self.__port_agent_timestamp = time.time() + NTP_DELTA
+
+            (seconds, fraction) = ntp_to_fixed(self.__port_agent_timestamp)
+
             """
             do the checksum last, since the checksum needs to include the
             populated header fields.  
@@ -134,16 +155,14 @@ class PortAgentPacket():
             do not include a header (as I mistakenly believed when I wrote
             this)
             """
+            self.__header = HEADER_STRUCT.pack(SYNC_BYTES[0], SYNC_BYTES[1], SYNC_BYTES[2],
+                                               self.__type, self.__length + HEADER_SIZE,
+                                               0, seconds, fraction)
             self.__checksum = self.calculate_checksum()
             self.__recv_checksum  = self.__checksum
-
-            """
-            This was causing a problem, and since it is not used for our tests,
-            commented out; if we need it we'll have to fix
-            """
-            #self.__header[OFFSET_P_CHECKSUM_HIGH] = self.__checksum & 0x00ff
-            #self.__header[OFFSET_P_CHECKSUM_LOW] = (self.__checksum & 0xff00) >> 8
-
+            self.__header = HEADER_STRUCT.pack(SYNC_BYTES[0], SYNC_BYTES[1], SYNC_BYTES[2],
+                                               self.__type, self.__length + HEADER_SIZE,
+                                               self.__checksum, seconds, fraction)
 
     def attach_data(self, data):
         self.__data = data
@@ -152,32 +171,17 @@ class PortAgentPacket():
         self.__port_agent_timestamp = timestamp
 
     def calculate_checksum(self):
-        checksum = 0
-        for i in range(HEADER_SIZE):
-            if i < OFFSET_P_CHECKSUM_LOW or i > OFFSET_P_CHECKSUM_HIGH:
-                checksum += struct.unpack_from('B', str(self.__header[i]))[0]
-                
-        for i in range(self.__length):
-            checksum += struct.unpack_from('B', str(self.__data[i]))[0]
-            
-        return checksum
-            
-                                
+        """
+        The sum of every header byte except the checksum field and every
+        payload byte, truncated to the 16 bit checksum field.
+        """
+        header = bytearray(self.__header)
+        checksum = sum(header) - header[OFFSET_P_CHECKSUM_LOW] - header[OFFSET_P_CHECKSUM_HIGH]
+        checksum += sum(bytearray(self.__data))
+        return checksum & CHECKSUM_MASK
+
     def verify_checksum(self):
-        checksum = 0
-        for i in range(HEADER_SIZE):
-            if i < OFFSET_P_CHECKSUM_LOW or i > OFFSET_P_CHECKSUM_HIGH:
-                checksum += struct.unpack_from('B', self.__header[i])[0]
-                
-        for i in range(self.__length):
-            checksum += struct.unpack_from('B', self.__data[i])[0]
-            
-        if checksum == self.__recv_checksum:
-            self.__isValid = True
-        else:
-            self.__isValid = False
-            
-        #log.debug('checksum: %i.' %(checksum))
+        self.__isValid = (self.calculate_checksum() == self.__recv_checksum)
 
     def get_data_size(self):
         return self.__length
@@ -218,6 +222,15 @@ class PortAgentPacket():
         return self.__isValid
                     
 
+class HeartbeatStatsKey(BaseEnum):
+    """
+    Keys of PacketReceiver.get_heartbeat_stats()
+    """
+    HEARTBEAT = 'heartbeat'
+    HEARTBEATS_RECEIVED = 'heartbeats_received'
+    HEARTBEATS_MISSED = 'heartbeats_missed'
+    CONSECUTIVE_MISSED = 'consecutive_missed'
+
 class PortAgentClient(object):
     """
     A port agent process client class to abstract the TCP interface to the 
@@ -277,11 +290,7 @@ class PortAgentClient(object):
             heartbeat_string = str(heartbeat)
             self.send_config_parameter(self.HEARTBEAT_INTERVAL_COMMAND, 
                                        heartbeat_string)
-            self.listener_thread = Listener(self.sock, self.delim, 
-                                            heartbeat, max_missed_heartbeats, 
-                                            self.callback_data,
-                                            self.callback_raw, 
-                                            self.callback_error)
+            self.listener_thread = self._create_listener()
             self.listener_thread.start()
             log.info('PortAgentClient.init_comms(): connected to port agent at %s:%i.'
                            % (self.host, self.port))        
@@ -289,8 +298,24 @@ class PortAgentClient(object):
             errorString = "init_comms(): Exception initializing comms for " +  \
                       str(self.host) + ": " + str(self.port) + ": " + repr(e)
             log.error(errorString, exc_info=True)
-            time.sleep(self.RECOVERY_SLEEP_TIME)
-            self.callback_error(errorString)
+            self._recover_later(errorString)
+
+    def _create_listener(self):
+        """
+        Create the listener for the data socket.
+        """
+        return Listener(self.sock, self.delim, 
+                        self.heartbeat, self.max_missed_heartbeats, 
+                        self.callback_data,
+                        self.callback_raw, 
+                        self.callback_error)
+
+    def _recover_later(self, errorString):
+        """
+        Give the port agent a moment, then attempt recovery.
+        """
+        time.sleep(self.RECOVERY_SLEEP_TIME)
+        self.callback_error(errorString)
 
     def create_connection(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -329,7 +354,6 @@ class PortAgentClient(object):
         contained in a packet object.  
         """
         if (self.user_callback_data):
-            paPacket.verify_checksum()
             self.user_callback_data(paPacket)
         else:
             log.error("No user_callback_data defined")
@@ -340,7 +364,6 @@ class PortAgentClient(object):
         contained in a packet object.  
         """
         if (self.user_callback_raw):
-            paPacket.verify_checksum()
             self.user_callback_raw(paPacket)
         else:
             log.error("No user_callback_raw defined")
@@ -482,31 +505,38 @@ class PortAgentClient(object):
         
         return total_bytes_sent
             
-class Listener(threading.Thread):
+class PacketReceiver(object):
 
     MAX_HEARTBEAT_INTERVAL = 20 # Max, for range checking parameter
     MAX_MISSED_HEARTBEATS = 5   # Max number we can miss 
     HEARTBEAT_FUDGE = 1         # Fudge factor to account for delayed heartbeat
 
     """
-    A listener thread to monitor the client socket data incoming from
-    the port agent process. 
+    Frames the packets received from the port agent, hands them to the
+    callbacks and counts missed heartbeats. Subclasses decide when the
+    socket is read and how the heartbeat is timed.
     """
     
     def __init__(self, sock, delim = None, heartbeat = 0, 
                  max_missed_heartbeats = None, 
                  callback_data = None, callback_raw = None, 
-                 callback_error = None):
+                 callback_error = None, verify_checksum = True):
         """
-        Listener thread constructor.
+        Packet receiver constructor.
         @param sock The socket to listen on.
         @param delim The line delimiter to split incoming lines on, used in
         debugging when no callback is supplied.
         @param callback The callback on data arrival.
+        @param verify_checksum Verify the checksum of each packet received so
+        callbacks can check is_valid().
         """
-        threading.Thread.__init__(self)
         self.sock = sock
         self._done = False
+        self._recv_buffer = bytearray(RECV_BUFFER_SIZE)
+        self._recv_view = memoryview(self._recv_buffer)
+        self._recv_start = 0
+        self._recv_end = 0
+        self.verify_checksum = verify_checksum
         self.linebuf = ''
         self.delim = delim
         self.heartbeat_timer = None
@@ -515,6 +545,8 @@ class Listener(threading.Thread):
         else:
             self.max_missed_heartbeats = max_missed_heartbeats
         self.heartbeat_missed_count = self.max_missed_heartbeats
+        self.heartbeats_received = 0
+        self.heartbeats_missed = 0
         
         self.set_heartbeat(heartbeat)
         
@@ -552,6 +584,7 @@ class Listener(threading.Thread):
     def heartbeat_timeout(self):
         log.error('heartbeat timeout')
         self.heartbeat_missed_count = self.heartbeat_missed_count - 1
+        self.heartbeats_missed += 1
     
         """
         Take corrective action here.
@@ -584,23 +617,14 @@ class Listener(threading.Thread):
         
     def start_heartbeat_timer(self):
         """
-        Note: the threading timer here is only run once.  The cancel
-        only applies if the function has yet run.  You can't reset
-        it and start it again, you have to instantiate a new one.
-        I don't like this; we need to implement a tread timer that 
-        stays up and can be reset and started many times.
+        (Re)start the heartbeat timer, calling heartbeat_timeout() after
+        heartbeat seconds unless restarted first.
         """
-        if self.heartbeat_timer:
-            self.heartbeat_timer.cancel()
+        raise NotImplementedException()
 
-        self.heartbeat_timer = threading.Timer(self.heartbeat, 
-                                            self.heartbeat_timeout)
-        self.heartbeat_timer.start()
-        
     def done(self):
         """
-        Signal to the listener thread to end its processing loop and
-        conclude.
+        Signal to the receiver to stop processing.
         """
         self._done = True
 
@@ -629,14 +653,155 @@ class Listener(threading.Thread):
                 self.start_heartbeat_timer()
                 
             self.heartbeat_missed_count = self.max_missed_heartbeats
-            
-                
+            self.heartbeats_received += 1
+
+    def get_heartbeat_stats(self):
+        """
+        Return the heartbeat counters.
+        @retval dict of HeartbeatStatsKey => value
+        """
+        return {
+            HeartbeatStatsKey.HEARTBEAT: self.heartbeat,
+            HeartbeatStatsKey.HEARTBEATS_RECEIVED: self.heartbeats_received,
+            HeartbeatStatsKey.HEARTBEATS_MISSED: self.heartbeats_missed,
+            HeartbeatStatsKey.CONSECUTIVE_MISSED: self.max_missed_heartbeats - self.heartbeat_missed_count,
+        }
+
+    def receive(self):
+        """
+        Receive from the port agent socket into the free end of the receive
+        buffer, then hand each complete packet to handle_packet.
+        @raise socket.error from the socket, including EWOULDBLOCK
+        """
+        if self._recv_end == len(self._recv_buffer):
+            self._compact_recv_buffer()
+
+        count = self.sock.recv_into(self._recv_view[self._recv_end:])
+        if count == 0:
+            errorString = 'Zero bytes received from port_agent socket'
+            log.error(errorString)
+            self.callback_error(errorString)
+            """
+            This next statement causes the thread to exit.
+            """
+            self._done = True
+            return
+
+        self._recv_end += count
+        self._frame_packets()
+
+    def _frame_packets(self):
+        """
+        Build and handle a packet for every complete packet in the receive
+        buffer. The header is parsed where it lies, the body is copied out
+        once since the buffer is reused by the next receive.
+        """
+        buf = self._recv_buffer
+        view = self._recv_view
+        start = self._recv_start
+        end = self._recv_end
+
+        while end - start >= HEADER_SIZE and not self._done:
+            packet_size = PACKET_SIZE_STRUCT.unpack_from(buf, start + PACKET_SIZE_OFFSET)[0]
+            if packet_size < HEADER_SIZE:
+                errorString = 'Invalid port agent packet size: %d' % packet_size
+                log.error(errorString)
+                self.callback_error(errorString)
+                self._done = True
+                break
+
+            if end - start < packet_size:
+                break
+
+            paPacket = PortAgentPacket()
+            paPacket.unpack_header(view[start:start + HEADER_SIZE].tobytes())
+            paPacket.attach_data(view[start + HEADER_SIZE:start + packet_size].tobytes())
+            if self.verify_checksum:
+                paPacket.verify_checksum()
+            start += packet_size
+
+            self.handle_packet(paPacket)
+
+        if start == end:
+            start = end = 0
+
+        self._recv_start = start
+        self._recv_end = end
+
+    def _compact_recv_buffer(self):
+        """
+        Move a partially received packet to the front of the receive buffer.
+        The buffer holds the largest possible packet so this always frees
+        space.
+        """
+        pending = self._recv_end - self._recv_start
+        self._recv_buffer[0:pending] = self._recv_buffer[self._recv_start:self._recv_end]
+        self._recv_start = 0
+        self._recv_end = pending
+
+class Listener(PacketReceiver, threading.Thread):
+    """
+    A listener thread to monitor the client socket data incoming from
+    the port agent process. 
+    """
+    
+    def __init__(self, sock, delim = None, heartbeat = 0, 
+                 max_missed_heartbeats = None, 
+                 callback_data = None, callback_raw = None, 
+                 callback_error = None, verify_checksum = True,
+                 watchdog = None):
+        """
+        Listener thread constructor; see PacketReceiver.
+        @param watchdog The HeartbeatWatchdog timing heartbeats, by default
+        the one shared by the process.
+        """
+        threading.Thread.__init__(self)
+        PacketReceiver.__init__(self, sock, delim, heartbeat, max_missed_heartbeats,
+                                callback_data, callback_raw, callback_error,
+                                verify_checksum)
+        self.watchdog = watchdog
+
+    def start_heartbeat_timer(self):
+        """
+        Push the heartbeat deadline out by the heartbeat interval. The
+        deadline is watched by the shared watchdog thread, so a heartbeat
+        costs no thread or timer of its own.
+        """
+        if self.heartbeat_timer is None:
+            if self.watchdog is None:
+                self.watchdog = get_watchdog()
+            self.heartbeat_timer = self.watchdog.register(self.heartbeat,
+                                                          self._heartbeat_expired)
+        else:
+            self.heartbeat_timer.reset(self.heartbeat)
+
+    def _heartbeat_expired(self):
+        """
+        Called on the watchdog thread. Handle the missed heartbeat on a
+        thread of its own, as the error callback may block recovering the
+        connection.
+        """
+        if not self._done:
+            thread = threading.Thread(target=self.heartbeat_timeout,
+                                      name='heartbeat_timeout')
+            thread.daemon = True
+            thread.start()
+
+    def done(self):
+        """
+        Signal to the listener thread to end its processing loop and
+        conclude, and stop watching for heartbeats.
+        """
+        PacketReceiver.done(self)
+        if self.heartbeat_timer:
+            self.heartbeat_timer.cancel()
+        
     def run(self):
         """
-        Listener thread processing loop. Block on receive from port agent.
-        Receive HEADER_SIZE bytes to receive the entire header.  From that,
-        get the length of the whole packet (including header); compute the
-        length of the remaining data and read that.  
+        Listener thread processing loop. Receive whatever the port agent has
+        sent into a preallocated buffer and frame every complete packet in it,
+        so a single recv can deliver many packets and a packet can arrive in
+        any number of segments.
         NOTE (DHE): I've noticed in my testing that if my test server
         (simulating the port agent) goes away, the client socket (ours)
         goes into a CLOSE_WAIT condition and stays there for a long time. 
@@ -652,47 +817,7 @@ class Listener(threading.Thread):
 
         while not self._done:
             try:
-                received_header = False
-                bytes_left = HEADER_SIZE
-                while not received_header and not self._done: 
-                    header = self.sock.recv(bytes_left)
-                    bytes_left -= len(header)
-                    if bytes_left == 0:
-                        received_header = True
-                        paPacket = PortAgentPacket()         
-                        paPacket.unpack_header(header)         
-                        data_size = paPacket.get_data_size()
-                        bytes_left = data_size
-                    elif len(header) == 0:
-                        errorString = 'Zero bytes received from port_agent socket'
-                        log.error(errorString)
-                        self.callback_error(errorString)
-                        """
-                        This next statement causes the thread to exit.
-                        """
-                        self._done = True
-                
-                received_data = False
-                while not received_data and not self._done: 
-                    data = self.sock.recv(bytes_left)
-                    bytes_left -= len(data)
-                    if bytes_left == 0:
-                        received_data = True
-                        paPacket.attach_data(data)
-                    elif len(data) == 0:
-                        errorString = 'Zero bytes received from port_agent socket'
-                        log.error(errorString)
-                        self.callback_error(errorString)
-                        """
-                        This next statement causes the thread to exit.
-                        """
-                        self._done = True
-
-                if not self._done:
-                    """
-                    Should have complete port agent packet.
-                    """
-                    self.handle_packet(paPacket)
+                self.receive()
 
             except socket.error as e:
                 if e.errno == errno.EWOULDBLOCK:
@@ -705,4 +830,3 @@ class Listener(threading.Thread):
 
 
         log.info('Port_agent_client thread done listening; going away.')
-
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.prompt_matcher
+@file mi/core/instrument/prompt_matcher.py
+@brief Aho-Corasick automaton finding device prompts in a growing buffer.
+"""
+
+__license__ = 'Apache 2.0'
+
+import re
+from collections import deque
+
+ROOT_STATE = 0
+
+class PromptMatcher(object):
+    """
+    Finds a set of prompts in data that arrives a piece at a time. The
+    automaton is built once from the prompt list and fed only the new bytes
+    each time, so checking a buffer for prompts costs O(new bytes) no matter
+    how many prompts there are or how long the buffer has grown.
+
+    Prompts are ranked by their order in the list, the same as a loop over
+    the list calling str.find() on the whole buffer: match() reports the
+    first prompt in the list seen anywhere so far, with the offset of its
+    first occurrence. Pass the prompts longest first to get the longest
+    match.
+    """
+    def __init__(self, prompts):
+        """
+        Build the automaton.
+        @param prompts list of prompt strings in priority order
+        """
+        self._prompts = list(prompts)
+
+        # Trie of the prompts: state transitions, failure links and the
+        # indexes of the prompts ending at each state.
+        self._goto = [{}]
+        self._fail = [ROOT_STATE]
+        self._output = [[]]
+
+        for (index, prompt) in enumerate(self._prompts):
+            state = ROOT_STATE
+            for char in prompt:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(ROOT_STATE)
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(index)
+
+        # Breadth first so a state's failure link is always set before its
+        # children need it.
+        queue = deque(self._goto[ROOT_STATE].values())
+        while queue:
+            state = queue.popleft()
+            for (char, next_state) in self._goto[state].items():
+                queue.append(next_state)
+
+                fail = self._fail[state]
+                while fail != ROOT_STATE and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, ROOT_STATE)
+
+                self._fail[next_state] = fail
+                self._output[next_state] = self._output[next_state] + self._output[fail]
+
+        # From the root state, skip straight to the next byte that can start
+        # a prompt rather than stepping through the ones that can't.
+        first_chars = set(prompt[0] for prompt in self._prompts if prompt)
+        if first_chars:
+            self._start = re.compile('[%s]' % ''.join(re.escape(char) for char in sorted(first_chars)))
+        else:
+            self._start = None
+
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything fed so far, as when the buffer is cleared.
+        """
+        self._state = ROOT_STATE
+        self._offset = 0
+
+        # prompt index => offset of its first occurrence. Empty prompts are
+        # found at the start of anything, as they are by str.find().
+        self._found = {}
+        for (index, prompt) in enumerate(self._prompts):
+            if not prompt:
+                self._found[index] = 0
+
+        if self._found:
+            self._best = min(self._found)
+        else:
+            self._best = None
+
+    @property
+    def offset(self):
+        """
+        @retval number of bytes fed since the last reset
+        """
+        return self._offset
+
+    def feed(self, data):
+        """
+        Advance the automaton over bytes appended to the buffer.
+        @param data the new bytes
+        """
+        length = len(data)
+
+        # Nothing fed from here on can beat the first prompt in the list.
+        if self._best == 0 or self._start is None:
+            self._offset += length
+            return
+
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = self._state
+        position = 0
+
+        while position < length:
+            if state == ROOT_STATE:
+                start = self._start.search(data, position)
+                if start is None:
+                    break
+                position = start.start()
+
+            char = data[position]
+            while state != ROOT_STATE and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, ROOT_STATE)
+
+            for index in output[state]:
+                if index not in self._found:
+                    self._found[index] = self._offset + position + 1 - len(self._prompts[index])
+                    if self._best is None or index < self._best:
+                        self._best = index
+
+            position += 1
+
+        self._state = state
+        self._offset += length
+
+    def match(self):
+        """
+        @retval (prompt, offset) for the first prompt in the list seen since
+        the last reset, offset being where its first occurrence starts. None
+        if no prompt has been seen.
+        """
+        if self._best is None:
+            return None
+
+        return (self._prompts[self._best], self._found[self._best])
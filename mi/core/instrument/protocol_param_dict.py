@@ -11,6 +11,10 @@ __author__ = 'Edward Hunter'
 __license__ = 'Apache 2.0'
 
 import re
+import bisect
+import itertools
+import sre_parse
+import sre_constants
 from mi.core.common import BaseEnum
 from mi.core.exceptions import InstrumentParameterException
 
@@ -21,10 +25,50 @@ class ParameterDictVisibility(BaseEnum):
     READ_WRITE = "READ_WRITE"
     DIRECT_ACCESS = "DIRECT_ACCESS"
 
+# Compiled parameter regexes, shared by all the parameters with the same
+# pattern and flags. Unlike the re module's own cache, which is emptied
+# once it holds 100 patterns, it keeps every pattern the drivers use.
+_regex_cache = {}
+
+def get_regex(pattern, flags=0):
+    """
+    Compile a regex, or get the one compiled before with the same pattern
+    and flags.
+    @param pattern The regex pattern.
+    @param flags The re flags.
+    @retval The compiled regex.
+    """
+    key = (type(pattern), pattern, flags)
+    regex = _regex_cache.get(key)
+    if regex is None:
+        regex = _regex_cache.setdefault(key, re.compile(pattern, flags))
+    return regex
+
+# Versions given to changes of parameter values. They are shared by all
+# dictionaries, so a later change always has a higher version.
+_versions = itertools.count(1)
+
 class ParameterDictVal(object):
     """
-    A parameter dictionary value.
+    A parameter dictionary value. Each change to value is given a new
+    version, kept in version.
     """
+    __slots__ = ('name', 'f_format', '_value', 'version', 'menu_path_read',
+                 'submenu_read', 'menu_path_write', 'submenu_write',
+                 'visibility', 'multi_match', 'direct_access', 'startup_param',
+                 'default_value', 'init_value', 'dependencies')
+
+    def _get_value(self):
+        return self._value
+
+    def _set_value(self, value):
+        old_value = self._value
+        if type(value) is not type(old_value) or value != old_value:
+            self.version = _versions.next()
+        self._value = value
+
+    value = property(_get_value, _set_value)
+
     def __init__(self, name, f_format, value=None,
                  visibility=ParameterDictVisibility.READ_WRITE,
                  menu_path_read=None,
@@ -35,7 +79,8 @@ class ParameterDictVal(object):
                  direct_access=False,
                  startup_param=False,
                  default_value=None,
-                 init_value=None):
+                 init_value=None,
+                 dependencies=None):
         """
         Parameter value constructor.
         @param name The parameter name.
@@ -45,9 +90,13 @@ class ParameterDictVal(object):
         @param menu_path The path of menu options required to get to the parameter
         value display when presented in a menu-based instrument
         @param value The parameter value (initializes to None).
+        @param dependencies Names of the parameters that must be written
+        before this one.
         """
         self.name = name
         self.f_format = f_format
+        self._value = None
+        self.version = 0
         self.value = value
         self.menu_path_read = menu_path_read
         self.submenu_read = submenu_read
@@ -59,6 +108,7 @@ class ParameterDictVal(object):
         self.startup_param = startup_param
         self.default_value = default_value
         self.init_value = init_value
+        self.dependencies = list(dependencies or [])
 
     def update(self, input):
         """
@@ -72,6 +122,8 @@ class ParameterDictVal(object):
         return True
     
 class RegexParamDictVal(ParameterDictVal):
+    __slots__ = ('pattern', 'regex', 'f_getval')
+
     def __init__(self, name, pattern, f_getval, f_format, value=None,
                  visibility=ParameterDictVisibility.READ_WRITE,
                  menu_path_read=None,
@@ -82,7 +134,8 @@ class RegexParamDictVal(ParameterDictVal):
                  direct_access=False,
                  startup_param=False,
                  default_value=None,
-                 init_value=None):
+                 init_value=None,
+                 dependencies=None):
         """
         Parameter value constructor.
         @param name The parameter name.
@@ -94,6 +147,8 @@ class RegexParamDictVal(ParameterDictVal):
         @param menu_path The path of menu options required to get to the parameter
         value display when presented in a menu-based instrument
         @param value The parameter value (initializes to None).
+        @param dependencies Names of the parameters that must be written
+        before this one.
         """
         ParameterDictVal.__init__(self,
                                   name,
@@ -108,10 +163,11 @@ class RegexParamDictVal(ParameterDictVal):
                                   direct_access=direct_access,
                                   startup_param=startup_param,
                                   default_value=default_value,
-                                  init_value=init_value)
+                                  init_value=init_value,
+                                  dependencies=dependencies)
 
         self.pattern = pattern
-        self.regex = re.compile(pattern)
+        self.regex = get_regex(pattern)
         self.f_getval = f_getval
 
     def update(self, input):
@@ -135,6 +191,8 @@ class RegexParamDictVal(ParameterDictVal):
             return False
         
 class FunctionParamDictVal(ParameterDictVal):
+    __slots__ = ('f_getval',)
+
     def __init__(self, name, f_getval, f_format, value=None,
                  visibility=ParameterDictVisibility.READ_WRITE,
                  menu_path_read=None,
@@ -145,7 +203,8 @@ class FunctionParamDictVal(ParameterDictVal):
                  direct_access=False,
                  startup_param=False,
                  default_value=None,
-                 init_value=None):
+                 init_value=None,
+                 dependencies=None):
         """
         Parameter value constructor.
         @param name The parameter name.
@@ -158,6 +217,8 @@ class FunctionParamDictVal(ParameterDictVal):
         @param menu_path The path of menu options required to get to the parameter
         value display when presented in a menu-based instrument
         @param value The parameter value (initializes to None).
+        @param dependencies Names of the parameters that must be written
+        before this one.
         """
         ParameterDictVal.__init__(self,
                                   name,
@@ -172,7 +233,8 @@ class FunctionParamDictVal(ParameterDictVal):
                                   direct_access=direct_access,
                                   startup_param=startup_param,
                                   default_value=default_value,
-                                  init_value=init_value)
+                                  init_value=init_value,
+                                  dependencies=dependencies)
 
         self.f_getval = f_getval
 
@@ -198,6 +260,113 @@ class FunctionParamDictVal(ParameterDictVal):
         else:
             return False
 
+class ParameterDictIndex(object):
+    """
+    The parameters of a dictionary, indexed by a literal string each regex
+    needs to match, so a multi-line response is scanned once for all of
+    them and a parameter's regex is only searched on the lines holding its
+    literal. Parameters with no such literal, or that are not plain
+    RegexParamDictVals, are tried on every line.
+    """
+    def __init__(self, vals):
+        """
+        @param vals The ParameterDictVals, in dictionary order.
+        """
+        self.vals = list(vals)
+        # Positions of the parameters tried on every line
+        self.always = set()
+        by_literal = {}
+        for (position, val) in enumerate(self.vals):
+            literal = None
+            if type(val).update.im_func is RegexParamDictVal.update.im_func:
+                literal = self._required_literal(val.regex)
+            if literal:
+                by_literal.setdefault(literal, set()).add(position)
+            else:
+                self.always.add(position)
+
+        # A hit on a literal is a hit on any literal it starts with; the
+        # scan below only reports the longest one at each position.
+        self.hits = {}
+        for literal in by_literal:
+            self.hits[literal] = set()
+            for (prefix, positions) in by_literal.iteritems():
+                if literal.startswith(prefix):
+                    self.hits[literal].update(positions)
+
+        self.scanner = None
+        if by_literal:
+            literals = sorted(by_literal, key=len, reverse=True)
+            self.scanner = re.compile('(?=(%s))' % '|'.join(map(re.escape, literals)))
+
+    def matches(self, vals):
+        """
+        @param vals The ParameterDictVals a dictionary holds now.
+        @retval True if this index was built from the same objects.
+        """
+        return len(vals) == len(self.vals) and \
+            all(val is mine for (val, mine) in zip(vals, self.vals))
+
+    def candidates(self, text, newline):
+        """
+        Find the parameters that may match each line of a response.
+        @param text The response.
+        @param newline The line separator.
+        @retval (lines, candidates): text split on newline, and a dict of
+        line number => set of the positions of parameters whose literal is
+        on that line. The parameters in always are not included.
+        """
+        lines = text.split(newline)
+        candidates = {}
+        if self.scanner is None:
+            return (lines, candidates)
+
+        starts = [0]
+        for line in lines[:-1]:
+            starts.append(starts[-1] + len(line) + len(newline))
+
+        for match in self.scanner.finditer(text):
+            line_number = bisect.bisect_right(starts, match.start()) - 1
+            candidates.setdefault(line_number, set()).update(self.hits[match.group(1)])
+        return (lines, candidates)
+
+    @staticmethod
+    def _required_literal(regex):
+        """
+        @param regex A compiled regex.
+        @retval The longest run of literal characters every match of the
+        regex contains, or None if there isn't one to rely on.
+        """
+        try:
+            parsed = sre_parse.parse(regex.pattern, regex.flags)
+        except (sre_constants.error, TypeError, ValueError):
+            return None
+        if parsed.pattern.flags & (sre_parse.SRE_FLAG_IGNORECASE | sre_parse.SRE_FLAG_VERBOSE):
+            return None
+
+        to_char = unichr if isinstance(regex.pattern, unicode) else chr
+        best = ''
+        run = []
+
+        # Only the top level sequence, and groups within it, must match as
+        # written; branches and repeats end a run.
+        items = list(parsed)
+        while items:
+            (op, av) = items.pop(0)
+            if op == sre_constants.LITERAL:
+                run.append(to_char(av))
+            elif op == sre_constants.SUBPATTERN and av[1] is not None:
+                items[0:0] = list(av[1])
+            elif op == sre_constants.AT:
+                continue
+            else:
+                if len(run) > len(best):
+                    best = ''.join(run)
+                run = []
+        if len(run) > len(best):
+            best = ''.join(run)
+        return best or None
+
 class ProtocolParameterDict(object):
     """
     Protocol parameter dictionary. Manages, matches and formats device
@@ -208,13 +377,15 @@ class ProtocolParameterDict(object):
         Constructor.        
         """
         self._param_dict = {}
+        self._index = None
+        self._clean_version = 0
         
     def add(self, name, pattern, f_getval, f_format, value=None,
             visibility=ParameterDictVisibility.READ_WRITE,
             menu_path_read=None, submenu_read=None,
             menu_path_write=None, submenu_write=None,
             multi_match=False, direct_access=False, startup_param=False,
-            default_value=None, init_value=None):
+            default_value=None, init_value=None, dependencies=None):
         """
         Add a parameter object to the dictionary using a regex for extraction.
         @param name The parameter name.
@@ -233,6 +404,8 @@ class ProtocolParameterDict(object):
         a value is needed, but no other instructions have been provided.
         @param init_value The value that a parameter should be set to during
         initialization or re-initialization
+        @param dependencies Names of the parameters that must be written
+        before this one.
         @param value The parameter value (initializes to None).        
         """
         val = RegexParamDictVal(name, pattern, f_getval, f_format,
@@ -246,7 +419,8 @@ class ProtocolParameterDict(object):
                                direct_access=direct_access,
                                startup_param=startup_param,
                                default_value=default_value,
-                               init_value=init_value)
+                               init_value=init_value,
+                               dependencies=dependencies)
         self._param_dict[name] = val
 
     def add_paramdictval(self, pdv):
@@ -329,7 +503,7 @@ class ProtocolParameterDict(object):
         @raises KeyError if the name is invalid.
         """
         log.debug("setting " + name + " to " + str(value))
-        self._param_dict[name] = value
+        self._param_dict[name].value = value
         
     def set_default(self, name):
         """
@@ -426,6 +600,47 @@ class ProtocolParameterDict(object):
                 result[name] = update_result 
         return result
 
+    def update_lines(self, input, newline='\n', multi_match=False):
+        """
+        Update the dictionary from a multi-line response, such as a status
+        or configuration dump, in one pass over the text. The result is the
+        same as calling update, or multi_match_update, with each line of
+        input.split(newline) in turn, but each parameter's regex is only
+        searched on the lines that hold literal text it needs.
+        @param input The response.
+        @param newline The line separator.
+        @param multi_match True to update each line like multi_match_update.
+        @retval The set of names of the parameters whose values changed.
+        """
+        vals = self._param_dict.values()
+        if self._index is None or not self._index.matches(vals):
+            self._index = ParameterDictIndex(vals)
+        index = self._index
+
+        before = [val.value for val in index.vals]
+        (lines, candidates) = index.candidates(input, newline)
+        for (line_number, line) in enumerate(lines):
+            positions = candidates.get(line_number)
+            if positions:
+                positions = sorted(positions | index.always)
+            elif index.always:
+                positions = sorted(index.always)
+            else:
+                continue
+
+            multi_mode = False
+            for position in positions:
+                val = index.vals[position]
+                if multi_mode and not val.multi_match:
+                    continue
+                if val.update(line) and multi_match:
+                    if not val.multi_match:
+                        break
+                    multi_mode = True
+
+        return set(val.name for (val, value) in zip(index.vals, before)
+                   if val.value != value)
+
     def update(self, input):
         """
         Update the dictionaray with a line input. Iterate through all objects
@@ -452,6 +667,93 @@ class ProtocolParameterDict(object):
             config[key] = val.value
         return config
 
+    def get_current_version(self):
+        """
+        Get the version of the latest change to a parameter value.
+        @retval The version, 0 if no value has been changed.
+        """
+        versions = [val.version for val in self._param_dict.itervalues()]
+        return max(versions or [0])
+
+    def get_changes_since(self, version):
+        """
+        Get the parameters whose values changed after a version.
+        @param version A version from get_current_version.
+        @retval name : value dict of the changed parameters.
+        """
+        changes = {}
+        for (key, val) in self._param_dict.iteritems():
+            if val.version > version:
+                changes[key] = val.value
+        return changes
+
+    def get_dirty_list(self):
+        """
+        Return a list of the parameter names whose values changed since the
+        dictionary was last marked clean.
+        """
+        return self.get_changes_since(self._clean_version).keys()
+
+    def clear_dirty(self):
+        """
+        Mark the dictionary clean, as of its current version.
+        """
+        self._clean_version = self.get_current_version()
+
+    def plan_writes(self, params):
+        """
+        Plan the writes that give the device a set of parameter values. Only
+        parameters whose values, formatted for a set command, differ from
+        the values in the dictionary are written, and each is written after
+        the parameters it depends on.
+        @param params parameter : value dict of the wanted values.
+        @retval list of (parameter, value) tuples to write, in order.
+        @raises InstrumentParameterException if a parameter is unknown or the
+        dependencies of the parameters form a cycle.
+        """
+        for name in params:
+            if name not in self._param_dict:
+                raise InstrumentParameterException('Unknown driver parameter %s' % name)
+
+        changed = set(name for (name, value) in params.iteritems()
+                      if not self._same_value(self._param_dict[name], value))
+
+        writes = []
+        done = set()
+        visiting = []
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise InstrumentParameterException(
+                    "Parameter dependency cycle: %s" % ' -> '.join(visiting + [name]))
+            visiting.append(name)
+            val = self._param_dict.get(name)
+            for dependency in (val.dependencies if val else ()):
+                visit(dependency)
+            visiting.pop()
+            done.add(name)
+            if name in changed:
+                writes.append((name, params[name]))
+
+        for name in sorted(changed):
+            visit(name)
+        return writes
+
+    @staticmethod
+    def _same_value(val, value):
+        """
+        @retval True if value formats for a set command as the parameter's
+        current value does.
+        """
+        if val.value is None:
+            return False
+        try:
+            return val.f_format(value) == val.f_format(val.value)
+        except Exception:
+            return False
+
     def format(self, name, val):
         """
         Format a parameter for a set command.
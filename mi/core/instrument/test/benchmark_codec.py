@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.benchmark_codec
+@file mi/core/instrument/test/benchmark_codec.py
+@brief Per event CPU cost and size of each driver process wire format.
+
+Encodes and decodes SBE37 sample events, one per message and in batches,
+with every codec available here, to help pick the format for a deployment.
+
+Usage: python -m mi.core.instrument.test.benchmark_codec [count] [batch size]
+"""
+
+__license__ = 'Apache 2.0'
+
+import sys
+import time
+
+from mi.core.instrument import zmq_codec
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.test.benchmark_particle import SBE37_SAMPLE, PORT_TIMESTAMP
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SBE37DataParticle
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SAMPLE_PATTERN_MATCHER
+
+def run(codec, events, batch_size):
+    """
+    @retval (CPU microseconds per event, bytes per event)
+    """
+    size = 0
+    start = time.clock()
+    for index in xrange(0, len(events), batch_size):
+        frames = zmq_codec.encode_message(codec, events[index:index+batch_size])
+        size += sum(len(frame) for frame in frames)
+        zmq_codec.decode_message(frames)
+    elapsed = time.clock() - start
+    return (elapsed * 1e6 / len(events), float(size) / len(events))
+
+def main(count=20000, batch_size=256):
+    events = []
+    for i in xrange(count):
+        particle = SBE37DataParticle(SBE37_SAMPLE, port_timestamp=PORT_TIMESTAMP,
+                                     match=SAMPLE_PATTERN_MATCHER.match(SBE37_SAMPLE))
+        events.append({'type': DriverAsyncEvent.SAMPLE,
+                       'value': particle.generate(),
+                       'time': time.time()})
+
+    print "%-8s %6s %12s %12s" % ("codec", "batch", "us/event", "bytes/event")
+    for name in zmq_codec.CODEC_PREFERENCE:
+        codec = zmq_codec.get_codec(name)
+        for size in (1, batch_size):
+            (cpu, length) = run(codec, events, size)
+            print "%-8s %6d %12.1f %12.1f" % (name, size, cpu, length)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.benchmark_driver_launch
+@file mi/core/instrument/test/benchmark_driver_launch.py
+@brief Driver process startup time, cold and from a warm launcher.
+
+Launches a driver several times with a new interpreter each time, as
+launch_process does by default, then from a DriverLauncher pool, timing
+each launch until the driver's ports are known.
+
+Usage: python -m mi.core.instrument.test.benchmark_driver_launch [count] [module] [class]
+"""
+
+__license__ = 'Apache 2.0'
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+import mi.core.instrument.driver_process as driver_process
+from mi.core.instrument.driver_launcher import DriverLauncher
+from mi.core.instrument.zmq_driver_process import ZmqDriverProcess
+
+def run(count, driver_module, driver_class, **kwargs):
+    """
+    @retval list of launch times in seconds
+    """
+    times = []
+    for i in range(count):
+        start = time.time()
+        (dvr_proc, cmd_port, evt_port) = ZmqDriverProcess.launch_process(
+            driver_module, driver_class, ppid=os.getpid(), **kwargs)
+        times.append(time.time() - start)
+        dvr_proc.kill()
+    return times
+
+def report(name, times):
+    times = sorted(times)
+    print "%-8s %10.1f %10.1f %10.1f" % (name, times[0] * 1e3, times[len(times) / 2] * 1e3,
+                                         times[-1] * 1e3)
+
+def main(count=10, driver_module='mi.instrument.seabird.sbe37smb.ooicore.driver',
+         driver_class='SBE37Driver'):
+    count = int(count)
+    driver_process.PYTHON = sys.executable
+    workdir = tempfile.mkdtemp() + '/'
+
+    print "%-8s %10s %10s %10s" % ("launch", "min ms", "median ms", "max ms")
+    report('cold', run(count, driver_module, driver_class, workdir=workdir))
+
+    launcher = DriverLauncher(preload=[driver_module])
+    start = time.time()
+    launcher.start()
+    print "(launcher pool started in %.1f ms)" % ((time.time() - start) * 1e3)
+    report('warm', run(count, driver_module, driver_class, launcher=launcher))
+
+    launcher.stop()
+    shutil.rmtree(workdir)
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
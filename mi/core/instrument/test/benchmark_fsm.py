@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.benchmark_fsm
+@file mi/core/instrument/test/benchmark_fsm.py
+@brief InstrumentFSM.on_event throughput, with and without cached enum
+values.
+
+Drives a protocol state machine between the command and autosample states
+and through events handled without a transition, first with BaseEnum.has
+walking the enum class on every call as it used to, then with the values
+BaseEnum keeps.
+
+Usage: python -m mi.core.instrument.test.benchmark_fsm [events]
+"""
+
+__license__ = 'Apache 2.0'
+
+import sys
+import time
+
+from mi.core.common import BaseEnum
+from mi.core.instrument.instrument_fsm import InstrumentFSM
+from mi.core.instrument.instrument_driver import DriverEvent
+from mi.core.instrument.instrument_driver import DriverProtocolState
+
+def uncached_has(cls, item):
+    return item in [getattr(cls,attr) for attr in dir(cls) if
+                    not callable(getattr(cls,attr)) and not attr.startswith('__')]
+
+def build_fsm():
+    fsm = InstrumentFSM(DriverProtocolState, DriverEvent, DriverEvent.ENTER, DriverEvent.EXIT)
+    for state in (DriverProtocolState.COMMAND, DriverProtocolState.AUTOSAMPLE):
+        fsm.add_handler(state, DriverEvent.ENTER, lambda *args, **kwargs: None)
+        fsm.add_handler(state, DriverEvent.EXIT, lambda *args, **kwargs: None)
+        fsm.add_handler(state, DriverEvent.GET, lambda *args, **kwargs: (None, None))
+    fsm.add_handler(DriverProtocolState.COMMAND, DriverEvent.START_AUTOSAMPLE,
+                    lambda *args, **kwargs: (DriverProtocolState.AUTOSAMPLE, None))
+    fsm.add_handler(DriverProtocolState.AUTOSAMPLE, DriverEvent.STOP_AUTOSAMPLE,
+                    lambda *args, **kwargs: (DriverProtocolState.COMMAND, None))
+    fsm.start(DriverProtocolState.COMMAND)
+    return fsm
+
+def run(count):
+    """
+    @retval events handled per second
+    """
+    fsm = build_fsm()
+    events = [DriverEvent.GET, DriverEvent.START_AUTOSAMPLE,
+              DriverEvent.GET, DriverEvent.STOP_AUTOSAMPLE] * (count / 4)
+    start = time.time()
+    for event in events:
+        fsm.on_event(event)
+    return len(events) / (time.time() - start)
+
+def main(count=200000):
+    count = int(count)
+    cached_has = BaseEnum.__dict__['has']
+
+    BaseEnum.has = classmethod(uncached_has)
+    try:
+        before = run(count)
+    finally:
+        BaseEnum.has = cached_has
+    after = run(count)
+
+    print "%-10s %14s" % ("has()", "events/s")
+    print "%-10s %14.0f" % ("uncached", before)
+    print "%-10s %14.0f" % ("cached", after)
+    print "speedup    %13.1fx" % (after / before)
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
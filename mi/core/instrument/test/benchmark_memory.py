@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.benchmark_memory
+@file mi/core/instrument/test/benchmark_memory.py
+@brief Per-instance size of parameter dictionary values and data particles,
+and particles built per second, with fields in slots and in a per-instance
+dict.
+
+The dict layout, which is how the classes were before, is measured with
+copies made here: the same fields in an object's __dict__ for sizes, and a
+particle class with the same methods but no __slots__ for speed.
+
+Usage: python -m mi.core.instrument.test.benchmark_memory [count]
+"""
+
+__license__ = 'Apache 2.0'
+
+import sys
+import time
+import types
+
+from mi.core.instrument.protocol_param_dict import RegexParamDictVal
+from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SBE37DataParticle
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SAMPLE_PATTERN_MATCHER
+from mi.instrument.nortek.vector.ooicore.driver import VectorVelocityDataParticle
+from mi.instrument.nortek.vector.ooicore.driver import VELOCITY_DATA_REGEX
+
+SBE37_SAMPLE = "#55.9044,41.40609, 572.170,   34.2583, 1505.948, 05 Feb 2013, 19:16:59\r\n"
+VECTOR_SAMPLE = "a51000db00008f10000049f041f72303303132120918d8f7".decode('hex')
+PORT_TIMESTAMP = 3569168821.102485
+
+def dict_layout(cls):
+    """
+    @retval A class with the methods of cls and its bases, keeping its
+    fields in a per-instance dict.
+    """
+    namespace = {}
+    for klass in reversed(cls.__mro__[:-1]):
+        for (name, value) in vars(klass).iteritems():
+            if name in ('__slots__', '__dict__', '__weakref__') or \
+               isinstance(value, types.MemberDescriptorType):
+                continue
+            namespace[name] = value
+    return type('Dict' + cls.__name__, (object,), namespace)
+
+class DictLayout(object):
+    pass
+
+def dict_copy(obj):
+    """
+    @retval An object holding the slot fields of obj in its __dict__.
+    """
+    copy = DictLayout()
+    for klass in type(obj).__mro__:
+        for name in vars(klass).get('__slots__', ()):
+            setattr(copy, name, getattr(obj, name))
+    return copy
+
+def instance_size(obj):
+    """
+    @retval Bytes of the instance and its __dict__, if it has one.
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+def make_param(cls):
+    return cls("interval", r'sample interval = (\d+) seconds',
+               lambda match : int(match.group(1)), str, value=10,
+               visibility=ParameterDictVisibility.READ_WRITE,
+               startup_param=True, default_value=10)
+
+def make_particle(cls, regex, raw_data):
+    return cls(raw_data, port_timestamp=PORT_TIMESTAMP, match=regex.match(raw_data))
+
+def run(particle_class, regex, raw_data, count):
+    """
+    @retval particles built per second
+    """
+    start = time.time()
+    for i in xrange(count):
+        make_particle(particle_class, regex, raw_data).generate_dict()
+    return count / (time.time() - start)
+
+def main(count=20000):
+    print "%-20s %12s %12s" % ("bytes/instance", "dict", "slots")
+    param = make_param(RegexParamDictVal)
+    print "%-20s %12d %12d" % ("RegexParamDictVal", instance_size(dict_copy(param)),
+                               instance_size(param))
+
+    samples = [("SBE37", SBE37DataParticle, SAMPLE_PATTERN_MATCHER, SBE37_SAMPLE),
+               ("Vector", VectorVelocityDataParticle, VELOCITY_DATA_REGEX, VECTOR_SAMPLE)]
+    for (name, particle_class, regex, raw_data) in samples:
+        particle = make_particle(particle_class, regex, raw_data)
+        print "%-20s %12d %12d" % (name, instance_size(dict_copy(particle)), instance_size(particle))
+
+    print
+    print "%-20s %12s %12s" % ("particles/s", "dict", "slots")
+    for (name, particle_class, regex, raw_data) in samples:
+        before = run(dict_layout(particle_class), regex, raw_data, count)
+        after = run(particle_class, regex, raw_data, count)
+        print "%-20s %12.0f %12.0f" % (name, before, after)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.benchmark_particle
+@file mi/core/instrument/test/benchmark_particle.py
+@brief Per sample CPU cost of building and publishing data particles.
+
+Compares the old InstrumentProtocol._extract_sample path (deepcopy the
+header, json.dumps the particle, then json.loads it back for the return
+value) with generate_dict(), which builds the dict once and leaves the one
+json.dumps to the driver process event socket.
+
+Usage: python -m mi.core.instrument.test.benchmark_particle [count]
+"""
+
+__license__ = 'Apache 2.0'
+
+import sys
+import copy
+import json
+import time
+
+from mi.core.instrument.data_particle import DataParticleKey
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SBE37DataParticle
+from mi.instrument.seabird.sbe37smb.ooicore.driver import SAMPLE_PATTERN_MATCHER
+from mi.instrument.nortek.vector.ooicore.driver import VectorVelocityDataParticle
+from mi.instrument.nortek.vector.ooicore.driver import VELOCITY_DATA_REGEX
+
+SBE37_SAMPLE = "#55.9044,41.40609, 572.170,   34.2583, 1505.948, 05 Feb 2013, 19:16:59\r\n"
+VECTOR_SAMPLE = "a51000db00008f10000049f041f72303303132120918d8f7".decode('hex')
+PORT_TIMESTAMP = 3569168821.102485
+
+def legacy_extract(particle):
+    """
+    The particle path as it was: generate() with a deepcopy of the header,
+    serialize, then parse the JSON again for the return value.
+    """
+    values = particle._build_parsed_values()
+    result = copy.deepcopy(particle.contents)
+    result[DataParticleKey.STREAM_NAME] = particle.data_particle_type()
+    result[DataParticleKey.VALUES] = values
+    published = json.dumps(result, sort_keys=True)
+    return (published, json.loads(published))
+
+def extract(particle):
+    """
+    The particle path now: build the dict once, serialize once on the way
+    out of the driver process.
+    """
+    sample = particle.generate_dict()
+    return (json.dumps(sample, sort_keys=True), sample)
+
+def run(particle_class, regex, raw_data, extract_fn, count):
+    """
+    @retval CPU microseconds per sample
+    """
+    start = time.clock()
+    for i in xrange(count):
+        particle = particle_class(raw_data, port_timestamp=PORT_TIMESTAMP,
+                                  match=regex.match(raw_data))
+        extract_fn(particle)
+    return (time.clock() - start) * 1e6 / count
+
+def main(count=20000):
+    print "%-8s %12s %12s" % ("sample", "before us", "after us")
+    for (name, particle_class, regex, raw_data) in [
+        ("SBE37", SBE37DataParticle, SAMPLE_PATTERN_MATCHER, SBE37_SAMPLE),
+        ("Vector", VectorVelocityDataParticle, VELOCITY_DATA_REGEX, VECTOR_SAMPLE)]:
+        before = run(particle_class, regex, raw_data, legacy_extract, count)
+        after = run(particle_class, regex, raw_data, extract, count)
+        print "%-8s %12.1f %12.1f" % (name, before, after)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
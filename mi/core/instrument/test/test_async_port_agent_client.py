@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_async_port_agent_client
+@file mi/core/instrument/test/test_async_port_agent_client.py
+@brief Test cases for the port agent client and command-response exchanges
+serviced by an I/O loop
+"""
+
+__license__ = 'Apache 2.0'
+
+import time
+import socket
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.exceptions import InstrumentTimeoutException
+from mi.core.exceptions import InstrumentProtocolException
+from mi.core.instrument.io_loop import IOLoop
+from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.port_agent_client import PortAgentPacket
+from mi.core.instrument.async_port_agent_client import AsyncListener
+from mi.core.instrument.async_port_agent_client import AsyncPortAgentClient
+from mi.core.instrument.instrument_protocol import AsyncCommandResponse
+from mi.core.instrument.instrument_protocol import CommandResponseInstrumentProtocol
+
+NEWLINE = '\r\n'
+PROMPT = 'S>'
+
+def pack(data, packet_type=PortAgentPacket.DATA_FROM_INSTRUMENT):
+    packet = PortAgentPacket(packet_type)
+    packet.attach_data(data)
+    packet.pack_header()
+    return packet.get_header() + data
+
+@attr('UNIT', group='mi')
+class TestUnitAsyncPortAgentClient(MiUnitTestCase):
+    """
+    Test port agent connections and command-response exchanges running on
+    one loop thread
+    """
+    def setUp(self):
+        self.loop = IOLoop()
+        self.loop.start()
+        self.addCleanup(self.stop_loop)
+
+        self.data_server = self.listen()
+        self.cmd_server = self.listen()
+        self.client = AsyncPortAgentClient('localhost', self.data_server.getsockname()[1],
+                                           self.cmd_server.getsockname()[1], loop=self.loop)
+        self.data = []
+        self.raw = []
+        self.errors = []
+
+    def stop_loop(self):
+        self.loop.stop()
+        self.loop.join()
+        self.loop.close()
+
+    def listen(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(('localhost', 0))
+        server.listen(5)
+        server.settimeout(5)
+        self.addCleanup(server.close)
+        return server
+
+    def connect(self, callback_data=None):
+        """
+        Connect the client, returning the port agent end of the connection.
+        """
+        self.client.init_comms(callback_data or self.data.append, self.raw.append,
+                               self.errors.append)
+        (port_agent, addr) = self.data_server.accept()
+        self.addCleanup(port_agent.close)
+        self.addCleanup(self.client.stop_comms)
+        return port_agent
+
+    def wait_for(self, items, count):
+        starttime = time.time()
+        while len(items) < count and time.time() - starttime < 5:
+            time.sleep(.01)
+
+    def test_receive_send(self):
+        """
+        Test packets are read and sends are written from the loop
+        """
+        port_agent = self.connect()
+        port_agent.sendall(pack('first') + pack('sec'))
+        port_agent.sendall(pack('ond') + pack('', PortAgentPacket.HEARTBEAT))
+        self.wait_for(self.data, 3)
+        self.assertEqual([p.get_data() for p in self.data], ['first', 'sec', 'ond'])
+        self.assertEqual(len(self.raw), 3)
+
+        # Big enough to fill the socket buffers, so it goes out as the
+        # port agent reads it
+        big = 'x' * (4 * 1024 * 1024)
+        futures = [self.client.send('ds' + NEWLINE), self.client.send(big)]
+        port_agent.settimeout(5)
+        received = ''
+        while len(received) < len(big) + 4:
+            received += port_agent.recv(65536)
+        self.assertEqual(received, 'ds' + NEWLINE + big)
+        self.assertEqual([f.result(timeout=5) for f in futures], [4, len(big)])
+        self.assertEqual(self.errors, [])
+
+    def test_heartbeat(self):
+        """
+        Test heartbeats keep the connection up and missing them is an error
+        """
+        (port_agent, driver) = socket.socketpair()
+        self.addCleanup(port_agent.close)
+        self.addCleanup(driver.close)
+        driver.setblocking(0)
+        listener = AsyncListener(self.loop, driver, None, 1, 2, self.data.append,
+                                 self.raw.append, self.errors.append)
+        listener.heartbeat = .2
+        listener.start()
+        self.addCleanup(self.loop.submit, listener.done)
+
+        for i in range(5):
+            time.sleep(.1)
+            port_agent.sendall(pack('', PortAgentPacket.HEARTBEAT))
+        self.assertEqual(self.errors, [])
+
+        starttime = time.time()
+        self.wait_for(self.errors, 1)
+        self.assertEqual(len(self.errors), 1)
+        self.assertTrue(.3 < time.time() - starttime < 1)
+        self.assertTrue(self.errors[0].startswith('Maximum allowable'))
+
+    def test_command_response(self):
+        """
+        Test command-response exchanges with an instrument answering from the
+        same loop
+        """
+        protocol = CommandResponseInstrumentProtocol([PROMPT], NEWLINE, lambda *args: None)
+        protocol.get_current_state = lambda: None
+        protocol._chunker = StringChunker(lambda raw: [])
+        protocol._connection = self.client
+        protocol._send_wakeup = lambda: protocol._connection.send(NEWLINE)
+        protocol._add_build_handler('ds', protocol._build_simple_command)
+        protocol._add_build_handler('ts', protocol._build_simple_command)
+        protocol._add_response_handler('ds', lambda result, prompt: result.split(NEWLINE)[1])
+        adapter = AsyncCommandResponse(protocol, self.loop)
+
+        port_agent = self.connect(adapter.got_data)
+        port_agent.setblocking(0)
+        replies = {NEWLINE: PROMPT,
+                   'ds' + NEWLINE: 'ds' + NEWLINE + 'vbatt = 12.1' + NEWLINE + PROMPT}
+        received = []
+
+        def instrument():
+            received.append(port_agent.recv(1024))
+            for command in received[-1].split(NEWLINE)[:-1]:
+                reply = replies.get(command + NEWLINE)
+                if reply:
+                    port_agent.sendall(pack(reply))
+        self.loop.submit(self.loop.add_reader, port_agent, instrument).result(timeout=5)
+
+        futures = [adapter.do_cmd_resp('ds', timeout=2) for i in range(3)]
+        self.assertEqual([f.result(timeout=5) for f in futures], ['vbatt = 12.1'] * 3)
+
+        self.assertRaises(InstrumentProtocolException,
+                          adapter.do_cmd_resp('no_such_command').result, 5)
+
+        # The instrument wakes but doesn't answer
+        starttime = time.time()
+        future = adapter.do_cmd_resp('ts', timeout=.3)
+        self.assertRaises(InstrumentTimeoutException, future.result, 5)
+        self.assertTrue(time.time() - starttime < 1)
+
+        # Nor wake
+        replies.clear()
+        future = adapter.do_cmd_resp('ds', timeout=.3)
+        self.assertRaises(InstrumentTimeoutException, future.result, 5)
+
+        self.loop.submit(self.loop.remove_reader, port_agent).result(timeout=5)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_bounded_buffer
+@file mi/core/instrument/test/test_bounded_buffer.py
+@brief Test cases for the bounded buffer
+"""
+
+__license__ = 'Apache 2.0'
+
+import random
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.instrument.bounded_buffer import BoundedBuffer
+
+@attr('UNIT', group='mi')
+class TestUnitBoundedBuffer(MiUnitTestCase):
+    """
+    Test the bounded buffer keeps the newest max_size bytes
+    """
+    def test_append(self):
+        """
+        Test appending under and over the limit
+        """
+        buffer = BoundedBuffer(10)
+        self.assertEqual(buffer.getvalue(), '')
+        self.assertEqual(buffer.append(''), 0)
+        self.assertEqual(buffer.append('abc'), 0)
+        self.assertEqual(buffer.append('defg'), 0)
+        self.assertEqual(len(buffer), 7)
+        self.assertEqual(buffer.getvalue(), 'abcdefg')
+        self.assertEqual(buffer.getvalue(5), 'fg')
+        self.assertEqual(buffer.getvalue(7), '')
+
+        self.assertEqual(buffer.append('hijkl'), 2)
+        self.assertEqual(buffer.getvalue(), 'cdefghijkl')
+        self.assertEqual(buffer.bytes_dropped, 2)
+
+        self.assertEqual(buffer.append('0123456789abcdef'), 16)
+        self.assertEqual(buffer.getvalue(), '6789abcdef')
+        self.assertEqual(len(buffer), 10)
+        self.assertEqual(buffer.bytes_dropped, 18)
+
+        buffer.clear()
+        self.assertEqual(buffer.getvalue(), '')
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.bytes_dropped, 18)
+
+    def test_max_size(self):
+        """
+        Test changing the limit trims the buffer
+        """
+        buffer = BoundedBuffer(10)
+        buffer.append('0123456789')
+        buffer.max_size = 4
+        self.assertEqual(buffer.getvalue(), '6789')
+        self.assertEqual(buffer.bytes_dropped, 6)
+
+        self.assertRaises(InstrumentParameterException, BoundedBuffer, 0)
+        self.assertRaises(InstrumentParameterException, setattr, buffer, 'max_size', '10')
+
+    def test_random_data(self):
+        """
+        Test random appends and reads against a plain string
+        """
+        rand = random.Random(42)
+        buffer = BoundedBuffer(50)
+        expected = ''
+        for i in range(1000):
+            data = ''.join(rand.choice('abc\r\n') for j in range(rand.randint(0, 20)))
+            buffer.append(data)
+            expected = (expected + data)[-50:]
+            self.assertEqual(len(buffer), len(expected))
+
+            start = rand.randint(0, len(expected))
+            self.assertEqual(buffer.getvalue(start), expected[start:])
+            if rand.random() < 0.2:
+                self.assertEqual(buffer.getvalue(), expected)
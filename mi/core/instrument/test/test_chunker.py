@@ -19,6 +19,12 @@ from ooi.logging import log
 
 from mi.core.exceptions import SampleException
 from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.chunker import RingStringChunker
+from mi.core.instrument.chunker import IncrementalSieve
+from mi.core.instrument.chunker import MarkerSieve
+from mi.core.instrument.chunker import PatternSieve
+from mi.core.instrument.chunker import SieveMatch
+from mi.core.instrument.chunker import _pattern_frame
 
 @attr('UNIT', group='mi')
 class UnitTestStringChunker(MiUnitTestCase):
@@ -41,6 +47,9 @@ class UnitTestStringChunker(MiUnitTestCase):
     TIMESTAMP_1 = 3569168821.102485
     TIMESTAMP_2 = 3569168822.202485
     TIMESTAMP_3 = 3569168823.302485
+
+    # Chunker class under test
+    CHUNKER_CLASS = StringChunker
     
     @staticmethod
     def sieve_function(raw_data):
@@ -60,7 +69,7 @@ class UnitTestStringChunker(MiUnitTestCase):
     
     def setUp(self):
         """ Setup a chunker for use in tests """
-        self._chunker = StringChunker(UnitTestStringChunker.sieve_function)
+        self._chunker = self.CHUNKER_CLASS(UnitTestStringChunker.sieve_function)
         
     def _display_chunk_list(self, data, chunk_list):
         """ Display the data as viewed through the chunk list """
@@ -270,7 +279,7 @@ class UnitTestStringChunker(MiUnitTestCase):
         def funky_sieve(data):
             return [(3,6),(0,3)]
 
-        self._chunker = StringChunker(funky_sieve)
+        self._chunker = self.CHUNKER_CLASS(funky_sieve)
         self._chunker.add_chunk("BarFoo", self.TIMESTAMP_1)
         (time, result) = self._chunker.get_next_data()
         self.assertEquals(result, "Bar")
@@ -289,10 +298,305 @@ class UnitTestStringChunker(MiUnitTestCase):
         def overlap_sieve(data):
             return [(0,3),(2,6)]
 
-        self._chunker = StringChunker(overlap_sieve)
+        self._chunker = self.CHUNKER_CLASS(overlap_sieve)
         self.assertRaises(SampleException,
                           self._chunker.add_chunk, "foobar", self.TIMESTAMP_1)
 
+@attr('UNIT', group='mi')
+class UnitTestRingStringChunker(UnitTestStringChunker):
+    """
+    Run the string chunker tests against the ring buffer chunker, plus some
+    tests of how it manages its buffer
+    """
+    CHUNKER_CLASS = RingStringChunker
+
+    def test_buffer_compaction(self):
+        """
+        Stream a lot of samples through and make sure the buffer doesn't grow
+        """
+        for i in range(1000):
+            self._chunker.add_chunk("Foo" + self.FRAGMENT_1, self.TIMESTAMP_1)
+            self._chunker.add_chunk(self.FRAGMENT_2, self.TIMESTAMP_2)
+            (time, result) = self._chunker.get_next_data()
+            self.assertEquals(result, self.FRAGMENT_SAMPLE)
+            self.assertEquals(time, self.TIMESTAMP_1)
+
+        self.assertLessEqual(len(self._chunker._buffer),
+                             2 * RingStringChunker.COMPACT_THRESHOLD)
+        self.assertEquals(len(self._chunker.raw_chunk_list), 0)
+        self.assertEquals(len(self._chunker.nondata_chunk_list), 0)
+
+    def test_get_raw_keeps_later_data(self):
+        """
+        Pulling a raw block only drops the data chunks it overlaps
+        """
+        self._chunker.add_chunk("Foo", self.TIMESTAMP_1)
+        self._chunker.add_chunk(self.SAMPLE_1, self.TIMESTAMP_2)
+
+        (time, result) = self._chunker.get_next_raw()
+        self.assertEquals(result, "Foo")
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, self.SAMPLE_1)
+        self.assertEquals(time, self.TIMESTAMP_2)
+
+    def test_get_raw_splits_data(self):
+        """
+        The tail of a data chunk cut by a raw block becomes non-data
+        """
+        self._chunker.add_chunk(self.FRAGMENT_1, self.TIMESTAMP_1)
+        self._chunker.add_chunk(self.FRAGMENT_2, self.TIMESTAMP_2)
+
+        (time, result) = self._chunker.get_next_raw()
+        self.assertEquals(result, self.FRAGMENT_1)
+        (time, result) = self._chunker.get_next_data()
+        self.assertEquals(result, None)
+        (time, result) = self._chunker.get_next_non_data()
+        self.assertEquals(result, self.FRAGMENT_2)
+        self.assertEquals(time, self.TIMESTAMP_1)
+
+@attr('UNIT', group='mi')
+class UnitTestIncrementalSieve(MiUnitTestCase):
+    """
+    Test incremental sieves driven by the ring buffer chunker
+    """
+    START = "wave: start time = "
+    END = "wave: end burst\r\n"
+    RECORD = START + "\r\n".join(["%d" % i for i in range(500)]) + END
+    TIMESTAMP_1 = 3569168821.102485
+    TIMESTAMP_2 = 3569168822.202485
+
+    def test_marker_sieve(self):
+        sieve = MarkerSieve(self.START, self.END)
+        data = "Foo%sBar%s" % (self.RECORD, self.RECORD[:10])
+        (blocks, state) = sieve.scan(data, 0, 0, None)
+        self.assertEquals(blocks, [(3, 3 + len(self.RECORD))])
+
+        # the partial record is carried in the state
+        data += self.RECORD[10:]
+        (blocks, state) = sieve.scan(data, 0, len(data), state)
+        self.assertEquals(blocks, [(6 + len(self.RECORD), 6 + 2 * len(self.RECORD))])
+
+    def test_fragmented_record(self):
+        """
+        Feed a long record a byte at a time and only scan new bytes
+        """
+        class CountingSieve(MarkerSieve):
+            scanned = 0
+            def scan(self, data, start, resume, state):
+                CountingSieve.scanned += len(data) - start - resume
+                return MarkerSieve.scan(self, data, start, resume, state)
+
+        chunker = RingStringChunker(CountingSieve(self.START, self.END))
+        self.assertTrue(isinstance(chunker.sieve, IncrementalSieve))
+
+        stream = "noise" + self.RECORD + "more noise"
+        for char in stream[:-1]:
+            chunker.add_chunk(char, self.TIMESTAMP_1)
+        chunker.add_chunk(stream[-1], self.TIMESTAMP_2)
+
+        # every byte handed over exactly once
+        self.assertEquals(CountingSieve.scanned, len(stream))
+
+        (time, result) = chunker.get_next_data()
+        self.assertEquals(result, self.RECORD)
+        self.assertEquals(time, self.TIMESTAMP_1)
+        (time, result) = chunker.get_next_non_data()
+        self.assertEquals(result, "more noise")
+        (time, result) = chunker.get_next_data()
+        self.assertEquals(result, None)
+
+    def test_marker_split_across_packets(self):
+        chunker = RingStringChunker(MarkerSieve(self.START, self.END))
+        chunker.add_chunk(self.RECORD[:5], self.TIMESTAMP_1)
+        chunker.add_chunk(self.RECORD[5:-5], self.TIMESTAMP_2)
+        chunker.add_chunk(self.RECORD[-5:], self.TIMESTAMP_2)
+        (time, result) = chunker.get_next_data()
+        self.assertEquals(result, self.RECORD)
+        self.assertEquals(time, self.TIMESTAMP_1)
+
+@attr('UNIT', group='mi')
+class UnitTestPatternSieve(MiUnitTestCase):
+    """
+    Test the compiled multi-pattern sieve
+    """
+    SAMPLE = "SATPAR0229,10.01,2206748111,111\r\n"
+    HEADER = "Satlantic PAR\r\nS/N: 0229\r\nFirmware: 1.0\r\n"
+    SAMPLE_PATTERN = r'SATPAR(\d{4}),(\d{1,7}.\d\d),(\d{10}),(\d{1,3})\r\n'
+    HEADER_PATTERN = r'Satlantic PAR.*?Firmware: (.*?)\r\n'
+
+    class Sample(object): pass
+    class Header(object): pass
+
+    def setUp(self):
+        self.sieve = PatternSieve([(self.Sample, self.SAMPLE_PATTERN),
+                                   (self.Header, re.compile(self.HEADER_PATTERN, re.DOTALL))])
+
+    def test_single_pass(self):
+        """
+        Patterns that only differ by DOTALL share one scanner
+        """
+        self.assertEquals(len(self.sieve._scanners), 1)
+
+        data = "Foo%sBar%s%s" % (self.HEADER, self.SAMPLE, self.SAMPLE)
+        h = 3 + len(self.HEADER)
+        s = h + 3 + len(self.SAMPLE)
+        self.assertEquals(self.sieve.tagged_sieve(data),
+                          [(3, h, self.Header),
+                           (h + 3, s, self.Sample),
+                           (s, s + len(self.SAMPLE), self.Sample)])
+        self.assertEquals(self.sieve(data),
+                          [(3, h), (h + 3, s), (s, s + len(self.SAMPLE))])
+
+    def test_dot_keeps_flags(self):
+        """
+        A pattern without DOTALL still doesn't match newlines with "."
+        """
+        sieve = PatternSieve([(self.Sample, r'A.B'),
+                              (self.Header, re.compile(r'C.D', re.DOTALL))])
+        self.assertEquals(sieve.tagged_sieve("A\nB C\nD AxB"),
+                          [(4, 7, self.Header), (8, 11, self.Sample)])
+
+    def test_mixed_flags(self):
+        """
+        Patterns that can't share an alternation still come back in order
+        without overlap
+        """
+        sieve = PatternSieve([(self.Sample, r'foo\d'),
+                              (self.Header, re.compile(r'oo', re.IGNORECASE)),
+                              (None, r'(x)\1')])
+        self.assertEquals(len(sieve._scanners), 3)
+        self.assertEquals(sieve.tagged_sieve("foo1 OO xx"),
+                          [(0, 4, self.Sample), (5, 7, self.Header), (8, 10, None)])
+
+    def test_chunker(self):
+        chunker = RingStringChunker(self.sieve)
+        data = self.HEADER + self.SAMPLE
+        for char in data:
+            chunker.add_chunk(char, 3569168821.102485)
+        (time, result) = chunker.get_next_data()
+        self.assertEquals(result, self.HEADER)
+        (time, result) = chunker.get_next_data()
+        self.assertEquals(result, self.SAMPLE)
+
+        chunker = StringChunker(self.sieve)
+        chunker.add_chunk(data, 3569168821.102485)
+        (time, result) = chunker.get_next_data()
+        self.assertEquals(result, self.HEADER)
+
+    def test_sieve_match(self):
+        """
+        The match handed out with a chunk is relative to the chunk
+        """
+        data = "Foo" + self.SAMPLE
+        [(start, end, match)] = self.sieve.scan(data, 0, 0, None)[0]
+        self.assertTrue(isinstance(match, SieveMatch))
+        self.assertEquals((start, end), (3, len(data)))
+        self.assertEquals(match.particle_class, self.Sample)
+
+        chunk = data[start:end]
+        match.string = chunk
+        expected = re.match(self.SAMPLE_PATTERN, chunk)
+        self.assertEquals(match.group(), chunk)
+        self.assertEquals(match.groups(), expected.groups())
+        self.assertEquals(match.group(1), "0229")
+        self.assertEquals(match.span(2), expected.span(2))
+        self.assertEquals(match.re.pattern, self.SAMPLE_PATTERN)
+
+        named = SieveMatch.from_match(self.Sample, re.search(r'x(?P<num>\d+)', "abx12"))
+        named.string = "x12"
+        self.assertEquals(named.groupdict(), {'num': '12'})
+        self.assertEquals(named.span('num'), (1, 3))
+
+    def test_tagged_chunks(self):
+        """
+        Each chunk comes back with the match that found it
+        """
+        chunker = RingStringChunker(self.sieve)
+        data = "Foo" + self.HEADER + self.SAMPLE
+        for char in data:
+            chunker.add_chunk(char, 3569168821.102485)
+
+        (time, result, match) = chunker.get_next_tagged_data()
+        self.assertEquals(result, self.HEADER)
+        self.assertEquals(match.particle_class, self.Header)
+        self.assertEquals(match.group(1), "1.0")
+
+        (time, result, match) = chunker.get_next_tagged_data()
+        self.assertEquals(result, self.SAMPLE)
+        self.assertEquals(match.particle_class, self.Sample)
+        self.assertEquals(match.groups(), ("0229", "10.01", "2206748111", "111"))
+        self.assertEquals(chunker.get_next_tagged_data(), (None, None, None))
+
+        # plain sieve functions and the original chunker hand out no match
+        chunker = StringChunker(self.sieve)
+        chunker.add_chunk(data, 3569168821.102485)
+        (time, result, match) = chunker.get_next_tagged_data()
+        self.assertEquals(result, self.HEADER)
+        self.assertEquals(match, None)
+
+    def test_pattern_frame(self):
+        """
+        Patterns are bounded by their literals, width and lines, unless they
+        look past the end of their match
+        """
+        self.assertEquals(_pattern_frame(re.compile(self.SAMPLE_PATTERN)),
+                          ('SATPAR', '\r\n', 38, True))
+        self.assertEquals(_pattern_frame(re.compile(self.HEADER_PATTERN, re.DOTALL)),
+                          ('Satlantic PAR', '\r\n', None, False))
+        self.assertEquals(_pattern_frame(re.compile(r'x +(\d+)[^x]')), ('x', None, None, False))
+        self.assertEquals(_pattern_frame(re.compile(r'ab', re.IGNORECASE)), (None, None, 2, True))
+        self.assertEquals(_pattern_frame(re.compile(r'\d+$')), None)
+        self.assertEquals(_pattern_frame(re.compile(r'\d+(?=\r)')), None)
+        self.assertEquals(_pattern_frame(re.compile(r'\bword')), None)
+
+    def test_resume(self):
+        """
+        A record arriving a line at a time is only searched from the new
+        bytes, and in full once its end marker arrives
+        """
+        scanned = []
+        class CountingSieve(PatternSieve):
+            def _matches(self, data, start=0):
+                scanned.append(len(data) - start)
+                return PatternSieve._matches(self, data, start)
+
+        sieve = CountingSieve([(self.Sample, r' +(\d+) +(\d+)\r\n'),
+                               (self.Header, re.compile(r'wave: start.*?wave: end\r\n', re.DOTALL))])
+        lines = ["wave: start\r\n"] + ["  %d\r\n" % i for i in range(1000)] + ["wave: end\r\n"]
+        record = ''.join(lines)
+        sample = " 1 2\r\n"
+
+        chunker = RingStringChunker(sieve)
+        for line in lines + [sample]:
+            chunker.add_chunk(line, 3569168821.102485)
+
+        self.assertEquals(scanned, [len(line) for line in lines[:-1]] + [len(record), len(sample)])
+
+        (time, result, match) = chunker.get_next_tagged_data()
+        self.assertEquals(result, record)
+        self.assertEquals(match.particle_class, self.Header)
+        (time, result, match) = chunker.get_next_tagged_data()
+        self.assertEquals(result, sample)
+        self.assertEquals(chunker.get_next_tagged_data(), (None, None, None))
+
+    def test_resume_matches_rescan(self):
+        """
+        Picking up part way finds the same blocks as rescanning from the
+        origin, whatever the packet sizes
+        """
+        data = ("Foo" + self.HEADER + "Satlantic P" + self.SAMPLE + "SATPAR12" +
+                self.SAMPLE + "\r\nBar" + self.HEADER[:20])
+        expected = self.sieve(data)
+        for size in (1, 2, 3, 7, 16, 50):
+            (found, start, resume, state) = ([], 0, 0, None)
+            for end in range(size, len(data) + size, size):
+                (blocks, state) = self.sieve.scan(data[:end], start, resume, state)
+                found.extend([(start + s, start + e) for (s, e, match) in blocks])
+                if blocks:
+                    (start, resume, state) = (start + blocks[-1][1], 0, None)
+                resume = min(end, len(data)) - start
+            self.assertEquals(found, expected)
+
 @unittest.skip("Write this when a binary chunker is needed")
 @attr('UNIT', group='mi')
 class UnitTestBinaryChunker(MiUnitTestCase):
@@ -11,6 +11,7 @@ __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
 
+import re
 import json
 import base64
 import time
@@ -22,6 +23,7 @@ from mi.core.log import get_logger ; log = get_logger()
 from mi.core.exceptions import SampleException, ReadOnlyException, NotImplementedException, InstrumentParameterException
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey, DataParticleValue
 from mi.core.instrument.data_particle import RawDataParticle, CommonDataParticleType
+from mi.core.instrument.data_particle import DataParticleField, DataParticleSchema
 from mi.core.instrument.port_agent_client import PortAgentPacket
 
 TEST_PARTICLE_VERSION = 1
@@ -141,6 +143,25 @@ class TestUnitDataParticle(MiUnitTestCase):
         standard = json.dumps(self.sample_parsed_particle, sort_keys=True)
         self.assertEqual(parsed_result, standard)
 
+    def test_generate_dict(self):
+        """
+        Test that the particle dict is built once and matches generate()
+        """
+        particle = self.TestDataParticle(self.sample_raw_data,
+                                         port_timestamp=self.sample_port_timestamp)
+        result = particle.generate_dict()
+        self.assertTrue(particle.generate_dict() is result)
+        self.assertEqual(json.loads(particle.generate()), result)
+        self.assertEqual(result[DataParticleKey.STREAM_NAME], TEST_PARTICLE_TYPE)
+        self.assertFalse(DataParticleKey.INTERNAL_TIMESTAMP in result)
+
+        # changing the particle builds it again
+        particle.set_internal_timestamp(self.sample_internal_timestamp)
+        result = particle.generate_dict()
+        self.assertEqual(result[DataParticleKey.INTERNAL_TIMESTAMP],
+                         self.sample_internal_timestamp)
+        self.assertFalse(particle.contents is result)
+
     def test_raw_generate(self):
         """
         Test generation of a raw data particle
@@ -166,6 +187,9 @@ class TestUnitDataParticle(MiUnitTestCase):
 
         self.assertEqual(raw_result, standard)
 
+        # Fields are in slots, not a per-instance dict
+        self.assertFalse(hasattr(self.raw_test_particle, '__dict__'))
+
     def test_timestamps(self):
         """
         Test bad timestamp configurations
@@ -237,3 +261,64 @@ class TestUnitDataParticle(MiUnitTestCase):
 
         with self.assertRaises(NotImplementedException):
             particle.data_particle_type()
+
+    def test_match_raw_data(self):
+        """
+        Test that a match handed in at creation is reused for the same pattern
+        """
+        regex = re.compile(r'SATPAR(\d{4}),')
+        match = regex.match(self.sample_raw_data)
+        particle = self.TestDataParticle(self.sample_raw_data, match=match)
+        self.assertTrue(particle._match_raw_data(regex) is match)
+        self.assertTrue(particle._match_raw_data(re.compile(r'SATPAR(\d{4}),')) is match)
+
+        # a different pattern matches the raw data again
+        other = particle._match_raw_data(re.compile(r'SATPAR\d{4},([\d.]+),'))
+        self.assertEquals(other.group(1), "10.01")
+
+        particle = self.TestDataParticle(self.sample_raw_data)
+        self.assertEquals(particle._match_raw_data(regex).group(1), "0229")
+
+    def test_schema(self):
+        """
+        Test values are built from the fields declared in a schema
+        """
+        regex = re.compile(r'SATPAR(?P<serial>\d{4}),([\d.]+),(\d+),(\d+)')
+
+        class SchemaParticle(DataParticle):
+            _data_particle_type = TEST_PARTICLE_TYPE
+            _schema = DataParticleSchema(regex, [
+                DataParticleField('serial', 'serial'),
+                DataParticleField('time', 2, float),
+                DataParticleField('counts', (3, 4), lambda a, b: int(a) + int(b))])
+
+        self.assertEqual(SchemaParticle._schema.value_ids, ('serial', 'time', 'counts'))
+        particle = SchemaParticle("SATPAR0229,10.01,2206,1\r\n")
+        self.assertEqual(particle._build_parsed_values(),
+                         [{DataParticleKey.VALUE_ID: 'serial', DataParticleKey.VALUE: '0229'},
+                          {DataParticleKey.VALUE_ID: 'time', DataParticleKey.VALUE: 10.01},
+                          {DataParticleKey.VALUE_ID: 'counts', DataParticleKey.VALUE: 2207}])
+
+        # the match handed in is used
+        particle = SchemaParticle("SATPAR0229,10.01,2206,1", match=regex.match("SATPAR0001,1,2,3"))
+        self.assertEqual(particle._build_parsed_values()[2][DataParticleKey.VALUE], 5)
+
+        with self.assertRaises(SampleException):
+            SchemaParticle("SATPAR0229,10.01")._build_parsed_values()
+        with self.assertRaisesRegexp(SampleException, 'ValueError while decoding time'):
+            SchemaParticle("SATPAR0229,10.0.1,2206,1")._build_parsed_values()
+
+        class NoneParticle(DataParticle):
+            _data_particle_type = TEST_PARTICLE_TYPE
+            _schema = DataParticleSchema(regex, [
+                DataParticleField('serial', 1, lambda serial: None)])
+
+        with self.assertRaisesRegexp(SampleException, 'No serial value parsed'):
+            NoneParticle("SATPAR0229,10.01,2206,1")._build_parsed_values()
+
+        with self.assertRaises(InstrumentParameterException):
+            DataParticleSchema(regex, [DataParticleField('bad', 5)])
+        with self.assertRaises(InstrumentParameterException):
+            DataParticleSchema(regex, [DataParticleField('bad', 'name')])
+        with self.assertRaises(InstrumentParameterException):
+            DataParticleSchema(regex, [DataParticleField('bad', (1, 2))])
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_driver_launcher
+@file mi/core/instrument/test/test_driver_launcher.py
+@brief Test cases for launching driver processes from fork servers
+"""
+
+__license__ = 'Apache 2.0'
+
+import os
+import sys
+import time
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.exceptions import DriverLaunchException
+from mi.core.instrument.driver_launcher import DriverLauncher
+from mi.core.instrument.zmq_driver_client import ZmqDriverClient
+from mi.core.instrument.zmq_driver_process import ZmqDriverProcess
+
+@attr('UNIT', group='mi')
+class TestUnitDriverLauncher(MiUnitTestCase):
+    """
+    Test drivers forked from warm interpreters
+    """
+    def setUp(self):
+        self.launcher = DriverLauncher(pool_size=2, python=sys.executable)
+        self.launcher.start()
+        self.addCleanup(self.launcher.stop)
+
+    def test_launch(self):
+        """
+        Test launched drivers answer commands and stop
+        """
+        procs = []
+        for i in range(3):
+            (dvr_proc, cmd_port, evt_port) = ZmqDriverProcess.launch_process(
+                'mi.core.instrument.instrument_driver', 'InstrumentDriver',
+                ppid=os.getpid(), batch_size=16, launcher=self.launcher)
+            procs.append(dvr_proc)
+            self.addCleanup(dvr_proc.kill)
+            self.assertEqual(dvr_proc.poll(), None)
+
+            driver_client = ZmqDriverClient('localhost', cmd_port, evt_port)
+            driver_client.start_messaging()
+            reply = driver_client.cmd_dvr('process_echo')
+            self.assertTrue(reply.startswith('ping from resource ppid:%d' % os.getpid()))
+            driver_client.cmd_dvr('stop_driver_process')
+            driver_client.stop_messaging()
+
+        self.assertEqual(len(set(dvr_proc.pid for dvr_proc in procs)), 3)
+        for dvr_proc in procs:
+            starttime = time.time()
+            while dvr_proc.poll() is None and time.time() - starttime < 10:
+                time.sleep(.1)
+            self.assertEqual(dvr_proc.poll(), 0)
+
+    def test_launch_failure(self):
+        """
+        Test a driver that can't be constructed is reported, and the server
+        carries on
+        """
+        self.assertRaises(DriverLaunchException, self.launcher.launch,
+                          'mi.core.instrument.no_such_driver', 'NoSuchDriver')
+
+        (dvr_proc, cmd_port, evt_port) = self.launcher.launch(
+            'mi.core.instrument.instrument_driver', 'InstrumentDriver', os.getpid())
+        self.addCleanup(dvr_proc.kill)
+        self.assertTrue(cmd_port > 0 and evt_port > 0)
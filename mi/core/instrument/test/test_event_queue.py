@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_event_queue
+@file mi/core/instrument/test/test_event_queue.py
+@brief Test cases for the bounded driver event queue
+"""
+
+__license__ = 'Apache 2.0'
+
+import json
+import time
+from threading import Thread
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.event_queue import EventQueue
+from mi.core.instrument.event_queue import EventQueueStatsKey
+from mi.core.instrument.event_queue import OverflowPolicy
+from mi.core.instrument.event_queue import is_raw_sample
+
+def sample(stream_name, value, as_json=False):
+    particle = {'stream_name': stream_name, 'values': [{'value_id': 'n', 'value': value}]}
+    if as_json:
+        particle = json.dumps(particle, sort_keys=True)
+    return {'type': DriverAsyncEvent.SAMPLE, 'value': particle}
+
+def state_change(state):
+    return {'type': DriverAsyncEvent.STATE_CHANGE, 'value': state}
+
+@attr('UNIT', group='mi')
+class TestUnitEventQueue(MiUnitTestCase):
+    """
+    Test the event queue stays bounded under each overflow policy
+    """
+    def test_take(self):
+        """
+        Test events come out in order and the queue empties
+        """
+        queue = EventQueue(10)
+        self.assertEqual(queue.take(0), [])
+        self.assertTrue(queue.put(1))
+        self.assertEqual(queue.put_all([2, 3]), 2)
+        self.assertEqual(len(queue), 3)
+        self.assertEqual(queue.take(), [1, 2, 3])
+        self.assertEqual(len(queue), 0)
+
+        queue.interrupt()
+        self.assertEqual(queue.take(), [])
+
+        self.assertRaises(InstrumentParameterException, EventQueue, 0)
+        self.assertRaises(InstrumentParameterException, EventQueue, 10, 'drop_everything')
+
+    def test_drop_newest(self):
+        """
+        Test events arriving at a full queue are dropped
+        """
+        queue = EventQueue(3, OverflowPolicy.DROP_NEWEST)
+        self.assertEqual(queue.put_all(range(5)), 3)
+        self.assertFalse(queue.put(5))
+        stats = queue.get_stats()
+        self.assertEqual(stats[EventQueueStatsKey.DROPPED], 3)
+        self.assertEqual(stats[EventQueueStatsKey.HIGH_WATER_MARK], 3)
+        self.assertEqual(queue.take(), [0, 1, 2])
+
+    def test_drop_oldest_raw(self):
+        """
+        Test raw particles go first, then other data, then control events
+        """
+        self.assertTrue(is_raw_sample(sample('raw', 1)))
+        self.assertTrue(is_raw_sample(sample('raw', 1, True)))
+        self.assertFalse(is_raw_sample(sample('parsed', 1, True)))
+        self.assertFalse(is_raw_sample(state_change('raw')))
+
+        queue = EventQueue(4)
+        events = [state_change('A'), sample('parsed', 1), sample('raw', 1, True), sample('raw', 2)]
+        queue.put_all(events)
+        queue.put_all([sample('parsed', 2), state_change('B'), state_change('C')])
+        self.assertEqual(queue.take(), [state_change('A'), state_change('B'),
+                                        state_change('C'), sample('parsed', 2)])
+        stats = queue.get_stats()
+        self.assertEqual(stats[EventQueueStatsKey.DROPPED], 3)
+        self.assertEqual(stats[EventQueueStatsKey.DROPPED_RAW], 2)
+
+        queue.put_all([state_change(i) for i in range(6)])
+        self.assertEqual(queue.take(), [state_change(i) for i in range(2, 6)])
+
+    def test_lanes(self):
+        """
+        Test a state change overtakes a backlog of samples
+        """
+        queue = EventQueue()
+        queue.put_all([sample('parsed', i) for i in range(10000)])
+        queue.put(state_change('A'))
+        queue.put({'type': DriverAsyncEvent.DIRECT_ACCESS, 'value': 'data'})
+        queue.put(state_change('B'))
+        self.assertEqual(queue.get_stats()[EventQueueStatsKey.QUEUED_CONTROL], 2)
+
+        events = queue.take()
+        self.assertEqual(len(events), 10003)
+        self.assertEqual(events[:3], [state_change('A'), state_change('B'), sample('parsed', 0)])
+        self.assertEqual(events[-1]['type'], DriverAsyncEvent.DIRECT_ACCESS)
+
+    def test_block(self):
+        """
+        Test a producer waits for room, and is let go when the queue closes
+        """
+        queue = EventQueue(2, OverflowPolicy.BLOCK)
+        queue.put_all([0, 1])
+        producer = Thread(target=queue.put_all, args=([2, 3, 4, 5],))
+        producer.start()
+        time.sleep(.1)
+        self.assertEqual(len(queue), 2)
+
+        taken = queue.take()
+        while len(taken) < 6:
+            taken += queue.take()
+        producer.join()
+        self.assertEqual(taken, range(6))
+        self.assertEqual(queue.get_stats()[EventQueueStatsKey.DROPPED], 0)
+        self.assertGreater(queue.get_stats()[EventQueueStatsKey.BLOCKED], 0)
+
+        queue.put_all([0, 1])
+        producer = Thread(target=queue.put, args=(2,))
+        producer.start()
+        time.sleep(.1)
+        queue.close()
+        producer.join()
+        self.assertEqual(queue.take(), [0, 1])
+        self.assertEqual(queue.get_stats()[EventQueueStatsKey.DROPPED], 1)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_heartbeat_watchdog
+@file mi/core/instrument/test/test_heartbeat_watchdog.py
+@brief Test cases for the shared heartbeat watchdog
+"""
+
+__license__ = 'Apache 2.0'
+
+import time
+import socket
+import threading
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.instrument.heartbeat_watchdog import HeartbeatWatchdog
+from mi.core.instrument.heartbeat_watchdog import WatchdogStatsKey
+from mi.core.instrument.port_agent_client import Listener
+from mi.core.instrument.port_agent_client import PortAgentPacket
+from mi.core.instrument.port_agent_client import HeartbeatStatsKey
+
+@attr('UNIT', group='mi')
+class TestUnitHeartbeatWatchdog(MiUnitTestCase):
+    """
+    Test deadlines are watched from one thread
+    """
+    def setUp(self):
+        self.watchdog = HeartbeatWatchdog()
+        self.addCleanup(self.watchdog.stop)
+        self.expired = []
+
+    def wait_for(self, items, count, timeout=5):
+        starttime = time.time()
+        while len(items) < count and time.time() - starttime < timeout:
+            time.sleep(.01)
+
+    def test_reset(self):
+        """
+        Test resets put the deadline off, and a missed deadline calls back
+        once until the timer is reset
+        """
+        starttime = time.time()
+        timer = self.watchdog.register(.2, lambda: self.expired.append(time.time()))
+        for i in range(5):
+            time.sleep(.1)
+            timer.reset()
+        self.assertEqual(self.expired, [])
+
+        self.wait_for(self.expired, 1)
+        self.assertEqual(len(self.expired), 1)
+        self.assertTrue(.65 < self.expired[0] - starttime < 1)
+        time.sleep(.4)
+        self.assertEqual(len(self.expired), 1)
+        self.assertEqual(timer.missed, 1)
+        self.assertFalse(timer.armed)
+
+        timer.reset(.1)
+        self.wait_for(self.expired, 2)
+        self.assertEqual(len(self.expired), 2)
+
+        timer.reset()
+        timer.cancel()
+        time.sleep(.3)
+        self.assertEqual(len(self.expired), 2)
+        self.assertRaises(InstrumentParameterException, self.watchdog.register, 0, None)
+
+    def test_many_timers(self):
+        """
+        Test many timers are watched by a single thread and counted
+        """
+        threads = threading.active_count()
+        timers = [self.watchdog.register(.2 + i * .001, lambda i=i: self.expired.append(i))
+                  for i in range(100)]
+        self.assertEqual(threading.active_count(), threads + 1)
+        self.assertEqual(self.watchdog.get_stats(),
+                         {WatchdogStatsKey.WATCHED: 100, WatchdogStatsKey.MISSED: 0})
+
+        # Keep the odd ones alive
+        for i in range(3):
+            time.sleep(.1)
+            for timer in timers[1::2]:
+                timer.reset()
+        self.wait_for(self.expired, 50)
+        self.assertEqual(self.expired, range(0, 100, 2))
+        self.assertEqual(self.watchdog.get_stats(),
+                         {WatchdogStatsKey.WATCHED: 50, WatchdogStatsKey.MISSED: 50})
+        self.assertEqual(threading.active_count(), threads + 1)
+
+    def test_listener(self):
+        """
+        Test listener heartbeats are watched, and missing them reported
+        """
+        (port_agent, driver) = socket.socketpair()
+        self.addCleanup(port_agent.close)
+        self.addCleanup(driver.close)
+        driver.setblocking(0)
+        errors = []
+        listener = Listener(driver, None, 1, 2, callback_error=errors.append,
+                            watchdog=self.watchdog)
+        listener.heartbeat = .4
+        listener.daemon = True
+        listener.start()
+        self.addCleanup(listener.join)
+        self.addCleanup(listener.done)
+
+        heartbeat = PortAgentPacket(PortAgentPacket.HEARTBEAT)
+        heartbeat.attach_data('')
+        heartbeat.pack_header()
+        for i in range(4):
+            time.sleep(.1)
+            port_agent.sendall(heartbeat.get_header())
+        time.sleep(.1)
+        self.assertEqual(errors, [])
+
+        self.wait_for(errors, 1)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith('Maximum allowable'))
+        stats = listener.get_heartbeat_stats()
+        self.assertEqual(stats[HeartbeatStatsKey.HEARTBEATS_RECEIVED], 4)
+        self.assertEqual(stats[HeartbeatStatsKey.HEARTBEATS_MISSED], 2)
+        self.assertEqual(stats[HeartbeatStatsKey.CONSECUTIVE_MISSED], 2)
+        self.assertEqual(self.watchdog.get_stats()[WatchdogStatsKey.MISSED], 2)
@@ -26,6 +26,8 @@ from mi.core.exceptions import NotImplementedException
 from mi.core.instrument.instrument_driver import DriverEvent
 from mi.core.instrument.instrument_driver import SingleConnectionInstrumentDriver
 from mi.core.instrument.instrument_driver import DriverParameter
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument.instrument_driver import DriverConfigKey
 from mi.core.instrument.instrument_protocol import InstrumentProtocol
 
 @attr('UNIT', group='mi')
@@ -154,6 +156,32 @@ class TestUnitInstrumentDriver(MiUnitTestCase):
         self.assertEquals(running_config["foo"], 10)
         self.assertEquals(running_config["bar"], 15)        
         
+    def test_delta_config_events(self):
+        """
+        Test config change events carry the whole config by default, and
+        only the changed parameters once delta config events are on
+        """
+        param_dict = self.driver._protocol._param_dict
+        self.driver.get_resource = lambda *args, **kwargs: param_dict.get_config()
+        events = []
+        self.driver._send_event = events.append
+
+        self.driver._driver_event(DriverAsyncEvent.CONFIG_CHANGE)
+        self.assertEqual(events[-1]['value'], {"foo": 10, "bar": 15, "baz": 30, "bat": 40})
+
+        self.driver.set_init_params({DriverConfigKey.DELTA_CONFIG_EVENTS: True})
+        self.assertTrue(self.driver._delta_config_events)
+
+        param_dict.update("bar=20")
+        param_dict.update("baz=30")
+        self.driver._driver_event(DriverAsyncEvent.CONFIG_CHANGE)
+        self.assertEqual(events[-1]['type'], DriverAsyncEvent.CONFIG_CHANGE)
+        self.assertEqual(events[-1]['value'], {"bar": 20})
+
+        # Nothing changed, nothing sent
+        self.driver._driver_event(DriverAsyncEvent.CONFIG_CHANGE)
+        self.assertEqual(len(events), 2)
+
     def test_apply_startup_params(self):
         """
         Test to see that calling a driver's apply_startup_params successfully
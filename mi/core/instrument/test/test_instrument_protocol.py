@@ -12,6 +12,7 @@ __license__ = 'Apache 2.0'
 
 import logging
 import time
+import threading
 import ntplib
 import datetime
 from mock import Mock
@@ -20,17 +21,20 @@ from mi.core.log import get_logger ; log = get_logger()
 from mi.core.instrument.instrument_protocol import InstrumentProtocol
 from mi.core.instrument.instrument_protocol import MenuInstrumentProtocol
 from mi.core.instrument.instrument_protocol import CommandResponseInstrumentProtocol
+from mi.core.instrument.instrument_protocol import BufferStatsKey
 from mi.instrument.satlantic.par_ser_600m.driver import SAMPLE_REGEX
 from mi.instrument.satlantic.par_ser_600m.driver import SatlanticPARDataParticle
 
 from mi.core.driver_scheduler import DriverScheduler
 from mi.core.instrument.instrument_driver import DriverConfigKey
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
 from mi.core.driver_scheduler import DriverSchedulerConfigKey
 from mi.core.driver_scheduler import TriggerType
 
 from mi.core.unit_test import MiUnitTestCase
 import unittest
 from mi.core.exceptions import InstrumentProtocolException
+from mi.core.exceptions import InstrumentTimeoutException
 from mi.core.exceptions import InstrumentParameterException
 from mi.core.exceptions import NotImplementedException
 from mi.core.common import BaseEnum
@@ -92,6 +96,119 @@ class TestUnitInstrumentProtocol(MiUnitTestCase):
         self.protocol = CommandResponseInstrumentProtocol(Prompts, '\r\n', self.event_callback)
         self.assertEqual(self.protocol._get_prompts(), expected)
 
+    def test_get_response(self):
+        """
+        ensure a response is returned as soon as its prompt arrives
+        """
+        prompts = ['aa', 'bbb', 'c', 'dddd']
+        self.protocol = CommandResponseInstrumentProtocol(prompts, '\r\n', self.event_callback)
+
+        timer = threading.Timer(0.2, self.protocol.add_to_buffer, ["response\r\nbbb"])
+        starttime = time.time()
+        timer.start()
+        (prompt, result) = self.protocol._get_response(timeout=10)
+        self.assertEqual(prompt, 'bbb')
+        self.assertEqual(result, "response\r\nbbb")
+        self.assertLess(time.time() - starttime, 1)
+
+        self.protocol._promptbuf = ''
+        self.protocol._linebuf = ''
+        timer = threading.Timer(0.2, self.protocol.add_to_buffer, ["raw\r\ndddd  "])
+        timer.start()
+        self.assertEqual(self.protocol._get_raw_response(timeout=10),
+                         ('dddd', "raw\r\ndddd  "))
+
+        self.assertRaises(InstrumentTimeoutException,
+                          self.protocol._get_response, timeout=.3, expected_prompt='zz')
+
+    def test_wakeup(self):
+        """
+        ensure wakeup returns once the prompt arrives rather than after the delay
+        """
+        prompts = ['aa', 'bbb', 'c', 'dddd']
+        self.protocol = CommandResponseInstrumentProtocol(prompts, '\r\n', self.event_callback)
+        self.protocol._send_wakeup = lambda: self.protocol.add_to_buffer("\r\naa")
+
+        starttime = time.time()
+        self.assertEqual(self.protocol._wakeup(timeout=10, delay=5), 'aa')
+        self.assertLess(time.time() - starttime, 1)
+
+        self.protocol._send_wakeup = lambda: None
+        self.assertRaises(InstrumentTimeoutException,
+                          self.protocol._wakeup, timeout=.3, delay=.1)
+
+    def test_find_prompt(self):
+        """
+        ensure prompts are found as data trickles in and forgotten when the
+        prompt buffer is cleared
+        """
+        prompts = ['S>', 'S>S>', '<Executed/>']
+        self.protocol = CommandResponseInstrumentProtocol(prompts, '\r\n', self.event_callback)
+        prompt_list = self.protocol._get_prompts()
+        self.assertEqual(prompt_list, ['<Executed/>', 'S>S>', 'S>'])
+
+        self.assertEqual(self.protocol._find_prompt(prompt_list), None)
+        self.protocol.add_to_buffer("ds\r\nS")
+        self.assertEqual(self.protocol._find_prompt(prompt_list), None)
+        self.protocol.add_to_buffer(">vbatt = 12.1\r\n<Exec")
+        self.assertEqual(self.protocol._find_prompt(prompt_list), ('S>', 4))
+        self.protocol.add_to_buffer("uted/>\r\n")
+        self.assertEqual(self.protocol._find_prompt(prompt_list), ('<Executed/>', 20))
+        self.assertEqual(self.protocol._get_response(timeout=0),
+                         ('<Executed/>', "ds\r\nS>vbatt = 12.1\r\n<Executed/>"))
+
+        # An expected prompt gets its own automaton over the same buffer
+        self.assertEqual(self.protocol._find_prompt(['vbatt']), ('vbatt', 6))
+
+        self.protocol._promptbuf = ''
+        self.assertEqual(self.protocol._find_prompt(prompt_list), None)
+        self.assertEqual(self.protocol._find_prompt(['vbatt']), None)
+        self.protocol.add_to_buffer("S>S>")
+        self.assertEqual(self.protocol._find_prompt(prompt_list), ('S>S>', 0))
+
+    def test_buffer_size(self):
+        """
+        ensure the line and prompt buffers drop their oldest data past the
+        buffer size and count what they drop
+        """
+        prompts = ['S>']
+        self.protocol = CommandResponseInstrumentProtocol(prompts, '\r\n', self.event_callback,
+                                                          buffer_size=16)
+        self.assertEqual(self.protocol.get_buffer_stats(), {
+            BufferStatsKey.BUFFER_SIZE: 16,
+            BufferStatsKey.LINE_BYTES_BUFFERED: 0,
+            BufferStatsKey.LINE_BYTES_DROPPED: 0,
+            BufferStatsKey.PROMPT_BYTES_BUFFERED: 0,
+            BufferStatsKey.PROMPT_BYTES_DROPPED: 0})
+
+        self.protocol.add_to_buffer("S>")
+        self.assertEqual(self.protocol._find_prompt(prompts), ('S>', 0))
+        for i in range(100):
+            self.protocol.add_to_buffer("%04d\r\n" % i)
+
+        self.assertEqual(self.protocol._linebuf, "97\r\n0098\r\n0099\r\n")
+        self.assertEqual(self.protocol._promptbuf, "97\r\n0098\r\n0099\r\n")
+        # The prompt went out with the oldest data
+        self.assertEqual(self.protocol._find_prompt(prompts), None)
+        self.protocol.add_to_buffer("S>")
+        self.assertEqual(self.protocol._find_prompt(prompts), ('S>', 14))
+
+        stats = self.protocol.get_buffer_stats()
+        self.assertEqual(stats[BufferStatsKey.LINE_BYTES_BUFFERED], 16)
+        self.assertEqual(stats[BufferStatsKey.LINE_BYTES_DROPPED], 588)
+        self.assertEqual(stats[BufferStatsKey.PROMPT_BYTES_DROPPED], 588)
+
+        self.protocol._linebuf = ''
+        self.protocol._promptbuf = ''
+        self.protocol.set_buffer_size(1024)
+        stats = self.protocol.get_buffer_stats()
+        self.assertEqual(stats[BufferStatsKey.BUFFER_SIZE], 1024)
+        self.assertEqual(stats[BufferStatsKey.LINE_BYTES_BUFFERED], 0)
+        self.assertEqual(stats[BufferStatsKey.LINE_BYTES_DROPPED], 588)
+
+        self.assertRaises(InstrumentParameterException,
+                          self.protocol.set_buffer_size, 0)
+
     def test_extraction(self):
         sample_line = "SATPAR0229,10.01,2206748544,234\r\n"
         ntptime = ntplib.system_to_ntp_time(time.time())
@@ -104,6 +221,20 @@ class TestUnitInstrumentProtocol(MiUnitTestCase):
         log.debug("R: %s" % result)
         self.assertEqual(result['stream_name'], SatlanticPARDataParticle(None, None).data_particle_type())
 
+        # The published sample is the same dict, it is only serialized on
+        # the way out of the driver process
+        events = []
+        self.protocol._driver_event = lambda type, val=None: events.append((type, val))
+        result = self.protocol._extract_sample(SatlanticPARDataParticle,
+                                               SAMPLE_REGEX,
+                                               sample_line,
+                                               ntptime)
+        self.assertEqual(events, [(DriverAsyncEvent.SAMPLE, result)])
+        self.assertTrue(events[0][1] is result)
+        self.assertEqual(self.protocol._extract_sample(SatlanticPARDataParticle,
+                                                       SAMPLE_REGEX, "junk",
+                                                       ntptime), None)
+
         # Test the format of the result in the individual driver tests. Here,
         # just tests that the result is there.
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_io_loop
+@file mi/core/instrument/test/test_io_loop.py
+@brief Test cases for the I/O event loop
+"""
+
+__license__ = 'Apache 2.0'
+
+import time
+import socket
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.exceptions import InstrumentTimeoutException
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.instrument.io_loop import IOLoop
+from mi.core.instrument.io_loop import Future
+
+@attr('UNIT', group='mi')
+class TestUnitIOLoop(MiUnitTestCase):
+    """
+    Test timers, callbacks and sockets are serviced from the loop thread
+    """
+    def setUp(self):
+        self.loop = IOLoop()
+        self.loop.start()
+        self.addCleanup(self.stop_loop)
+
+    def stop_loop(self):
+        self.loop.stop()
+        self.loop.join()
+        self.loop.close()
+
+    def test_call_later(self):
+        """
+        Test timers run in deadline order and cancelled ones don't run
+        """
+        calls = []
+        done = Future()
+
+        def schedule():
+            self.assertTrue(self.loop.in_loop_thread())
+            self.loop.call_later(.2, calls.append, 'last')
+            self.loop.call_later(.05, calls.append, 'first')
+            self.loop.call_later(.1, calls.append, 'cancelled').cancel()
+            self.loop.call_later(.3, done.set_result, None)
+
+        starttime = time.time()
+        self.loop.submit(schedule).result(timeout=5)
+        done.result(timeout=5)
+        self.assertEqual(calls, ['first', 'last'])
+        self.assertTrue(time.time() - starttime >= .3)
+        self.assertFalse(self.loop.in_loop_thread())
+
+    def test_submit(self):
+        """
+        Test submitted work hands back its result or exception
+        """
+        self.assertEqual(self.loop.submit(lambda x: x * 2, 21).result(timeout=5), 42)
+
+        def fail():
+            raise InstrumentParameterException('bad')
+        future = self.loop.submit(fail)
+        self.assertRaises(InstrumentParameterException, future.result, 5)
+        self.assertTrue(isinstance(future.exception(), InstrumentParameterException))
+
+        # A wakeup from another thread gets the loop out of poll() at once
+        starttime = time.time()
+        self.loop.call_later(60, lambda: None)
+        self.assertEqual(self.loop.submit(lambda: 'soon').result(timeout=5), 'soon')
+        self.assertTrue(time.time() - starttime < 1)
+
+    def test_future(self):
+        """
+        Test waiting on and chaining futures
+        """
+        future = Future()
+        self.assertFalse(future.done())
+        self.assertRaises(InstrumentTimeoutException, future.result, .1)
+
+        results = []
+        future.add_done_callback(lambda f: results.append(f.result()))
+        self.loop.call_later(.1, future.set_result, 'done')
+        self.assertEqual(future.result(timeout=5), 'done')
+        self.assertEqual(results, ['done'])
+
+        # Only the first result counts, later callbacks run straight away
+        future.set_result('again')
+        future.add_done_callback(lambda f: results.append(f.result()))
+        self.assertEqual(results, ['done', 'done'])
+
+    def test_reader_writer(self):
+        """
+        Test sockets are read and written as they become ready
+        """
+        (a, b) = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        b.setblocking(0)
+        received = []
+        got = Future()
+
+        def on_readable():
+            received.append(b.recv(1024))
+            if ''.join(received) == 'hello world':
+                self.loop.remove_reader(b)
+                got.set_result(None)
+
+        def on_writable():
+            b.send('reply')
+            self.loop.remove_writer(b)
+
+        self.loop.submit(self.loop.add_reader, b, on_readable).result(timeout=5)
+        a.sendall('hello ')
+        time.sleep(.05)
+        a.sendall('world')
+        got.result(timeout=5)
+        self.assertEqual(''.join(received), 'hello world')
+
+        self.loop.submit(self.loop.add_writer, b.fileno(), on_writable).result(timeout=5)
+        a.settimeout(5)
+        self.assertEqual(a.recv(1024), 'reply')
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_multi_driver_process
+@file mi/core/instrument/test/test_multi_driver_process.py
+@brief Test cases for driver processes hosting many drivers
+"""
+
+__license__ = 'Apache 2.0'
+
+import time
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.instrument.zmq_driver_client import ZmqDriverClient
+from mi.core.instrument.multi_driver_process import MultiDriverProcess
+from mi.core.instrument.event_queue import EventQueueStatsKey
+
+DRIVER_MODULE = 'mi.core.instrument.instrument_driver'
+DRIVER_CLASS = 'InstrumentDriver'
+
+@attr('UNIT', group='mi')
+class TestUnitMultiDriverProcess(MiUnitTestCase):
+    """
+    Test commands and events are routed by driver id
+    """
+    def setUp(self):
+        self.host = MultiDriverProcess([('sbe37', DRIVER_MODULE, DRIVER_CLASS),
+                                        ('sbe37_2', DRIVER_MODULE, DRIVER_CLASS),
+                                        ('broken', 'mi.core.instrument.no_such_driver', 'NoSuchDriver')],
+                                       None, None, None)
+        self.assertTrue(self.host.construct_driver())
+        self.host.start_messaging()
+        self.assertTrue(self.host.ports_ready.wait(10))
+        self.addCleanup(self.stop_host)
+
+    def stop_host(self):
+        self.host.stop_messaging()
+        self.host.cmd_thread.join()
+        self.host.evt_thread.join()
+
+    def assertError(self, reply, exception_class):
+        """
+        Assert a reply is the (error code, message, stacks) triple of an
+        exception.
+        """
+        self.assertTrue(isinstance(reply, tuple))
+        self.assertTrue(reply[1].startswith(exception_class + ':'), reply[1])
+
+    def start_client(self, driver_id):
+        """
+        Start a client for a hosted driver, returning it once its event
+        subscription is through, and the list its events are added to.
+        """
+        events = []
+        client = ZmqDriverClient('localhost', self.host.cmd_port, self.host.evt_port,
+                                 driver_id=driver_id)
+        client.start_messaging(events.append)
+        self.addCleanup(client.stop_messaging)
+        while not events:
+            client.cmd_dvr('test_events', events=['hello'])
+            time.sleep(.01)
+        time.sleep(.1)
+        del events[:]
+        return (client, events)
+
+    def wait_for(self, events, count):
+        starttime = time.time()
+        while len(events) < count and time.time() - starttime < 5:
+            time.sleep(.01)
+
+    def test_routing(self):
+        """
+        Test each client commands its own driver and gets only its events
+        """
+        (client, events) = self.start_client('sbe37')
+        (client_2, events_2) = self.start_client('sbe37_2')
+        self.assertEqual(client.cmd_host('list_drivers'), ['sbe37', 'sbe37_2'])
+
+        reply = client.cmd_dvr('process_echo')
+        self.assertTrue(reply.startswith('ping from resource'))
+        self.assertError(client.cmd_dvr('no_such_command'), 'InstrumentCommandException')
+
+        sent = [{'type': 'test', 'value': i} for i in range(100)]
+        client.cmd_dvr('test_events', events=sent)
+        client_2.cmd_dvr('test_events', events=[{'type': 'test', 'value': 'two'}])
+        self.wait_for(events, 100)
+        self.wait_for(events_2, 1)
+        time.sleep(.1)
+        self.assertEqual(events, sent)
+        self.assertEqual(events_2, [{'type': 'test', 'value': 'two'}])
+
+        stats = client.cmd_host('get_event_queue_stats')
+        self.assertEqual(stats['sbe37'][EventQueueStatsKey.HIGH_WATER_MARK], 100)
+        self.assertEqual(stats['sbe37_2'][EventQueueStatsKey.HIGH_WATER_MARK], 1)
+
+        self.stop_host()
+        self.assertEqual(self.host.drivers, {})
+
+    def test_add_remove(self):
+        """
+        Test drivers are added and removed while the host runs
+        """
+        (client, events) = self.start_client('sbe37')
+        self.assertEqual(client.cmd_host('add_driver', 'par', DRIVER_MODULE, DRIVER_CLASS), 'par')
+        self.assertError(client.cmd_host('add_driver', 'par', DRIVER_MODULE, DRIVER_CLASS),
+                         'InstrumentParameterException')
+        (client_2, events_2) = self.start_client('par')
+        self.assertEqual(client.cmd_host('list_drivers'), ['par', 'sbe37', 'sbe37_2'])
+
+        self.assertEqual(client_2.cmd_dvr('stop_driver_process'), 'stop_driver_process')
+        self.assertEqual(client.cmd_host('remove_driver', 'sbe37_2'), 'remove_driver')
+        self.assertEqual(client.cmd_host('list_drivers'), ['sbe37'])
+        self.assertError(client_2.cmd_dvr('process_echo'), 'InstrumentParameterException')
+        self.assertError(client.cmd_host('no_such_command'), 'InstrumentCommandException')
+
+        self.assertEqual(client.cmd_host('stop_driver_process'), 'stop_driver_process')
+        self.host.cmd_thread.join()
+        self.assertEqual(self.host.drivers, {})
@@ -15,6 +15,7 @@ from gevent import monkey; monkey.patch_all()
 import gevent
 
 import logging
+import socket
 import unittest
 import re
 import time
@@ -32,6 +33,7 @@ from mi.core.port_agent_simulator import TCPSimulatorServer
 from mi.idk.unit_test import InstrumentDriverTestCase
 from mi.idk.unit_test import InstrumentDriverIntegrationTestCase
 from mi.core.instrument.port_agent_client import PortAgentClient, PortAgentPacket, Listener
+from mi.core.instrument.port_agent_client import ntp_from_fixed, ntp_to_fixed
 
 # MI logger
 from mi.core.log import get_logger ; log = get_logger()
@@ -288,6 +290,48 @@ class PAClientUnitTestCase(MiUnitTest):
         self.assertTrue(len(mock_init_comms.mock_calls) == 1)
         self.assertTrue(self.errorCallbackCalled == 1)
         
+    def test_listener_framing(self):
+        """
+        Test that the listener frames several packets from one receive and
+        reassembles a packet that arrives in several segments.
+        """
+        (port_agent, driver) = socket.socketpair()
+        driver.setblocking(0)
+        received = []
+        paListener = Listener(driver, None, 0, 5, received.append, self.myGotRaw, self.myGotError)
+
+        payloads = ["first packet", "second packet", "third " * 3000]
+        stream = ""
+        for payload in payloads:
+            paPacket = PortAgentPacket(PortAgentPacket.DATA_FROM_INSTRUMENT)
+            paPacket.attach_data(payload)
+            paPacket.pack_header()
+            stream += paPacket.get_header() + payload
+
+        split = len(stream) - 1000
+        port_agent.sendall(stream[:split])
+        while len(received) < 2:
+            try:
+                paListener.receive()
+            except socket.error:
+                time.sleep(.01)
+        self.assertEqual([p.get_data() for p in received], payloads[:2])
+
+        port_agent.sendall(stream[split:])
+        while len(received) < 3:
+            try:
+                paListener.receive()
+            except socket.error:
+                time.sleep(.01)
+        self.assertEqual(received[2].get_data(), payloads[2])
+        self.assertEqual(received[2].get_data_size(), len(payloads[2]))
+
+        # checksums are verified by default
+        self.assertTrue(all([p.is_valid() for p in received]))
+
+        port_agent.close()
+        driver.close()
+
     @unittest.skip('not finished yet')
     def test_port_agent_client_receive(self):
         ipaddr = "67.58.49.194"
@@ -327,27 +371,29 @@ class TestPortAgentPacket(MiUnitTest):
 
     def setUp(self):
         self.pap = PortAgentPacket()
-        #self.test_time = time.time()
-        #self.ntp_time = self.system_to_ntp_time(self.test_time)
+        self.test_time = time.time()
+        self.ntp_time = self.system_to_ntp_time(self.test_time)
 
-        #self.pap.set_timestamp(self.ntp_time)
+        self.pap.attach_timestamp(self.ntp_time)
 
 
     def test_pack_header(self):
         self.pap.attach_data("Only the length of this matters?") # 32 chars
-        #self.pap.set_timestamp(3564425404.85)
+        self.pap.attach_timestamp(3564396604.5)
         self.pap.pack_header()
         header = self.pap.get_header()
-        self.assertEqual(header, array.array('B', [163, 157, 122, 2, 0, 48, 14, 145, 65, 234, 142, 154, 23, 155, 51, 51]))
+        self.assertEqual(array.array('B', header), array.array('B', [163, 157, 122, 2, 0, 48, 16, 33, 212, 116, 96, 60, 128, 0, 0, 0]))
+        self.assertEqual(self.pap.get_header_checksum(), 4129)
         pass
 
     def test_unpack_header(self):
         self.pap = PortAgentPacket()
-        data = self.pap.unpack_header(array.array('B', [163, 157, 122, 2, 0, 48, 14, 145, 65, 234, 142, 154, 23, 155, 51, 51]))
+        data = self.pap.unpack_header(array.array('B', [163, 157, 122, 2, 0, 48, 14, 145, 212, 116, 96, 60, 128, 0, 0, 0]))
 
         self.assertEqual(self.pap.get_header_type(), 2)
         self.assertEqual(self.pap.get_header_length(), 32)
-        self.assertEqual(time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.localtime(self.ntp_to_system_time(self.pap.get_timestamp()))), "Thu, 13 Dec 2012 14:10:04 +0000")
+        self.assertEqual(time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime(self.ntp_to_system_time(self.pap.get_timestamp()))), "Thu, 13 Dec 2012 14:10:04 +0000")
+        self.assertEqual(self.pap.get_timestamp(), 3564396604.5)
         self.assertEqual(self.pap.get_header_recv_checksum(), 3729) #@TODO Probably should wire in one of these checksums.
         self.assertEqual(self.pap.get_header_checksum(), None)
         pass
@@ -365,9 +411,29 @@ class TestPortAgentPacket(MiUnitTest):
         self.pap.unpack_header(header)
 
         result = self.pap.get_timestamp()
-        self.assertEqual(self.ntp_time, result)
+        self.assertAlmostEqual(self.ntp_time, result, places=6)
         pass
 
+    def test_ntp_fixed_point(self):
+        self.assertEqual(ntp_to_fixed(3564396604.5), (3564396604, 0x80000000))
+        self.assertEqual(ntp_from_fixed(3564396604, 0x80000000), 3564396604.5)
+        self.assertEqual(ntp_from_fixed(*ntp_to_fixed(1.25)), 1.25)
+
+    def test_checksum(self):
+        self.pap.attach_data("sweet polly purebread" * 100)
+        self.pap.pack_header()
+
+        received = PortAgentPacket()
+        received.unpack_header(self.pap.get_header())
+        received.attach_data(self.pap.get_data())
+        received.verify_checksum()
+        self.assertTrue(received.is_valid())
+        self.assertEqual(received.get_header_recv_checksum(), self.pap.get_header_checksum())
+
+        received.attach_data("sweet polly purebreae" + "sweet polly purebread" * 99)
+        received.verify_checksum()
+        self.assertFalse(received.is_valid())
+
 @attr('INT', group='mi')
 class PAClientIntTestCase(InstrumentDriverTestCase):
 #class PAClientIntTestCase(MiIntTestCase):
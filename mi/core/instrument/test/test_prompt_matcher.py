@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_prompt_matcher
+@file mi/core/instrument/test/test_prompt_matcher.py
+@brief Test cases for the prompt matcher automaton
+"""
+
+__license__ = 'Apache 2.0'
+
+import random
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.instrument.prompt_matcher import PromptMatcher
+
+@attr('UNIT', group='mi')
+class TestUnitPromptMatcher(MiUnitTestCase):
+    """
+    Test the prompt matcher against the str.find() scan it replaces
+    """
+    def find_prompt(self, prompts, buffer):
+        """
+        The old prompt scan: the first prompt in the list found anywhere.
+        """
+        for item in prompts:
+            index = buffer.find(item)
+            if index >= 0:
+                return (item, index)
+
+    def test_match(self):
+        """
+        Test prompts are ranked by list order, not by where they are found
+        """
+        matcher = PromptMatcher(['MAIN -->', 'Press ENTER to continue.', '-->'])
+        self.assertEqual(matcher.match(), None)
+
+        matcher.feed("--")
+        self.assertEqual(matcher.match(), None)
+        matcher.feed(">")
+        self.assertEqual(matcher.match(), ('-->', 0))
+        matcher.feed("\r\nMAIN -->")
+        self.assertEqual(matcher.match(), ('MAIN -->', 5))
+        matcher.feed("MAIN -->")
+        self.assertEqual(matcher.match(), ('MAIN -->', 5))
+        self.assertEqual(matcher.offset, 21)
+
+        matcher.reset()
+        self.assertEqual(matcher.match(), None)
+        self.assertEqual(matcher.offset, 0)
+        matcher.feed("Press ENTER to continue.")
+        self.assertEqual(matcher.match(), ('Press ENTER to continue.', 0))
+
+    def test_overlapping_prompts(self):
+        """
+        Test prompts that are suffixes or substrings of each other
+        """
+        prompts = ['aab', 'ab', 'b', 'abab']
+        matcher = PromptMatcher(prompts)
+        for char in "xaabab":
+            matcher.feed(char)
+        self.assertEqual(matcher.match(), ('aab', 1))
+
+        matcher = PromptMatcher(['abab', 'ab'])
+        matcher.feed("aabab")
+        self.assertEqual(matcher.match(), ('abab', 1))
+
+        matcher = PromptMatcher(['', 'S>'])
+        self.assertEqual(matcher.match(), ('', 0))
+        matcher = PromptMatcher([])
+        matcher.feed("S>")
+        self.assertEqual(matcher.match(), None)
+
+    def test_random_data(self):
+        """
+        Test random data fed in random pieces matches the str.find() scan
+        """
+        rand = random.Random(42)
+        for i in range(200):
+            prompts = [''.join(rand.choice('ab>') for j in range(rand.randint(1, 4)))
+                       for k in range(rand.randint(1, 5))]
+            buffer = ''.join(rand.choice('ab>\r\n') for j in range(rand.randint(0, 40)))
+
+            matcher = PromptMatcher(prompts)
+            position = 0
+            while position < len(buffer):
+                size = rand.randint(1, 5)
+                matcher.feed(buffer[position:position+size])
+                position += size
+                self.assertEqual(matcher.match(),
+                                 self.find_prompt(prompts, buffer[:position]))
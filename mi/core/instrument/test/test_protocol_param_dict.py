@@ -10,12 +10,15 @@
 __author__ = 'Steve Foley'
 __license__ = 'Apache 2.0'
 
+import re
 from ooi.logging import log
 from nose.plugins.attrib import attr
 from mi.core.unit_test import MiUnitTestCase
+from mi.core.exceptions import InstrumentParameterException
 from mi.core.instrument.protocol_param_dict import ProtocolParameterDict
 from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
 from mi.core.instrument.protocol_param_dict import ParameterDictVal, FunctionParamDictVal, RegexParamDictVal
+from mi.core.instrument.protocol_param_dict import get_regex
 
 @attr('UNIT', group='mi')
 class TestUnitProtocolParameterDict(MiUnitTestCase):
@@ -122,6 +125,141 @@ bar=200, baz=300
         self.assertEquals(self.param_dict.get("bar"), 200)
         self.assertEquals(self.param_dict.get("baz"), 300)
         
+    def test_update_lines(self):
+        """
+        Test a multi-line response updates the dictionary as updating each
+        line in turn does, and the changed parameters are returned
+        """
+        sample_input = "\r\n".join(["foo=100",
+                                     "bar=200, baz=300, foo=110",
+                                     "nothing here",
+                                     "baz=301",
+                                     ""])
+        expected = ProtocolParameterDict()
+        expected._param_dict = dict((name, RegexParamDictVal(name, val.pattern, val.f_getval, val.f_format))
+                                    for (name, val) in self.param_dict._param_dict.iteritems())
+        for line in sample_input.split("\r\n"):
+            expected.update(line)
+
+        result = self.param_dict.update_lines(sample_input, "\r\n")
+        self.assertEqual(result, set(["foo", "bar", "baz"]))
+        self.assertEqual(self.param_dict.get_config(), expected.get_config())
+        self.assertEqual(self.param_dict.get("foo"), 110)
+        self.assertEqual(self.param_dict.get("baz"), 301)
+
+        # Only values that change are returned
+        result = self.param_dict.update_lines("foo=110\nbat=5\nqux=6")
+        self.assertEqual(result, set(["bat", "qux"]))
+        self.assertEqual(self.param_dict.update_lines("foo=110"), set())
+
+    def test_update_lines_index(self):
+        """
+        Test parameters whose literals overlap or start one another are
+        all found, parameters without a literal are tried on every line, and
+        the index follows parameters added after it is built
+        """
+        param_dict = ProtocolParameterDict()
+        param_dict.add("samplenum", r'samplenum = (\d+)', lambda match : int(match.group(1)), str)
+        param_dict.add("sample", r'sample(?:s)? = (\d+)', lambda match : int(match.group(1)), str)
+        param_dict.add("plenum", r'plenum = (\d+)', lambda match : int(match.group(1)), str)
+        param_dict.add("number", r'^(\d+)$', lambda match : int(match.group(1)), str)
+        param_dict.add("nocase", r'(?i)VOLTS = (\d+)', lambda match : int(match.group(1)), str)
+
+        result = param_dict.update_lines("samplenum = 3\nsample = 4\n42\nvolts = 12")
+        self.assertEqual(result, set(["samplenum", "sample", "plenum", "number", "nocase"]))
+        self.assertEqual(param_dict.get_config(), {"samplenum": 3, "sample": 4, "plenum": 3,
+                                                   "number": 42, "nocase": 12})
+
+        param_dict.add_paramdictval(
+            FunctionParamDictVal("length", len, str, value=0))
+        self.assertEqual(param_dict.update_lines("samplenum = 5\nsamples = 6"),
+                         set(["samplenum", "plenum", "sample", "length"]))
+        self.assertEqual(param_dict.get("length"), 11)
+
+    def test_update_lines_multi_match(self):
+        """
+        Test multi-line responses update like multi_match_update does, line
+        by line
+        """
+        def build():
+            param_dict = ProtocolParameterDict()
+            param_dict.add("first", r'p = (\d+), t = \d+', lambda match : int(match.group(1)), str,
+                           multi_match=True)
+            param_dict.add("second", r'p = \d+, t = (\d+)', lambda match : int(match.group(1)), str,
+                           multi_match=True)
+            param_dict.add("single", r'n = (\d+)', lambda match : int(match.group(1)), str)
+            param_dict.add("other", r't = (\d+)', lambda match : int(match.group(1)), str)
+            return param_dict
+
+        sample_input = "p = 1, t = 2\nn = 3, t = 4\nt = 5"
+        expected = build()
+        for line in sample_input.split("\n"):
+            expected.multi_match_update(line)
+
+        param_dict = build()
+        param_dict.update_lines(sample_input, multi_match=True)
+        self.assertEqual(param_dict.get_config(), expected.get_config())
+
+    def test_change_tracking(self):
+        """
+        Test changed values are given versions, and the changes since a
+        version and since the dictionary was marked clean are reported
+        """
+        self.assertEqual(self.param_dict.get_current_version(), 0)
+        self.assertEqual(self.param_dict.get_dirty_list(), [])
+
+        self.param_dict.update("foo=100")
+        first = self.param_dict.get_current_version()
+        self.assertTrue(first > 0)
+        self.assertEqual(self.param_dict.get_changes_since(0), {"foo": 100})
+        self.assertEqual(self.param_dict.get_dirty_list(), ["foo"])
+
+        # The same value is not a change
+        self.param_dict.update("foo=100")
+        self.param_dict.update_many("nothing here")
+        self.assertEqual(self.param_dict.get_current_version(), first)
+
+        self.param_dict.update_lines("bar=200\nbaz=300")
+        self.param_dict.set("bat", 5)
+        self.param_dict.set_default("foo")
+        self.assertEqual(self.param_dict.get_changes_since(first),
+                         {"foo": 10, "bar": 200, "baz": 300, "bat": 5})
+
+        self.param_dict.clear_dirty()
+        self.assertEqual(self.param_dict.get_dirty_list(), [])
+        version = self.param_dict.get_current_version()
+        self.param_dict.update("bar=201")
+        self.assertEqual(self.param_dict.get_dirty_list(), ["bar"])
+        self.assertEqual(self.param_dict.get_changes_since(version), {"bar": 201})
+        self.assertEqual(self.param_dict.get_current_version(), version + 1)
+
+    def test_plan_writes(self):
+        """
+        Test only values that differ from the dictionary's, once formatted,
+        are written, after the parameters they depend on
+        """
+        param_dict = ProtocolParameterDict()
+        param_dict.add("interval", r'interval = (\d+)', lambda match : int(match.group(1)),
+                       lambda x : str(int(x)), dependencies=["mode"])
+        param_dict.add("mode", r'mode = (\w+)', lambda match : match.group(1),
+                       lambda x : str(x).upper(), dependencies=["unit"])
+        param_dict.add("unit", r'unit = (\w+)', lambda match : match.group(1), str)
+        param_dict.add("average", r'average = (\d+)', lambda match : int(match.group(1)), str,
+                       dependencies=["interval"])
+        param_dict.add("baud", r'baud = (\d+)', lambda match : int(match.group(1)), str)
+        param_dict.update_lines("interval = 10\nmode = FAST\nunit = s\naverage = 4")
+
+        self.assertEqual(param_dict.plan_writes({"interval": 10.0, "mode": "fast", "unit": "s"}), [])
+        self.assertEqual(param_dict.plan_writes({"average": 8, "interval": 20, "mode": "fast"}),
+                         [("interval", 20), ("average", 8)])
+        self.assertEqual(param_dict.plan_writes({"average": 8, "unit": "ms", "baud": 9600}),
+                         [("unit", "ms"), ("average", 8), ("baud", 9600)])
+
+        self.assertRaises(InstrumentParameterException, param_dict.plan_writes, {"bogus": 1})
+        param_dict.add("unit", r'unit = (\w+)', lambda match : match.group(1), str,
+                       dependencies=["average"])
+        self.assertRaises(InstrumentParameterException, param_dict.plan_writes, {"mode": "slow"})
+
     def test_visibility_list(self):
         lst = self.param_dict.get_visibility_list(ParameterDictVisibility.READ_WRITE)
         self.assertEquals(lst, ["foo", "bar"])
@@ -249,6 +387,23 @@ bar=200, baz=300
         self.assertEqual(result, True)
         self.assertEqual(pdv.value, 1)
         
+    def test_shared_regex(self):
+        """
+        Test values with the same pattern share one compiled regex, and keep
+        their fields in slots
+        """
+        first = RegexParamDictVal("foo", r'.*foo=(\d+).*',
+                                  lambda match : int(match.group(1)), str)
+        second = RegexParamDictVal("foo2", r'.*foo=(\d+).*',
+                                   lambda match : int(match.group(1)) * 2, str)
+        self.assertTrue(first.regex is second.regex)
+        self.assertTrue(first.regex is get_regex(r'.*foo=(\d+).*'))
+        self.assertFalse(get_regex(r'.*foo=(\d+).*', re.DOTALL) is first.regex)
+        self.assertEqual(get_regex(r'.*foo=(\d+).*', re.DOTALL).flags & re.DOTALL, re.DOTALL)
+
+        self.assertFalse(hasattr(first, '__dict__'))
+        self.assertRaises(AttributeError, setattr, first, 'no_such_field', 1)
+
     def test_function_val(self):
         pdv = FunctionParamDictVal("foo",
                                self.pick_byte2,
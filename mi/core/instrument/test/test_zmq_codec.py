@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.test.test_zmq_codec
+@file mi/core/instrument/test/test_zmq_codec.py
+@brief Test cases for the driver process wire formats
+"""
+
+__license__ = 'Apache 2.0'
+
+import json
+import cPickle as pickle
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTestCase
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.exceptions import InstrumentCommandException
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.instrument import zmq_codec
+
+SAMPLE = json.dumps({'stream_name': 'parsed',
+                     'values': [{'value_id': 'temp', 'value': 55.9044}]},
+                    sort_keys=True)
+
+@attr('UNIT', group='mi')
+class TestUnitZmqCodec(MiUnitTestCase):
+    """
+    Test messages survive each codec
+    """
+    def setUp(self):
+        self.triple = InstrumentCommandException('Unknown driver command.').get_triple()
+        self.events = [
+            {'type': DriverAsyncEvent.SAMPLE, 'value': SAMPLE, 'time': 3569168821.5},
+            {'type': DriverAsyncEvent.STATE_CHANGE, 'value': 'DRIVER_STATE_COMMAND', 'time': 3569168822.0},
+            zmq_codec.encode_exception(self.triple),
+        ]
+
+    def test_round_trip(self):
+        """
+        Test events and exceptions through every available codec
+        """
+        for name in zmq_codec.CODEC_PREFERENCE:
+            codec = zmq_codec.get_codec(name)
+            frames = zmq_codec.encode_message(codec, self.events)
+            self.assertEqual(frames[0], name)
+
+            events = zmq_codec.decode_message(frames)
+            self.assertEqual(events[:2], self.events[:2])
+            self.assertEqual(events[1]['time'], 3569168822.0)
+
+            (code, message, stacks) = events[2]
+            self.assertTrue(isinstance(events[2], tuple))
+            self.assertEqual(code, self.triple[0])
+            self.assertEqual(message, self.triple[1])
+
+    def test_original_format(self):
+        """
+        Test a lone pickled frame, as from send_pyobj, still decodes
+        """
+        self.assertEqual(zmq_codec.decode_message([pickle.dumps(self.triple, 2)]),
+                         [self.triple])
+
+    def test_json_passthrough(self):
+        """
+        Test sample values go through the json codec as frames of their own
+        """
+        codec = zmq_codec.get_codec('json')
+        frames = zmq_codec.encode_message(codec, self.events)
+        self.assertEqual(len(frames), 3)
+        self.assertTrue(frames[2] is SAMPLE)
+        self.assertFalse(SAMPLE in frames[1])
+        self.assertEqual(self.events[0]['value'], SAMPLE)
+
+    def test_fallback(self):
+        """
+        Test messages a codec can't represent are pickled
+        """
+        reply = [set(['a'])]
+        frames = zmq_codec.encode_message(zmq_codec.get_codec('json'), reply)
+        self.assertEqual(frames[0], 'pickle')
+        self.assertEqual(zmq_codec.decode_message(frames), reply)
+
+    def test_negotiate(self):
+        """
+        Test picking a codec both sides have
+        """
+        self.assertEqual(zmq_codec.negotiate(['bson', 'json', 'pickle']), 'json')
+        self.assertEqual(zmq_codec.negotiate(['bson']), None)
+        self.assertRaises(InstrumentParameterException, zmq_codec.get_codec, 'bson')
+        self.assertRaises(InstrumentParameterException, zmq_codec.decode_message, ['bson', ''])
@@ -12,7 +12,10 @@ __license__ = 'Apache 2.0'
 
 from gevent import monkey; monkey.patch_all()
 
+import os
 import time
+import shutil
+import tempfile
 import unittest
 import logging
 
@@ -22,6 +25,10 @@ from pyon.util.unit_test import PyonTestCase
 
 from mi.core.instrument.zmq_driver_client import ZmqDriverClient
 from mi.core.instrument.zmq_driver_process import ZmqDriverProcess
+from mi.core.instrument.zmq_driver_process import BatchStatsKey
+from mi.core.instrument.event_queue import EventQueueStatsKey
+from mi.core.instrument.event_queue import OverflowPolicy
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
 import mi.core.mi_logger
 from mi.core.unit_test import MiTestCase
 
@@ -101,6 +108,203 @@ class TestZmqDriverProcess(MiTestCase):
         pass
     
     
+    def test_messaging_latency(self):
+        """
+        Test command replies and events are delivered as soon as they are
+        ready, not on the next poll.
+        """
+        workdir = tempfile.mkdtemp()
+        driver_process = ZmqDriverProcess(None, None,
+                                          os.path.join(workdir, 'cmd_port.txt'),
+                                          os.path.join(workdir, 'evt_port.txt'),
+                                          None)
+        driver_process.start_messaging()
+        while driver_process.cmd_port is None or driver_process.evt_port is None:
+            time.sleep(.01)
+
+        events = []
+        def evt_callback(evt):
+            events.append((evt, time.time()))
+
+        driver_client = ZmqDriverClient('localhost', driver_process.cmd_port,
+                                        driver_process.evt_port)
+        driver_client.start_messaging(evt_callback)
+
+        # The subscription takes a moment to reach the publisher.
+        while not events:
+            driver_process.send_event('hello')
+            time.sleep(.01)
+
+        starttime = time.time()
+        reply = driver_client.cmd_dvr('process_echo')
+        self.assertTrue(reply.startswith('ping from resource'))
+        self.assertLess(time.time() - starttime, .05)
+
+        del events[:]
+        for i in range(10):
+            sent = time.time()
+            driver_process.send_event({'type': 'test', 'value': i})
+            while len(events) <= i:
+                time.sleep(.001)
+            self.assertEqual(events[i][0], {'type': 'test', 'value': i})
+            self.assertLess(events[i][1] - sent, .05)
+
+        self.assertEqual(driver_client.cmd_dvr('stop_driver_process'),
+                         'stop_driver_process')
+        driver_client.stop_messaging()
+        driver_process.cmd_thread.join()
+        driver_process.evt_thread.join()
+        shutil.rmtree(workdir)
+
+    def test_event_batching(self):
+        """
+        Test queued events go out in batches and come out of the client one
+        at a time, in order.
+        """
+        workdir = tempfile.mkdtemp()
+        driver_process = ZmqDriverProcess(None, None,
+                                          os.path.join(workdir, 'cmd_port.txt'),
+                                          os.path.join(workdir, 'evt_port.txt'),
+                                          None, batch_size=256)
+        driver_process.start_messaging()
+        while driver_process.cmd_port is None or driver_process.evt_port is None:
+            time.sleep(.01)
+
+        events = []
+        driver_client = ZmqDriverClient('localhost', driver_process.cmd_port,
+                                        driver_process.evt_port)
+        driver_client.start_messaging(events.append)
+
+        while not events:
+            driver_process.send_event('hello')
+            time.sleep(.01)
+        time.sleep(.1)
+        del events[:]
+
+        sent = [{'type': 'test', 'value': i} for i in range(1000)]
+        reply = driver_client.cmd_dvr('test_events', events=sent)
+        self.assertEqual(reply, 'test_events')
+        starttime = time.time()
+        while len(events) < 1000 and time.time() - starttime < 5:
+            time.sleep(.01)
+        self.assertEqual(events, sent)
+
+        stats = driver_client.cmd_dvr('get_batch_stats')
+        self.assertGreaterEqual(stats[BatchStatsKey.BATCHES], 4)
+        self.assertEqual(stats[BatchStatsKey.LARGEST_BATCH], 256)
+        self.assertEqual(stats[BatchStatsKey.EVENTS] - stats[BatchStatsKey.BATCHED_EVENTS],
+                         stats[BatchStatsKey.MESSAGES] - stats[BatchStatsKey.BATCHES])
+
+        driver_client.cmd_dvr('stop_driver_process')
+        driver_client.stop_messaging()
+        driver_process.cmd_thread.join()
+        driver_process.evt_thread.join()
+        shutil.rmtree(workdir)
+
+    def test_codec_negotiation(self):
+        """
+        Test the client and driver process agree on a wire format and
+        replies, exceptions and samples come through it.
+        """
+        workdir = tempfile.mkdtemp()
+        driver_process = ZmqDriverProcess(None, None,
+                                          os.path.join(workdir, 'cmd_port.txt'),
+                                          os.path.join(workdir, 'evt_port.txt'),
+                                          None)
+        driver_process.start_messaging()
+        while driver_process.cmd_port is None or driver_process.evt_port is None:
+            time.sleep(.01)
+
+        events = []
+        driver_client = ZmqDriverClient('localhost', driver_process.cmd_port,
+                                        driver_process.evt_port,
+                                        codecs=['bson', 'json', 'pickle'])
+        driver_client.start_messaging(events.append)
+        self.assertEqual(driver_client.codec, 'json')
+        self.assertEqual(driver_process.codec.name, 'json')
+
+        reply = driver_client.cmd_dvr('process_echo')
+        self.assertTrue(reply.startswith('ping from resource'))
+
+        # The driver process has no driver, every driver command is unknown
+        reply = driver_client.cmd_dvr('get_resource_state')
+        self.assertTrue(isinstance(reply, tuple))
+        self.assertEqual(len(reply), 3)
+
+        sample = '{"stream_name": "parsed", "values": []}'
+        while not events:
+            driver_process.send_event({'type': DriverAsyncEvent.SAMPLE, 'value': sample})
+            time.sleep(.01)
+        self.assertEqual(events[0], {'type': DriverAsyncEvent.SAMPLE, 'value': sample})
+
+        driver_client.cmd_dvr('stop_driver_process')
+        driver_client.stop_messaging()
+        driver_process.cmd_thread.join()
+        driver_process.evt_thread.join()
+        shutil.rmtree(workdir)
+
+    def test_control_lane(self):
+        """
+        Test a state change queued behind 10000 samples is published first.
+        The samples are batched so none go over the PUB socket high water
+        mark.
+        """
+        workdir = tempfile.mkdtemp()
+        driver_process = ZmqDriverProcess(None, None,
+                                          os.path.join(workdir, 'cmd_port.txt'),
+                                          os.path.join(workdir, 'evt_port.txt'),
+                                          None, batch_size=256)
+        driver_process.start_messaging()
+        while driver_process.cmd_port is None or driver_process.evt_port is None:
+            time.sleep(.01)
+
+        events = []
+        driver_client = ZmqDriverClient('localhost', driver_process.cmd_port,
+                                        driver_process.evt_port)
+        driver_client.start_messaging(events.append)
+
+        while not events:
+            driver_process.send_event('hello')
+            time.sleep(.01)
+        time.sleep(.1)
+        del events[:]
+
+        state_change = {'type': DriverAsyncEvent.STATE_CHANGE, 'value': 'DRIVER_STATE_COMMAND'}
+        sent = [{'type': DriverAsyncEvent.SAMPLE, 'value': '{"n": %d}' % i} for i in range(10000)]
+        driver_client.cmd_dvr('test_events', events=sent + [state_change])
+        starttime = time.time()
+        while len(events) < 10001 and time.time() - starttime < 10:
+            time.sleep(.01)
+        self.assertEqual(events[0], state_change)
+        self.assertEqual(events[1:], sent)
+
+        driver_client.cmd_dvr('stop_driver_process')
+        driver_client.stop_messaging()
+        driver_process.cmd_thread.join()
+        driver_process.evt_thread.join()
+        shutil.rmtree(workdir)
+
+    def test_event_queue_bound(self):
+        """
+        Test events queued while nothing drains the queue stay within its
+        bound, and the drops show in the queue stats.
+        """
+        driver_process = ZmqDriverProcess(None, None, None, None, None,
+                                          max_events=100,
+                                          overflow_policy=OverflowPolicy.DROP_NEWEST)
+        for i in range(1000):
+            driver_process.send_event({'type': 'test', 'value': i})
+        reply = driver_process.cmd_driver({'cmd': 'test_events', 'args': [], 'kwargs':
+                                           {'events': [{'type': 'test', 'value': 'late'}]}})
+        self.assertEqual(reply, 'test_events')
+
+        stats = driver_process.cmd_driver({'cmd': 'get_event_queue_stats', 'args': [], 'kwargs': {}})
+        self.assertEqual(stats[EventQueueStatsKey.QUEUED], 100)
+        self.assertEqual(stats[EventQueueStatsKey.HIGH_WATER_MARK], 100)
+        self.assertEqual(stats[EventQueueStatsKey.DROPPED], 901)
+        self.assertEqual(stats[EventQueueStatsKey.OVERFLOW_POLICY], OverflowPolicy.DROP_NEWEST)
+        self.assertEqual([evt['value'] for evt in driver_process.get_events()], range(100))
+
     def test_number_2(self):
         """
         """
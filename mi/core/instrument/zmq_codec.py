@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.instrument.zmq_codec
+@file mi/core/instrument/zmq_codec.py
+@brief Wire formats for driver process command replies and events.
+
+Before a format is negotiated, replies and events go out as single pickled
+frames from send_pyobj, as they always have. After the client and driver
+process agree on a codec with the 'negotiate_codec' command, each message
+is a header frame naming the codec followed by the codec's frames, which
+carry a list of one or more objects:
+
+    [codec name, frame, ...]
+
+Exceptions travel as {EXCEPTION_KEY: [error code, message, stacks]} and
+come back out of decode_message() as the same (error code, message, stacks)
+triple that pickle delivers, so they don't rely on pickle keeping tuples.
+"""
+
+__license__ = 'Apache 2.0'
+
+import json
+import cPickle as pickle
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from mi.core.exceptions import InstrumentParameterException
+from mi.core.exceptions import NotImplementedException
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+
+EXCEPTION_KEY = '__exception__'
+
+# Key left in a JSON encoded sample event in place of its value, giving the
+# index of the frame holding the value.
+RAW_VALUE_KEY = '__value_frame__'
+
+class Codec(object):
+    """
+    Turns a list of objects into message frames and back.
+    """
+    name = None
+
+    def encode(self, objects):
+        """
+        @param objects list of objects to send
+        @retval list of frames
+        """
+        raise NotImplementedException("encode() not implemented")
+
+    def decode(self, frames):
+        """
+        @param frames list of frames from encode()
+        @retval list of objects
+        """
+        raise NotImplementedException("decode() not implemented")
+
+class PickleCodec(Codec):
+    """
+    Pickle protocol 2, the same as send_pyobj.
+    """
+    name = 'pickle'
+
+    def encode(self, objects):
+        return [pickle.dumps(objects, 2)]
+
+    def decode(self, frames):
+        return pickle.loads(frames[0])
+
+class MsgpackCodec(Codec):
+    """
+    msgpack, when the msgpack package is installed. Strings come back as
+    str, tuples as lists.
+    """
+    name = 'msgpack'
+
+    def encode(self, objects):
+        return [msgpack.packb(objects)]
+
+    def decode(self, frames):
+        try:
+            return msgpack.unpackb(frames[0], raw=True)
+        except TypeError:
+            # msgpack before 0.5.2 returns raw strings by default.
+            return msgpack.unpackb(frames[0])
+
+class JsonCodec(Codec):
+    """
+    JSON. Sample values, already JSON from the particle, are passed
+    through in frames of their own rather than escaped inside the JSON
+    document. Strings come back as unicode, tuples as lists.
+    """
+    name = 'json'
+
+    def encode(self, objects):
+        frames = [None]
+        document = []
+        for obj in objects:
+            if isinstance(obj, dict) and obj.get('type') == DriverAsyncEvent.SAMPLE \
+               and isinstance(obj.get('value'), str):
+                obj = dict(obj)
+                obj[RAW_VALUE_KEY] = len(frames)
+                frames.append(obj.pop('value'))
+            document.append(obj)
+
+        frames[0] = json.dumps(document)
+        return frames
+
+    def decode(self, frames):
+        objects = json.loads(frames[0])
+        for obj in objects:
+            if isinstance(obj, dict) and RAW_VALUE_KEY in obj:
+                obj['value'] = frames[obj.pop(RAW_VALUE_KEY)]
+        return objects
+
+# Available codecs by name, in order of preference. cPickle is the cheapest
+# in benchmark_codec; msgpack is slower unless its C extension is built.
+CODECS = {}
+CODEC_PREFERENCE = []
+for _codec in [PickleCodec(), MsgpackCodec(), JsonCodec()]:
+    if _codec.name == MsgpackCodec.name and msgpack is None:
+        continue
+    CODECS[_codec.name] = _codec
+    CODEC_PREFERENCE.append(_codec.name)
+
+def get_codec(name):
+    """
+    @param name codec name
+    @retval the codec
+    @raise InstrumentParameterException if there is no such codec here
+    """
+    codec = CODECS.get(name)
+    if codec is None:
+        raise InstrumentParameterException("Unknown or unavailable codec: %s" % name)
+    return codec
+
+def negotiate(names):
+    """
+    Pick the codec to use.
+    @param names codec names the other side can use, most wanted first
+    @retval the first of names available here, None if there isn't one
+    """
+    for name in names:
+        if name in CODECS:
+            return name
+    return None
+
+def encode_exception(triple):
+    """
+    @param triple (error code, message, stacks) from get_triple()
+    @retval the exception as it is sent by a codec
+    """
+    return {EXCEPTION_KEY: list(triple)}
+
+def encode_message(codec, objects):
+    """
+    @param codec the negotiated codec
+    @param objects list of objects to send, exceptions already through
+    encode_exception()
+    @retval list of message frames. Messages the codec can't represent,
+    such as replies holding objects other than plain data, are pickled.
+    """
+    try:
+        return [codec.name] + codec.encode(objects)
+    except (TypeError, ValueError):
+        codec = CODECS[PickleCodec.name]
+        return [codec.name] + codec.encode(objects)
+
+def decode_message(frames):
+    """
+    Decode a message in either the negotiated or the original format.
+    @param frames list of message frames
+    @retval list of objects, exceptions as (error code, message, stacks)
+    triples
+    @raise InstrumentParameterException for an unknown codec
+    """
+    if len(frames) == 1:
+        return [pickle.loads(frames[0])]
+
+    objects = get_codec(frames[0]).decode(frames[1:])
+    for (index, obj) in enumerate(objects):
+        if isinstance(obj, dict) and len(obj) == 1 and EXCEPTION_KEY in obj:
+            objects[index] = tuple(obj[EXCEPTION_KEY])
+    return objects
@@ -19,16 +19,20 @@ c = zdc.ZmqDriverClient('localhost', 5556, 5557)
 
 import thread
 import logging
-import time
 
-# We import "regular" zmq, not the patched version because
-# we handle the nonblocking sockets directly as they need to work
-# with unpatched threads as well.
+# The zmq module to make sockets with is picked when messaging starts, see
+# zmq_module(). zmq.green under gevent, regular zmq with real threads.
 import zmq
 
 from mi.core.instrument.driver_client import DriverClient
+from mi.core.util import zmq_module
+from mi.core.instrument import zmq_codec
 from mi.core.log import get_logger ; log = get_logger()
 
+# Seconds the event thread waits for an event before checking whether it
+# has been stopped.
+STOP_CHECK_INTERVAL = .5
+
  
 class ZmqDriverClient(DriverClient):
     """
@@ -36,12 +40,17 @@ class ZmqDriverClient(DriverClient):
     thread for catching asynchronous driver events.
     """
     
-    def __init__(self, host, cmd_port, event_port):
+    def __init__(self, host, cmd_port, event_port, codecs=None, driver_id=None):
         """
         Initialize members.
         @param host Host string address of the driver process.
         @param cmd_port Port number for the driver process command port.
         @param event_port Port number for the driver process event port.
+        @param codecs Optional list of wire format names to ask the driver
+        process for, most wanted first, e.g. zmq_codec.CODEC_PREFERENCE.
+        None keeps the original pickled messages.
+        @param driver_id Id of the driver to command and take events from
+        in a MultiDriverProcess, None for a single driver process.
         """
         DriverClient.__init__(self)
         self.host = host
@@ -53,6 +62,9 @@ class ZmqDriverClient(DriverClient):
         self.zmq_cmd_socket = None
         self.event_thread = None
         self.stop_event_thread = True
+        self.codecs = codecs
+        self.codec = None
+        self.driver_id = driver_id
         
     def start_messaging(self, evt_callback=None):
         """
@@ -61,12 +73,21 @@ class ZmqDriverClient(DriverClient):
         and starts event thread that listens for events from the driver
         process independently of command request-reply.
         """
-        self.zmq_context = zmq.Context()
+        zmq_lib = zmq_module()
+        self.zmq_context = zmq_lib.Context()
         self.zmq_cmd_socket = self.zmq_context.socket(zmq.REQ)
         self.zmq_cmd_socket.connect(self.cmd_host_string)
         log.info('Driver client cmd socket connected to %s.' %
                        self.cmd_host_string)        
         self.evt_callback = evt_callback
+
+        if self.codecs:
+            # Driver processes that can't negotiate answer with an error
+            # triple; stay with pickle for those.
+            reply = self.cmd_dvr('negotiate_codec', list(self.codecs))
+            if isinstance(reply, basestring):
+                self.codec = reply
+            log.info('Driver client using codec %s.' % self.codec)
         
         def recv_evt_messages(driver_client):
             """
@@ -74,27 +95,33 @@ class ZmqDriverClient(DriverClient):
             driver events. Can be run as a thread or greenlet.
             @param driver_client The client object that launches the thread.
             """
-            context = zmq.Context()
+            context = zmq_lib.Context()
             sock = context.socket(zmq.SUB)
             sock.connect(driver_client.event_host_string)
-            sock.setsockopt(zmq.SUBSCRIBE, '')
+            driver_id = driver_client.driver_id
+            sock.setsockopt(zmq.SUBSCRIBE, driver_id or '')
             log.info('Driver client event thread connected to %s.' %
                   driver_client.event_host_string)
 
+            poller = zmq_lib.Poller()
+            poller.register(sock, zmq.POLLIN)
+
             driver_client.stop_event_thread = False
-            #last_time = time.time()
             while not driver_client.stop_event_thread:
-                try:
-                    evt = sock.recv_pyobj(flags=zmq.NOBLOCK)
-                    log.debug('got event: %s' % str(evt))
+                if not poller.poll(STOP_CHECK_INTERVAL * 1000):
+                    continue
+
+                frames = sock.recv_multipart()
+                if driver_id is not None:
+                    # The subscription matches ids starting with ours too.
+                    if frames[0] != driver_id:
+                        continue
+                    frames = frames[1:]
+
+                for evt in zmq_codec.decode_message(frames):
+                    log.debug('got event: %s', evt)
                     if driver_client.evt_callback:
                         driver_client.evt_callback(evt)
-                except zmq.ZMQError:
-                    time.sleep(.5)
-                #cur_time = time.time()
-                #if cur_time - last_time > 5:
-                #    log.info('event thread listening')
-                #    last_time = cur_time
             sock.close()
             context.term()
             log.info('Client event socket closed.')
@@ -131,33 +158,33 @@ class ZmqDriverClient(DriverClient):
         """
         # Package command dictionary.
         msg = {'cmd':cmd,'args':args,'kwargs':kwargs}
-        
-        log.debug('Sending command %s.' % str(msg))
-        while True:
-            try:
-                # Attempt command send. Retry if necessary.
-                self.zmq_cmd_socket.send_pyobj(msg)
-                if msg == 'stop_driver_process':
-                    return 'driver stopping'
+        if self.driver_id is not None:
+            msg['driver_id'] = self.driver_id
+        return self._send_cmd(msg)
 
-                # Command sent, break out and wait for reply.
-                break    
+    def cmd_host(self, cmd, *args, **kwargs):
+        """
+        Command the MultiDriverProcess hosting the driver, e.g. to add
+        another driver.
+        @param cmd The host command identifier.
+        @param args Positional arguments of the command.
+        @param kwargs Keyword arguments of the command.
+        @retval Command result.
+        """
+        return self._send_cmd({'cmd':cmd,'args':args,'kwargs':kwargs})
 
-            except zmq.ZMQError:
-                # Socket not ready to accept send. Sleep and retry later.
-                time.sleep(.5)
+    def _send_cmd(self, msg):
+        """
+        Send a command message and return the reply, raising it if it is
+        an exception.
+        """
+        log.debug('Sending command %s.' % str(msg))
+        self.zmq_cmd_socket.send_pyobj(msg)
+        if msg == 'stop_driver_process':
+            return 'driver stopping'
             
         log.debug('Awaiting reply.')
-        while True:
-            try:
-                # Attempt reply recv. Retry if necessary.
-                reply = self.zmq_cmd_socket.recv_pyobj(flags=zmq.NOBLOCK)
-                # Reply recieved, break and return.
-                break
-
-            except zmq.ZMQError:
-                # Socket not ready with the reply. Sleep and retry later.
-                time.sleep(.5)
+        reply = zmq_codec.decode_message(self.zmq_cmd_socket.recv_multipart())[0]
                 
         log.debug('Reply: %s.' % str(reply))
         
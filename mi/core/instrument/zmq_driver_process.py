@@ -18,22 +18,50 @@ p = zdp.ZmqDriverProcess.launch_process(5556, 5557, 'ion.services.mi.drivers.sbe
 """
 
 from threading import Thread
+from threading import Event
 from subprocess import Popen
 import os
 import time
 import logging
 import sys
 import uuid
+import json
+import cPickle as pickle
 
 import zmq
 
 from ooi.exception import ApplicationException
+from mi.core.common import BaseEnum
 from mi.core.exceptions import InstrumentException, UnexpectedError
+from mi.core.instrument.instrument_driver import DriverAsyncEvent
+from mi.core.util import zmq_module
+from mi.core.instrument import zmq_codec
+from mi.core.instrument.event_queue import OverflowPolicy
+from mi.core.instrument.event_queue import is_data
+from mi.core.instrument.event_queue import DEFAULT_MAX_EVENTS
 
 import mi.core.instrument.driver_process as driver_process
 from mi.core.log import get_logger
 log = get_logger()
 
+# Seconds the command thread waits for a command before checking whether
+# it has been stopped.
+STOP_CHECK_INTERVAL = .5
+
+# Default longest time in seconds to hold an event back while a batch
+# fills, when batching is on.
+DEFAULT_BATCH_AGE = .001
+
+class BatchStatsKey(BaseEnum):
+    """
+    Keys for the event batching counters
+    """
+    MESSAGES = 'messages'
+    EVENTS = 'events'
+    BATCHES = 'batches'
+    BATCHED_EVENTS = 'batched_events'
+    LARGEST_BATCH = 'largest_batch'
+
 def _encode_exception(reply):
     if isinstance(reply, InstrumentException):
         # InstrumentExceptions have corresponding IonException error code built-in
@@ -43,6 +71,48 @@ def _encode_exception(reply):
         ex = UnexpectedError(reply.__class__.__name__,reply)
         return ex.get_triple()
 
+def _encode_sample(evt):
+    """
+    Sample events carry the particle dict while inside the driver process.
+    Serialize it here, on the way out, to the JSON string the client expects.
+    """
+    if isinstance(evt, dict) and evt.get('type') == DriverAsyncEvent.SAMPLE \
+       and isinstance(evt.get('value'), dict):
+        evt['value'] = json.dumps(evt['value'], sort_keys=True)
+    return evt
+
+def _encode_reply(reply, codec):
+    """
+    @param reply A command result or exception.
+    @param codec The negotiated codec, None for the original pickled frame.
+    @retval list of reply message frames.
+    """
+    # if operation raised exception, encode as triple
+    if isinstance(reply, Exception):
+        reply = _encode_exception(reply)
+        if codec:
+            reply = zmq_codec.encode_exception(reply)
+    if codec:
+        return zmq_codec.encode_message(codec, [reply])
+    return [pickle.dumps(reply, 2)]
+
+def _read_port_file(fname):
+    """
+    Wait for a driver process to write a port file, then read and remove it.
+    @param fname The port file name.
+    @retval The port number.
+    """
+    while True:
+        try:
+            port_file = file(fname, 'r')
+            port = int(port_file.read().strip())
+            port_file.close()
+            os.remove(fname)
+            return port
+
+        except IOError:
+            time.sleep(.1)
+
 class ZmqDriverProcess(driver_process.DriverProcess):
     """
     A OS-level driver process that communicates with ZMQ sockets.
@@ -52,19 +122,37 @@ class ZmqDriverProcess(driver_process.DriverProcess):
     """
     
     @classmethod
-    def launch_process(cls, driver_module, driver_class, workdir='/tmp/', ppid=None):
+    def launch_process(cls, driver_module, driver_class, workdir='/tmp/', ppid=None,
+                       batch_size=None, batch_age=DEFAULT_BATCH_AGE,
+                       max_events=DEFAULT_MAX_EVENTS, overflow_policy=OverflowPolicy.DROP_OLDEST_RAW,
+                       launcher=None):
         """
         Class method constructor to launch ZmqDriverProcess as a
         separate OS process. Creates command string for this
-        class and pass to superclass static method. 
+        class and pass to superclass static method, or with a launcher,
+        has one of its warm fork servers fork the process. 
         @param driver_module The python module containing the driver code.
         @param driver_class The python driver class.
         @param workdir The work directory when temporary port files are written.
         @param ppid ID of the parent process, used to self destruct when
         parent dies in test cases.
+        @param batch_size The most events to send in one message. None or 1
+        sends each event on its own.
+        @param batch_age The longest time in seconds to hold back an event
+        while its batch fills.
+        @param max_events The most events to queue for sending.
+        @param overflow_policy The OverflowPolicy for events arriving while
+        the queue is full.
+        @param launcher A started DriverLauncher to fork the process from,
+        None to start a new interpreter.
         @retval Tuple containing (Popen object for the process, cmd port,
-            evt_port)
+            evt_port). With a launcher the process object is a
+            LaunchedDriverProcess.
         """
+        if launcher:
+            return launcher.launch(driver_module, driver_class, ppid,
+                                   batch_size=batch_size, batch_age=batch_age,
+                                   max_events=max_events, overflow_policy=overflow_policy)
         
         # Construct the command string.
         tag = str(uuid.uuid4())
@@ -72,46 +160,41 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         cmd_port_fname = workdir + cmd_port_fname
         evt_port_fname = 'dvr_evt_port_%s.txt' % tag
         evt_port_fname = workdir + evt_port_fname
-        cmd_str = 'from %s import %s; dp = %s("%s", "%s", "%s", "%s", %s);dp.run()' \
+        cmd_str = 'from %s import %s; dp = %s("%s", "%s", "%s", "%s", %s, %s, %s, %s, %s);dp.run()' \
             % (__name__, cls.__name__, cls.__name__, driver_module,
-               driver_class, cmd_port_fname, evt_port_fname, str(ppid))
+               driver_class, cmd_port_fname, evt_port_fname, str(ppid),
+               str(batch_size), repr(batch_age), repr(max_events), repr(overflow_policy))
                 
         # Call base class launch method.
         dvr_proc = driver_process.DriverProcess.launch_process(cmd_str)
-        while True:
-            try:                
-                cmd_port_file = file(cmd_port_fname, 'r')
-                dvr_cmd_port = int(cmd_port_file.read().strip())
-                cmd_port_file.close()
-                os.remove(cmd_port_fname)
-                break
-            
-            except IOError:
-                time.sleep(.1)
-        while True:
-            try:                
-                evt_port_file = file(evt_port_fname, 'r')
-                dvr_evt_port = int(evt_port_file.read().strip())
-                evt_port_file.close()
-                os.remove(evt_port_fname)
-                break
-            
-            except IOError:
-                time.sleep(.1)
+        dvr_cmd_port = _read_port_file(cmd_port_fname)
+        dvr_evt_port = _read_port_file(evt_port_fname)
 
         return (dvr_proc, dvr_cmd_port, dvr_evt_port)
         
-    def __init__(self, driver_module, driver_class, cmd_port_fname, evt_port_fname, ppid):
+    def __init__(self, driver_module, driver_class, cmd_port_fname, evt_port_fname, ppid,
+                 batch_size=None, batch_age=DEFAULT_BATCH_AGE,
+                 max_events=DEFAULT_MAX_EVENTS, overflow_policy=OverflowPolicy.DROP_OLDEST_RAW):
         """
         Zmq driver process constructor.
         @param driver_module The python module containing the driver code.
         @param driver_class The python driver class.
-        @param cmd_port_fname Filename for temp cmd port file.
-        @param evt_port_fname Filename for temp evt port file.
+        @param cmd_port_fname Filename for temp cmd port file, None for
+        none.
+        @param evt_port_fname Filename for temp evt port file, None for
+        none.
         @param ppid ID of the parent process, used to self destruct when
         parent dies in test cases.        
+        @param batch_size The most events to send in one message. None or 1
+        sends each event on its own.
+        @param batch_age The longest time in seconds to hold back an event
+        while its batch fills.
+        @param max_events The most events to queue for sending.
+        @param overflow_policy The OverflowPolicy for events arriving while
+        the queue is full.
         """
-        driver_process.DriverProcess.__init__(self, driver_module, driver_class, ppid)
+        driver_process.DriverProcess.__init__(self, driver_module, driver_class, ppid,
+                                              max_events, overflow_policy)
         self.cmd_port = None
         self.cmd_port_fname = cmd_port_fname
         self.evt_port = None
@@ -122,47 +205,52 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         self.stop_evt_thread = True
         self.cmd_thread = None
         self.stop_cmd_thread = True
+        self.batch_size = batch_size or 1
+        self.batch_age = batch_age
+        self.batch_stats = dict((key, 0) for key in BatchStatsKey.list())
+        # Negotiated wire format, None for the original pickled frames.
+        self.codec = None
+        # Set once both sockets are bound and their ports known.
+        self.ports_ready = Event()
         
     def start_messaging(self):
         """
         Initialize and start messaging resources for the driver, blocking
         until messaging terminates. This ZMQ implementation starts and
-        joins command and event threads, managing nonblocking send/recv calls
-        on REP and PUB sockets, respectively. Terminate loops and close
-        sockets when stop flag is set in driver process.
+        joins command and event threads. The command thread blocks in a
+        poll on the REP socket, waking now and then to check its stop flag,
+        and the event thread waits on the event queue until events are sent
+        or it is stopped. Terminate loops and close sockets when stop flag
+        is set in driver process.
         """
+        zmq_lib = zmq_module()
+
         def recv_cmd_msg(zmq_driver_process):
             """
             Await commands on a ZMQ REP socket, forwaring them to the
             driver for processing and returning the result.
             """
-            context = zmq.Context()
+            context = zmq_lib.Context()
             sock = context.socket(zmq.REP)
             zmq_driver_process.cmd_port = sock.bind_to_random_port(zmq_driver_process.cmd_host_string)
             log.info('Driver process cmd socket bound to %i' %
                            zmq_driver_process.cmd_port)
-            file(zmq_driver_process.cmd_port_fname,'w+').write(str(zmq_driver_process.cmd_port)+'\n')
+            if zmq_driver_process.cmd_port_fname:
+                file(zmq_driver_process.cmd_port_fname,'w+').write(str(zmq_driver_process.cmd_port)+'\n')
+            zmq_driver_process.port_bound()
+
+            poller = zmq_lib.Poller()
+            poller.register(sock, zmq.POLLIN)
 
-            zmq_driver_process.stop_cmd_thread = False
             while not zmq_driver_process.stop_cmd_thread:
-                try:
-                    msg = sock.recv_pyobj(flags=zmq.NOBLOCK)
-                    log.trace('Processing message %s', msg)
-                    reply = zmq_driver_process.cmd_driver(msg)
-                    # if operation raised exception, encode as triple
-                    if isinstance(reply, Exception):
-                        reply = _encode_exception(reply)
-                    # send, send, and resend
-                    while True:
-                        try:
-                            sock.send_pyobj(reply, flags=zmq.NOBLOCK)
-                            break
-                        except zmq.ZMQError:
-                            time.sleep(.1)
-                            if zmq_driver_process.stop_cmd_thread:
-                                break
-                except zmq.ZMQError:
-                    time.sleep(.1)
+                if not poller.poll(STOP_CHECK_INTERVAL * 1000):
+                    continue
+
+                msg = sock.recv_pyobj()
+                log.trace('Processing message %s', msg)
+                codec = zmq_driver_process.codec
+                reply = zmq_driver_process.cmd_driver(msg)
+                sock.send_multipart(_encode_reply(reply, codec))
                 
             sock.close()
             context.term()
@@ -171,43 +259,150 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         def send_evt_msg(zmq_driver_process):
             """
             Await events on the driver process event queue and publish them
-            on a ZMQ PUB socket to the driver process client.
+            on a ZMQ PUB socket to the driver process client. With batching
+            on, events queued together, or within batch_age of the first, go
+            out as lists of up to batch_size events.
             """
-            context = zmq.Context()
+            context = zmq_lib.Context()
             sock = context.socket(zmq.PUB)
             zmq_driver_process.evt_port = sock.bind_to_random_port(zmq_driver_process.event_host_string)
             log.info('Driver process event socket bound to %i', zmq_driver_process.evt_port)
-            file(zmq_driver_process.evt_port_fname,'w+').write(str(zmq_driver_process.evt_port)+'\n')
+            if zmq_driver_process.evt_port_fname:
+                file(zmq_driver_process.evt_port_fname,'w+').write(str(zmq_driver_process.evt_port)+'\n')
+            zmq_driver_process.port_bound()
 
-            zmq_driver_process.stop_evt_thread = False
             while not zmq_driver_process.stop_evt_thread:
-                try:
-                    evt = zmq_driver_process.events.pop(0)
-                    log.trace('Event thread sending event %s',evt)
-                    while evt:
-                        try:
-                            if isinstance(evt, Exception):
-                                evt = _encode_exception(evt)
-                            sock.send_pyobj(evt, flags=zmq.NOBLOCK)
-                            evt = None
-                            log.trace('Event sent!')
-                        except zmq.ZMQError:
-                            time.sleep(.1)
-                            if zmq_driver_process.stop_evt_thread:
-                                break
-                except IndexError:
-                    time.sleep(.1)
+                events = zmq_driver_process.get_events()
+                batch_size = zmq_driver_process.batch_size
+                if events and batch_size > 1:
+                    zmq_driver_process.fill_batch(events)
+
+                zmq_driver_process.publish_events(sock, events, zmq_driver_process.codec)
 
             sock.close()
             context.term()
             log.info('Driver process event socket closed')
 
+        # Cleared before the threads start, so a stop requested as soon as
+        # the ports are bound isn't lost.
+        self.stop_cmd_thread = False
+        self.stop_evt_thread = False
         self.cmd_thread = Thread(target=recv_cmd_msg, args=(self, ))
         self.evt_thread = Thread(target=send_evt_msg, args=(self, ))
         self.cmd_thread.start()        
         self.evt_thread.start()
         self.messaging_started = True
     
+    def port_bound(self):
+        """
+        Note a socket has been bound, setting ports_ready once both are.
+        """
+        if self.cmd_port is not None and self.evt_port is not None:
+            self.ports_ready.set()
+
+    def fill_batch(self, events):
+        """
+        Add events queued within batch_age of the first to a batch,
+        keeping control events ahead of data events.
+        @param events Events taken from the queue so far, added to in place.
+        """
+        deadline = time.time() + self.batch_age
+        taken = len(events)
+        while len(events) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            events += self.events.take(remaining)
+
+        if len(events) > taken:
+            # A stable sort of what are already runs of each lane.
+            events.sort(key=is_data)
+
+    def publish_events(self, sock, events, codec=None, topic=None):
+        """
+        Encode events in place and publish them in messages of up to
+        batch_size events.
+        @param sock The event PUB socket.
+        @param events List of events taken from the queue.
+        @param codec The negotiated codec, None if there isn't one.
+        @param topic Optional first frame for each message.
+        """
+        for (index, evt) in enumerate(events):
+            log.trace('Event thread sending event %s',evt)
+            if isinstance(evt, Exception):
+                evt = _encode_exception(evt)
+                if codec:
+                    evt = zmq_codec.encode_exception(evt)
+                events[index] = evt
+            else:
+                events[index] = _encode_sample(evt)
+
+        batch_size = self.batch_size
+        for start in xrange(0, len(events), batch_size):
+            self.send_event_message(sock, events[start:start+batch_size], codec, topic)
+            log.trace('Event sent!')
+
+    def send_event_message(self, sock, events, codec=None, topic=None):
+        """
+        Publish a list of events as one message and count it. Without a
+        negotiated codec, a lone event goes out in the original pickled
+        frame and a batch is pickled.
+        @param sock The event PUB socket.
+        @param events List of encoded events.
+        @param codec The negotiated codec, None if there isn't one.
+        @param topic Optional first frame, e.g. to say which driver the
+        events are from.
+        """
+        if codec:
+            frames = zmq_codec.encode_message(codec, events)
+        elif len(events) == 1:
+            frames = [pickle.dumps(events[0], 2)]
+        else:
+            frames = zmq_codec.encode_message(zmq_codec.get_codec('pickle'), events)
+
+        if topic is not None:
+            frames.insert(0, topic)
+        sock.send_multipart(frames)
+        self.count_message(len(events))
+
+    def count_message(self, event_count):
+        """
+        Update the batching counters for a message sent.
+        @param event_count Number of events in the message.
+        """
+        stats = self.batch_stats
+        stats[BatchStatsKey.MESSAGES] += 1
+        stats[BatchStatsKey.EVENTS] += event_count
+        if event_count > 1:
+            stats[BatchStatsKey.BATCHES] += 1
+            stats[BatchStatsKey.BATCHED_EVENTS] += event_count
+            if event_count > stats[BatchStatsKey.LARGEST_BATCH]:
+                stats[BatchStatsKey.LARGEST_BATCH] = event_count
+
+    def cmd_driver(self, msg):
+        """
+        Process a command message, adding to the base class special
+        messages:
+        'get_batch_stats' - return a copy of the event batching counters.
+        'negotiate_codec' - given the codec names the client can decode,
+        most wanted first, switch replies and events to the first one
+        available here and return its name, or None to stay with pickle.
+        @param msg A driver command message.
+        @retval The driver command result.
+        """
+        cmd = msg.get('cmd', None)
+        if cmd == 'get_batch_stats':
+            return dict(self.batch_stats)
+
+        elif cmd == 'negotiate_codec':
+            name = zmq_codec.negotiate(msg.get('args')[0])
+            if name:
+                self.codec = zmq_codec.get_codec(name)
+            log.info('Driver process using codec %s', name)
+            return name
+
+        return driver_process.DriverProcess.cmd_driver(self, msg)
+
     def stop_messaging(self):
         """
         Close messaging resource for the driver. Set flags to cause
@@ -215,6 +410,9 @@ class ZmqDriverProcess(driver_process.DriverProcess):
         """
         self.stop_cmd_thread = True
         self.stop_evt_thread = True
+        # Wake the event thread and release any producers blocked on a full
+        # queue, since nothing will drain it now.
+        self.events.close()
         self.messaging_started = False
     
     def shutdown(self):
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""
+@package mi.core.test.test_common
+@file mi/core/test/test_common.py
+@brief Test cases for the common MI classes
+"""
+
+__license__ = 'Apache 2.0'
+
+from nose.plugins.attrib import attr
+
+from mi.core.unit_test import MiUnitTest
+from mi.core.common import BaseEnum
+from mi.core.common import InstErrorCode
+
+class Color(BaseEnum):
+    RED = 'red'
+    GREEN = 'green'
+    BLUE = 'blue'
+
+    class Nested(object):
+        pass
+
+    @staticmethod
+    def helper():
+        pass
+
+class MoreColor(Color):
+    CYAN = 'cyan'
+
+def uncached_list(cls):
+    return [getattr(cls,attr) for attr in dir(cls) if\
+            not callable(getattr(cls,attr)) and not attr.startswith('__')]
+
+@attr('UNIT', group='mi')
+class TestBaseEnum(MiUnitTest):
+    """
+    Test enum values are listed and looked up from the cached values
+    """
+    def test_list(self):
+        """
+        Test list and dict give what walking the class does
+        """
+        self.assertEqual(Color.list(), ['blue', 'green', 'red'])
+        self.assertEqual(Color.dict(), {'RED': 'red', 'GREEN': 'green', 'BLUE': 'blue'})
+        self.assertEqual(MoreColor.list(), ['blue', 'cyan', 'green', 'red'])
+        self.assertEqual(InstErrorCode.list(), uncached_list(InstErrorCode))
+
+        # Callers get their own copies
+        Color.list().append('black')
+        Color.dict()['BLACK'] = 'black'
+        self.assertEqual(Color.list(), ['blue', 'green', 'red'])
+        self.assertFalse(Color.has('black'))
+
+    def test_has(self):
+        """
+        Test membership of hashable and unhashable values
+        """
+        self.assertTrue(Color.has('red'))
+        self.assertFalse(Color.has('cyan'))
+        self.assertTrue(MoreColor.has('cyan'))
+        self.assertFalse(Color.has(None))
+        self.assertFalse(Color.has(['red']))
+        self.assertFalse(Color.has(Color.helper))
+
+        self.assertTrue(InstErrorCode.has(['OK']))
+        self.assertTrue(InstErrorCode.has(list(InstErrorCode.TIMEOUT)))
+        self.assertFalse(InstErrorCode.has('OK'))
+        self.assertFalse(InstErrorCode.has({}))
+
+    def test_change(self):
+        """
+        Test values set or deleted after first use are seen, in the class
+        and the classes derived from it
+        """
+        class Shape(BaseEnum):
+            SQUARE = 'square'
+
+        class MoreShape(Shape):
+            CIRCLE = 'circle'
+
+        self.assertEqual(Shape.list(), ['square'])
+        self.assertEqual(MoreShape.list(), ['circle', 'square'])
+
+        Shape.TRIANGLE = 'triangle'
+        self.assertTrue(Shape.has('triangle'))
+        self.assertTrue(MoreShape.has('triangle'))
+
+        del Shape.SQUARE
+        self.assertFalse(Shape.has('square'))
+        self.assertEqual(MoreShape.list(), ['circle', 'triangle'])
+
+        MoreShape.CIRCLE = 'round'
+        self.assertEqual(MoreShape.dict(), {'CIRCLE': 'round', 'TRIANGLE': 'triangle'})
+        self.assertEqual(Shape.list(), ['triangle'])
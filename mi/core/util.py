@@ -32,3 +32,24 @@ def dict_equal(ldict, rdict, ignore_keys=[]):
     return True
 
 
+def zmq_module():
+    """
+    Return the zmq module for this process to use. Once gevent has monkey
+    patched the socket module, threads are greenlets and a blocking zmq
+    poll or recv in one stalls them all, so use zmq.green there; its
+    sockets and poller wait cooperatively.
+    @return: zmq or zmq.green
+    """
+    import socket
+    import zmq
+
+    try:
+        import gevent.socket
+    except ImportError:
+        return zmq
+
+    if socket.socket is gevent.socket.socket:
+        import zmq.green
+        return zmq.green
+
+    return zmq
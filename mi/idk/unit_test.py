@@ -278,7 +278,7 @@ class DriverTestMixin(MiUnitTest):
         @return: dictionary representation of a data particle
         """
         if (isinstance(data_particle, DataParticle)):
-            sample_dict = json.loads(data_particle.generate())
+            sample_dict = data_particle.generate_dict()
         elif (isinstance(data_particle, str)):
             sample_dict = json.loads(data_particle)
         elif (isinstance(data_particle, dict)):
@@ -699,6 +699,18 @@ class InstrumentDriverTestCase(MiIntTestCase):
         else:
             return [evt for evt in self.events if evt['type']==type]
 
+    def get_sample_value(self, value):
+        """
+        Sample event values are particle dicts when the driver runs in this
+        process and JSON strings when they come over the driver process
+        event socket.
+        @param value: sample event value
+        @return: particle dict
+        """
+        if isinstance(value, dict):
+            return value
+        return json.loads(value)
+
     def get_sample_events(self, type=None):
         """
         Get a list of sample events, potentially of a passed in type
@@ -712,7 +724,7 @@ class InstrumentDriverTestCase(MiIntTestCase):
             result = []
             for evt in samples:
                 value = evt.get('value')
-                particle = json.loads(value)
+                particle = self.get_sample_value(value)
                 if(particle and particle.get('stream_name') == type):
                     result.append(evt)
 
@@ -1036,7 +1048,7 @@ class InstrumentDriverUnitTestCase(InstrumentDriverTestCase):
         event_type = event['type']
         if event_type == DriverAsyncEvent.SAMPLE:
             sample_value = event['value']
-            particle_dict = json.loads(sample_value)
+            particle_dict = self.get_sample_value(sample_value)
             self._data_particle_received.append(sample_value)
 
     def compare_parsed_data_particle(self, particle_type, raw_input, happy_structure):
@@ -1149,7 +1161,7 @@ class InstrumentDriverUnitTestCase(InstrumentDriverTestCase):
         driver._protocol.got_raw(port_agent_packet)
         self.assertEqual(len(self._data_particle_received), 1)
         particle = self._data_particle_received.pop()
-        particle_dict = json.loads(particle)
+        particle_dict = self.get_sample_value(particle)
         log.debug("Raw Particle: %s" % particle_dict)
 
         # Verify the data particle
@@ -1185,7 +1197,7 @@ class InstrumentDriverUnitTestCase(InstrumentDriverTestCase):
         # Find all particles of the correct data particle types (not raw)
         particles = []
         for p in self._data_particle_received:
-            particle_dict = json.loads(p)
+            particle_dict = self.get_sample_value(p)
             stream_type = particle_dict.get('stream_name')
             self.assertIsNotNone(stream_type)
             if(stream_type != CommonDataParticleType.RAW):
@@ -1607,7 +1619,7 @@ class InstrumentDriverIntegrationTestCase(InstrumentDriverTestCase):   # Must in
         value = sample.get('value')
         self.assertIsNotNone(value)
 
-        particle = json.loads(value)
+        particle = self.get_sample_value(value)
         self.assertIsNotNone(particle)
 
         particle_callback(particle)
@@ -1632,7 +1644,7 @@ class InstrumentDriverIntegrationTestCase(InstrumentDriverTestCase):   # Must in
                 value = sample.get('value')
                 self.assertIsNotNone(value)
 
-                particle = json.loads(value)
+                particle = self.get_sample_value(value)
                 self.assertIsNotNone(particle)
 
                 # So we have found one particle and verified it.  We are done here!
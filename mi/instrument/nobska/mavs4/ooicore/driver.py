@@ -35,6 +35,7 @@ from mi.core.exceptions import InstrumentTimeoutException, \
                                InstrumentStateException
 from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
 from mi.core.instrument.protocol_param_dict import ProtocolParameterDict
+from mi.core.instrument.protocol_param_dict import get_regex
 from mi.core.instrument.protocol_param_dict import ParameterDictVal
 from mi.core.common import InstErrorCode
 from mi.core.instrument.chunker import StringChunker
@@ -350,6 +351,7 @@ class SubMenues(BaseEnum):
     DUMMY         = 'dummy'
     
 class MultilineParameterDictVal(ParameterDictVal):
+    __slots__ = ('pattern', 'regex', 'f_getval')
     
     def __init__(self, name, pattern, f_getval, f_format, value=None,
                  visibility=ParameterDictVisibility.READ_WRITE,
@@ -374,23 +376,24 @@ class MultilineParameterDictVal(ParameterDictVal):
         value display when presented in a menu-based instrument
         @param value The parameter value (initializes to None).
         """
-        self.name = name
+        ParameterDictVal.__init__(self,
+                                  name,
+                                  f_format,
+                                  value=value,
+                                  visibility=visibility,
+                                  menu_path_read=menu_path_read,
+                                  submenu_read=submenu_read,
+                                  menu_path_write=menu_path_write,
+                                  submenu_write=submenu_write,
+                                  multi_match=multi_match,
+                                  direct_access=direct_access,
+                                  startup_param=startup_param,
+                                  default_value=default_value,
+                                  init_value=init_value)
+
         self.pattern = pattern
-        #log.debug('BinaryParameterDictVal.__int__(); pattern=%s' %pattern)
-        self.regex = re.compile(pattern, re.DOTALL)
+        self.regex = get_regex(pattern, re.DOTALL)
         self.f_getval = f_getval
-        self.f_format = f_format
-        self.value = value
-        self.menu_path_read = menu_path_read
-        self.submenu_read = submenu_read
-        self.menu_path_write = menu_path_write
-        self.submenu_write = submenu_write
-        self.visibility = visibility
-        self.multi_match = multi_match
-        self.direct_access = direct_access
-        self.startup_param = startup_param
-        self.default_value = default_value
-        self.init_value = init_value        
 
     def update(self, input):
         """
@@ -897,9 +900,6 @@ class mavs4InstrumentProtocol(MenuInstrumentProtocol):
         presented by this string
         @throw InstrumentProtocolExecption on timeout
         """
-        # Grab time for timeout and wait for prompt.
-
-        starttime = time.time()
         if expected_prompt == None:
             prompt_list = self._prompts.list()
         else:
@@ -908,16 +908,17 @@ class mavs4InstrumentProtocol(MenuInstrumentProtocol):
             else:
                 prompt_list = expected_prompt
 
-        while True:
-            for item in prompt_list:
-                if item in self._promptbuf:
-                    return (item, self._linebuf)
+        def find_prompt():
+            found = self._find_prompt(prompt_list)
+            if found is not None:
+                return (found[0], self._linebuf)
 
-            if time.time() > starttime + timeout:
-                log.debug("_get_response: promptbuf=%s (%s)" %(self._promptbuf, self._promptbuf.encode("hex")))
-                raise InstrumentTimeoutException("in InstrumentProtocol._get_response()")
+        response = self._wait_for_buffer(find_prompt, timeout)
+        if response is None:
+            log.debug("_get_response: promptbuf=%s (%s)" %(self._promptbuf, self._promptbuf.encode("hex")))
+            raise InstrumentTimeoutException("in InstrumentProtocol._get_response()")
 
-            time.sleep(.1)
+        return response
 
     def _navigate_and_execute(self, cmd, **kwargs):
         """
@@ -2449,10 +2450,10 @@ class mavs4InstrumentProtocol(MenuInstrumentProtocol):
             self._connection.send(INSTRUMENT_NEWLINE)
             time.sleep(delay)
             
-            for item in prompts:
-                if item in self._promptbuf:
-                    log.debug('_get_prompt got prompt: %s' % repr(item))
-                    return item
+            found = self._find_prompt(prompts)
+            if found is not None:
+                log.debug('_get_prompt got prompt: %s' % repr(found[0]))
+                return found[0]
 
             if time.time() > starttime + timeout:
                 raise InstrumentTimeoutException()
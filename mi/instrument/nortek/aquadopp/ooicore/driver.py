@@ -37,6 +37,7 @@ from mi.core.exceptions import InstrumentTimeoutException, \
 from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
 from mi.core.instrument.protocol_param_dict import ParameterDictVal
 from mi.core.instrument.protocol_param_dict import ProtocolParameterDict
+from mi.core.instrument.protocol_param_dict import get_regex
 from mi.core.instrument.chunker import StringChunker
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey, DataParticleValue, CommonDataParticleType
 
@@ -290,6 +291,7 @@ class Parameter(DriverParameter):
                    
     
 class BinaryParameterDictVal(ParameterDictVal):
+    __slots__ = ('pattern', 'regex', 'f_getval')
     
     def __init__(self, name, pattern, f_getval, f_format, value=None,
                  visibility=ParameterDictVisibility.READ_WRITE,
@@ -314,23 +316,24 @@ class BinaryParameterDictVal(ParameterDictVal):
         value display when presented in a menu-based instrument
         @param value The parameter value (initializes to None).
         """
-        self.name = name
+        ParameterDictVal.__init__(self,
+                                  name,
+                                  f_format,
+                                  value=value,
+                                  visibility=visibility,
+                                  menu_path_read=menu_path_read,
+                                  submenu_read=submenu_read,
+                                  menu_path_write=menu_path_write,
+                                  submenu_write=submenu_write,
+                                  multi_match=multi_match,
+                                  direct_access=direct_access,
+                                  startup_param=startup_param,
+                                  default_value=default_value,
+                                  init_value=init_value)
+
         self.pattern = pattern
-        #log.debug('BinaryParameterDictVal.__int__(); pattern=%s' %pattern)
-        self.regex = re.compile(pattern, re.DOTALL)
+        self.regex = get_regex(pattern, re.DOTALL)
         self.f_getval = f_getval
-        self.f_format = f_format
-        self.value = value
-        self.menu_path_read = menu_path_read
-        self.submenu_read = submenu_read
-        self.menu_path_write = menu_path_write
-        self.submenu_write = submenu_write
-        self.visibility = visibility
-        self.multi_match = multi_match
-        self.direct_access = direct_access
-        self.startup_param = startup_param
-        self.default_value = default_value
-        self.init_value = init_value
 
     def update(self, input, **kwargs):
         """
@@ -1068,22 +1071,22 @@ class Protocol(CommandResponseInstrumentProtocol):
         presented by this string
         @throw InstrumentProtocolExecption on timeout
         """
-        # Grab time for timeout and wait for prompt.
-        starttime = time.time()
-                
         if expected_prompt == None:
             prompt_list = self._prompts.list()
         else:
             assert isinstance(expected_prompt, str)
-            prompt_list = [expected_prompt]            
-        while True:
-            for item in prompt_list:
-                if item in self._promptbuf:
-                    return (item, self._linebuf)
-                else:
-                    time.sleep(.1)
-            if time.time() > starttime + timeout:
-                raise InstrumentTimeoutException()
+            prompt_list = [expected_prompt]
+
+        def find_prompt():
+            found = self._find_prompt(prompt_list)
+            if found is not None:
+                return (found[0], self._linebuf)
+
+        response = self._wait_for_buffer(find_prompt, timeout)
+        if response is None:
+            raise InstrumentTimeoutException()
+
+        return response
 
     def _do_cmd_resp(self, cmd, *args, **kwargs):
         """
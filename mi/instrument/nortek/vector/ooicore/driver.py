@@ -37,8 +37,12 @@ from mi.core.exceptions import InstrumentTimeoutException, \
 from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
 from mi.core.instrument.protocol_param_dict import ParameterDictVal
 from mi.core.instrument.protocol_param_dict import ProtocolParameterDict
-from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.protocol_param_dict import get_regex
+from mi.core.instrument.chunker import RingStringChunker
+from mi.core.instrument.chunker import SieveMatch
+from mi.core.instrument.chunker import IncrementalSieve
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey, DataParticleValue, CommonDataParticleType
+from mi.core.instrument.data_particle import DataParticleField, DataParticleSchema
 
 from mi.core.common import InstErrorCode
 
@@ -295,6 +299,7 @@ class Parameter(DriverParameter):
                    
     
 class BinaryParameterDictVal(ParameterDictVal):
+    __slots__ = ('pattern', 'regex', 'f_getval')
     
     def __init__(self, name, pattern, f_getval, f_format, value=None,
                  visibility=ParameterDictVisibility.READ_WRITE,
@@ -319,23 +324,24 @@ class BinaryParameterDictVal(ParameterDictVal):
         value display when presented in a menu-based instrument
         @param value The parameter value (initializes to None).
         """
-        self.name = name
+        ParameterDictVal.__init__(self,
+                                  name,
+                                  f_format,
+                                  value=value,
+                                  visibility=visibility,
+                                  menu_path_read=menu_path_read,
+                                  submenu_read=submenu_read,
+                                  menu_path_write=menu_path_write,
+                                  submenu_write=submenu_write,
+                                  multi_match=multi_match,
+                                  direct_access=direct_access,
+                                  startup_param=startup_param,
+                                  default_value=default_value,
+                                  init_value=init_value)
+
         self.pattern = pattern
-        #log.debug('BinaryParameterDictVal.__int__(); pattern=%s' %pattern)
-        self.regex = re.compile(pattern, re.DOTALL)
+        self.regex = get_regex(pattern, re.DOTALL)
         self.f_getval = f_getval
-        self.f_format = f_format
-        self.value = value
-        self.menu_path_read = menu_path_read
-        self.submenu_read = submenu_read
-        self.menu_path_write = menu_path_write
-        self.submenu_write = submenu_write
-        self.visibility = visibility
-        self.multi_match = multi_match
-        self.direct_access = direct_access
-        self.startup_param = startup_param
-        self.default_value = default_value
-        self.init_value = init_value
 
     def update(self, input, **kwargs):
         """
@@ -622,92 +628,31 @@ class VectorVelocityDataParticle(DataParticle):
     """
     Routine for parsing velocity data into a data particle structure for the Vector sensor. 
     """
+    __slots__ = ()
     _data_particle_type = DataParticleType.VELOCITY
 
-    def _build_parsed_values(self):
-        """
-        Take something in the velocity data sample format and parse it into
-        values with appropriate tags.
-        @throws SampleException If there is a problem with sample creation
-        """
-        match = VELOCITY_DATA_REGEX.match(self.raw_data)
-        
-        if not match:
-            raise SampleException("VectorVelocityDataParticle: No regex match of parsed sample data: [%s]", self.raw_data)
-        
-        analog_input2 = ord(match.group(1))
-        count = ord(match.group(2))
-        pressure = ord(match.group(3)) * 0x10000
-        analog_input2 += ord(match.group(4)) * 0x100
-        pressure += BinaryProtocolParameterDict.convert_word_to_int(match.group(5))
-        analog_input1 = BinaryProtocolParameterDict.convert_word_to_int(match.group(6))
-        velocity_beam1 = BinaryProtocolParameterDict.convert_word_to_int(match.group(7))
-        velocity_beam2 = BinaryProtocolParameterDict.convert_word_to_int(match.group(8))
-        velocity_beam3 = BinaryProtocolParameterDict.convert_word_to_int(match.group(9))
-        amplitude_beam1 = ord(match.group(10))
-        amplitude_beam2 = ord(match.group(11))
-        amplitude_beam3 = ord(match.group(12))
-        correlation_beam1 = ord(match.group(13))
-        correlation_beam2 = ord(match.group(14))
-        correlation_beam3 = ord(match.group(15))
-        
-        if None == analog_input2:
-            raise SampleException("No analog_input2 value parsed")
-        if None == count:
-            raise SampleException("No count value parsed")
-        if None == pressure:
-            raise SampleException("No pressure value parsed")
-        if None == analog_input1:
-            raise SampleException("No analog_input1 value parsed")
-        if None == velocity_beam1:
-            raise SampleException("No velocity_beam1 value parsed")
-        if None == velocity_beam2:
-            raise SampleException("No velocity_beam2 value parsed")
-        if None == velocity_beam3:
-            raise SampleException("No velocity_beam3 value parsed")
-        if None == amplitude_beam1:
-            raise SampleException("No amplitude_beam1 value parsed")
-        if None == amplitude_beam2:
-            raise SampleException("No amplitude_beam2 value parsed")
-        if None == amplitude_beam3:
-            raise SampleException("No amplitude_beam3 value parsed")
-        if None == correlation_beam1:
-            raise SampleException("No correlation_beam1 value parsed")
-        if None == correlation_beam2:
-            raise SampleException("No correlation_beam2 value parsed")
-        if None == correlation_beam3:
-            raise SampleException("No correlation_beam3 value parsed")
-        
-        result = [{DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.ANALOG_INPUT2,
-                   DataParticleKey.VALUE: analog_input2},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.COUNT,
-                   DataParticleKey.VALUE: count},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.PRESSURE,
-                   DataParticleKey.VALUE: pressure},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.ANALOG_INPUT1,
-                   DataParticleKey.VALUE: analog_input1},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.VELOCITY_BEAM1,
-                   DataParticleKey.VALUE: velocity_beam1},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.VELOCITY_BEAM2,
-                   DataParticleKey.VALUE: velocity_beam2},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.VELOCITY_BEAM3,
-                   DataParticleKey.VALUE: velocity_beam3},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.AMPLITUDE_BEAM1,
-                   DataParticleKey.VALUE: amplitude_beam1},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.AMPLITUDE_BEAM2,
-                   DataParticleKey.VALUE: amplitude_beam2},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.AMPLITUDE_BEAM3,
-                   DataParticleKey.VALUE: amplitude_beam3},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.CORRELATION_BEAM1,
-                   DataParticleKey.VALUE: correlation_beam1},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.CORRELATION_BEAM2,
-                   DataParticleKey.VALUE: correlation_beam2},
-                  {DataParticleKey.VALUE_ID: VectorVelocityDataParticleKey.CORRELATION_BEAM3,
-                   DataParticleKey.VALUE: correlation_beam3}]
- 
-        log.debug('VectorVelocityDataParticle: particle=%s' %result)
-        return result
-    
+    _schema = DataParticleSchema(VELOCITY_DATA_REGEX, [
+        DataParticleField(VectorVelocityDataParticleKey.ANALOG_INPUT2, (1, 4),
+                          lambda low, high: ord(low) + ord(high) * 0x100),
+        DataParticleField(VectorVelocityDataParticleKey.COUNT, 2, ord),
+        DataParticleField(VectorVelocityDataParticleKey.PRESSURE, (3, 5),
+                          lambda high, word: ord(high) * 0x10000 +
+                              BinaryProtocolParameterDict.convert_word_to_int(word)),
+        DataParticleField(VectorVelocityDataParticleKey.ANALOG_INPUT1, 6,
+                          BinaryProtocolParameterDict.convert_word_to_int),
+        DataParticleField(VectorVelocityDataParticleKey.VELOCITY_BEAM1, 7,
+                          BinaryProtocolParameterDict.convert_word_to_int),
+        DataParticleField(VectorVelocityDataParticleKey.VELOCITY_BEAM2, 8,
+                          BinaryProtocolParameterDict.convert_word_to_int),
+        DataParticleField(VectorVelocityDataParticleKey.VELOCITY_BEAM3, 9,
+                          BinaryProtocolParameterDict.convert_word_to_int),
+        DataParticleField(VectorVelocityDataParticleKey.AMPLITUDE_BEAM1, 10, ord),
+        DataParticleField(VectorVelocityDataParticleKey.AMPLITUDE_BEAM2, 11, ord),
+        DataParticleField(VectorVelocityDataParticleKey.AMPLITUDE_BEAM3, 12, ord),
+        DataParticleField(VectorVelocityDataParticleKey.CORRELATION_BEAM1, 13, ord),
+        DataParticleField(VectorVelocityDataParticleKey.CORRELATION_BEAM2, 14, ord),
+        DataParticleField(VectorVelocityDataParticleKey.CORRELATION_BEAM3, 15, ord)])
+
 class VectorVelocityHeaderDataParticleKey(BaseEnum):
     TIMESTAMP = "timestamp"
     NUMBER_OF_RECORDS = "number_of_records"
@@ -722,6 +667,7 @@ class VectorVelocityHeaderDataParticle(DataParticle):
     """
     Routine for parsing velocity header data into a data particle structure for the Vector sensor. 
     """
+    __slots__ = ()
     _data_particle_type = DataParticleType.VELOCITY_HEADER
 
     def _build_parsed_values(self):
@@ -730,7 +676,7 @@ class VectorVelocityHeaderDataParticle(DataParticle):
         values with appropriate tags.
         @throws SampleException If there is a problem with sample creation
         """
-        match = VELOCITY_HEADER_DATA_REGEX.match(self.raw_data)
+        match = self._match_raw_data(VELOCITY_HEADER_DATA_REGEX)
         
         if not match:
             raise SampleException("VectorVelocityHeaderDataParticle: No regex match of parsed sample data: [%s]", self.raw_data)
@@ -803,6 +749,7 @@ class VectorSystemDataParticle(DataParticle):
     """
     Routine for parsing system data into a data particle structure for the Vector sensor. 
     """
+    __slots__ = ()
     _data_particle_type = DataParticleType.SYSTEM
 
     def _build_parsed_values(self):
@@ -811,7 +758,7 @@ class VectorSystemDataParticle(DataParticle):
         values with appropriate tags.
         @throws SampleException If there is a problem with sample creation
         """
-        match = SYSTEM_DATA_REGEX.match(self.raw_data)
+        match = self._match_raw_data(SYSTEM_DATA_REGEX)
         
         if not match:
             raise SampleException("VectorSystemDataParticle: No regex match of parsed sample data: [%s]", self.raw_data)
@@ -890,6 +837,7 @@ class VectorProbeCheckDataParticle(DataParticle):
     """
     Routine for parsing probe check data into a data particle structure for the Vector sensor. 
     """
+    __slots__ = ()
     _data_particle_type = DataParticleType.PROBE_CHECK
     
     SAMPLES_PER_BEAM_OFFSET = 4
@@ -902,7 +850,7 @@ class VectorProbeCheckDataParticle(DataParticle):
         values with appropriate tags.
         @throws SampleException If there is a problem with sample creation
         """
-        match = PROBE_CHECK_DATA_REGEX.match(self.raw_data)
+        match = self._match_raw_data(PROBE_CHECK_DATA_REGEX)
         
         if not match:
             raise SampleException("VectorProbeCheckDataParticle: No regex match of parsed sample data: [%s]", self.raw_data)
@@ -941,6 +889,110 @@ class VectorProbeCheckDataParticle(DataParticle):
         log.debug('VectorProbeCheckDataParticle: particle=%s' %result)
         return result
             
+# particle class and regex for each sample structure, keyed by sync bytes
+sample_structure_matchers = {VELOCITY_DATA_SYNC_BYTES: (VectorVelocityDataParticle, VELOCITY_DATA_REGEX),
+                             SYSTEM_DATA_SYNC_BYTES: (VectorSystemDataParticle, SYSTEM_DATA_REGEX),
+                             VELOCITY_HEADER_DATA_SYNC_BYTES: (VectorVelocityHeaderDataParticle, VELOCITY_HEADER_DATA_REGEX),
+                             PROBE_CHECK_SYNC_BYTES: (VectorProbeCheckDataParticle, PROBE_CHECK_DATA_REGEX)}
+
+# Every sync pattern starts with this byte
+SYNC_BYTE = '\xa5'
+
+class SampleStructureSieve(IncrementalSieve):
+    """
+    Finds the sample structures in the data by their sync bytes, length and
+    checksum. Structures are found in order and the bytes inside one are not
+    searched again. Structures that haven't all arrived are checked again on
+    the next call, but the search carries on past them so a bogus size can't
+    hold up the structures behind it. Only the new bytes are searched until
+    one of them is settled. Each structure is tagged with a match for its
+    particle.
+    """
+    def scan(self, data, start, resume, state):
+        """
+        The state is the positions of the structures that haven't all arrived
+        and where the search stopped, relative to start.
+        """
+        pending = []
+        index = start
+        if state is not None:
+            (waiting, index) = state
+            index += start
+            for position in waiting:
+                position += start
+                if self._structure_at(data, position) is not None:
+                    # it has arrived or can't be one, search from there again
+                    index = position
+                    break
+                pending.append(position)
+
+        block_list = []
+        while True:
+            index = data.find(SYNC_BYTE, index)
+            if index < 0:
+                index = len(data)
+                break
+
+            structure = self._structure_at(data, index)
+            if structure is None:
+                # not enough data to tell yet
+                pending.append(index)
+                index += 1
+                continue
+            if not structure:
+                index += 1
+                continue
+
+            (structure_sync, structure_len) = structure
+            record = str(data[index:index+structure_len])
+            sent_checksum = BinaryProtocolParameterDict.convert_word_to_int(record[-2:])
+            if sent_checksum != BinaryProtocolParameterDict.calculate_checksum(record, structure_len):
+                index += 1
+                continue
+
+            (particle_class, regex) = sample_structure_matchers[structure_sync]
+            match = regex.match(record)
+            if match:
+                block_list.append((index - start, index + structure_len - start,
+                                   SieveMatch.from_match(particle_class, match)))
+            else:
+                block_list.append((index - start, index + structure_len - start))
+            index += structure_len
+
+        return (block_list, (tuple(p - start for p in pending), index - start))
+
+    @staticmethod
+    def _structure_at(data, index):
+        """
+        @retval (sync bytes, length) of the structure whose sync bytes are
+            at index and which has all arrived, None if that depends on data
+            not arrived yet, or () if no structure starts there
+        """
+        head = str(data[index:index+4])
+        pending = False
+        for (structure_sync, structure_len) in sample_structures:
+            if not head.startswith(structure_sync):
+                if structure_sync.startswith(head):
+                    pending = True
+                continue
+
+            if structure_sync == PROBE_CHECK_SYNC_BYTES:
+                # variable length structure, the size in words follows the sync bytes
+                if len(head) < 4:
+                    return None
+                structure_len = BinaryProtocolParameterDict.convert_word_to_int(head[2:4]) * 2
+                if structure_len < 4:
+                    return ()
+
+            if index + structure_len > len(data):
+                return None
+            return (structure_sync, structure_len)
+
+        if pending:
+            return None
+        return ()
+
+VECTOR_SIEVE = SampleStructureSieve()
 
 ###############################################################################
 # Protocol
@@ -1069,31 +1121,15 @@ class Protocol(CommandResponseInstrumentProtocol):
         self._build_param_dict()
 
         # create chunker for processing instrument samples.
-        self._chunker = StringChunker(Protocol.chunker_sieve_function)
+        self._chunker = RingStringChunker(VECTOR_SIEVE)
 
     @staticmethod
     def chunker_sieve_function(raw_data):
         """ The method that detects data sample structures from instrument
+        Structures are tagged with a match for their particle so the
+        particle doesn't have to match them again.
         """
-        return_list = []
-        
-        for structure_sync, structure_len in sample_structures:
-            start = raw_data.find(structure_sync)
-            if start != -1:    # found a sync pattern
-                if structure_sync == PROBE_CHECK_SYNC_BYTES:
-                    # must extract size of variable length structure
-                    if start+structure_len+1 <= len(raw_data):    # only extract the size if the first 4 bytes have arrived
-                        structure_len = BinaryProtocolParameterDict.convert_word_to_int(raw_data[start+structure_len:start+structure_len+2]) * 2
-                        log.debug('chunker_sieve_function: probe_check record size = %d' %structure_len)
-                if start+structure_len <= len(raw_data):    # only check the CRC if all of the structure has arrived
-                    calculated_checksum = BinaryProtocolParameterDict.calculate_checksum(raw_data[start:start+structure_len], structure_len)
-                    log.debug('chunker_sieve_function: calculated checksum = %s' % calculated_checksum)
-                    sent_checksum = BinaryProtocolParameterDict.convert_word_to_int(raw_data[start+structure_len-2:start+structure_len])
-                    if sent_checksum == calculated_checksum:
-                        return_list.append((start, start+structure_len))        
-                        log.debug("chunker_sieve_function: found %s", raw_data[start:start+structure_len].encode('hex'))
-                
-        return return_list
+        return VECTOR_SIEVE.scan(raw_data, 0, 0, None)[0]
     
     def _filter_capabilities(self, events):
         """
@@ -1154,22 +1190,22 @@ class Protocol(CommandResponseInstrumentProtocol):
         presented by this string
         @throw InstrumentProtocolExecption on timeout
         """
-        # Grab time for timeout and wait for prompt.
-        starttime = time.time()
-                
         if expected_prompt == None:
             prompt_list = self._prompts.list()
         else:
             assert isinstance(expected_prompt, str)
-            prompt_list = [expected_prompt]   
-        while True:
-            for item in prompt_list:
-                if item in self._promptbuf:
-                    return (item, self._linebuf)
-                else:
-                    time.sleep(.1)
-            if time.time() > starttime + timeout:
-                raise InstrumentTimeoutException()
+            prompt_list = [expected_prompt]
+
+        def find_prompt():
+            found = self._find_prompt(prompt_list)
+            if found is not None:
+                return (found[0], self._linebuf)
+
+        response = self._wait_for_buffer(find_prompt, timeout)
+        if response is None:
+            raise InstrumentTimeoutException()
+
+        return response
 
     def _do_cmd_resp(self, cmd, *args, **kwargs):
         """
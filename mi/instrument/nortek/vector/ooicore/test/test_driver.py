@@ -49,6 +49,7 @@ from mi.core.instrument.instrument_driver import DriverParameter
 
 from mi.core.instrument.data_particle import DataParticleKey, DataParticleValue
 from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.chunker import RingStringChunker
 
 from mi.core.exceptions import InstrumentParameterException
 from mi.core.exceptions import InstrumentStateException
@@ -60,6 +61,8 @@ from mi.instrument.nortek.vector.ooicore.driver import InstrumentPrompts
 from mi.instrument.nortek.vector.ooicore.driver import InstrumentCmds
 from mi.instrument.nortek.vector.ooicore.driver import Capability
 from mi.instrument.nortek.vector.ooicore.driver import Protocol
+from mi.instrument.nortek.vector.ooicore.driver import SampleStructureSieve
+from mi.instrument.nortek.vector.ooicore.driver import VECTOR_SIEVE
 from mi.instrument.nortek.vector.ooicore.driver import ProtocolState
 from mi.instrument.nortek.vector.ooicore.driver import ProtocolEvent
 from mi.instrument.nortek.vector.ooicore.driver import Parameter
@@ -580,8 +583,54 @@ class UnitFromIDK(InstrumentDriverUnitTestCase):
         """
         Tests the chunker
         """
-        chunker = StringChunker(Protocol.chunker_sieve_function)
+        self.assert_chunker_structures(StringChunker(Protocol.chunker_sieve_function))
 
+    def test_ring_chunker(self):
+        """
+        Tests the ring buffer chunker with the incremental sieve the driver uses
+        """
+        self.assert_chunker_structures(RingStringChunker(VECTOR_SIEVE))
+
+    def test_sieve_resume(self):
+        """
+        Verify the sieve only searches the new bytes while a structure waits
+        """
+        class CountingSieve(SampleStructureSieve):
+            def __init__(self):
+                self.positions = []
+
+            def _structure_at(self, data, index):
+                self.positions.append(index)
+                return SampleStructureSieve._structure_at(data, index)
+
+        sieve = CountingSieve()
+        chunker = RingStringChunker(sieve)
+
+        # a bogus size leaves its structure waiting on data that won't come
+        chunker.add_chunk('\xa5\x07\xff\x7f', self.get_ntp_timestamp())
+        offset = 4
+        noise = 'noise \xa5 '
+        for i in range(10):
+            sieve.positions = []
+            chunker.add_chunk(noise, self.get_ntp_timestamp())
+            # the waiting structure is checked again, anything else is new
+            self.assertEqual(sieve.positions, [0, offset + noise.index('\xa5')])
+            offset += len(noise)
+
+        (timestamp, result) = chunker.get_next_data()
+        self.assertEqual(result, None)
+
+        # but it doesn't hold up the structures behind it
+        chunker.add_chunk(velocity_sample(), self.get_ntp_timestamp())
+        (timestamp, result) = chunker.get_next_data()
+        self.assertEqual(result, velocity_sample())
+
+    def assert_chunker_structures(self, chunker):
+        """
+        Verify the chunker finds each data structure whole, in fragments,
+        combined and with noise
+        @param chunker: Chunker to use to do the parsing
+        """
         # test complete data structures
         self.assert_chunker_sample(chunker, velocity_sample())
         self.assert_chunker_sample(chunker, system_sample())
@@ -649,9 +649,6 @@ class InstrumentProtocol(CommandResponseInstrumentProtocol):
         presented by this string
         @throw InstrumentProtocolExecption on timeout
         """
-        # Grab time for timeout and wait for prompt.
-
-        starttime = time.time()
         if expected_prompt == None:
             prompt_list = self._prompts.list()
         else:
@@ -660,15 +657,16 @@ class InstrumentProtocol(CommandResponseInstrumentProtocol):
             else:
                 prompt_list = expected_prompt
 
-        while True:
-            for item in prompt_list:
-                if item in self._promptbuf:
-                    return (item, self._linebuf)
-                else:
-                    time.sleep(.1)
+        def find_prompt():
+            found = self._find_prompt(prompt_list)
+            if found is not None:
+                return (found[0], self._linebuf)
+
+        response = self._wait_for_buffer(find_prompt, timeout)
+        if response is None:
+            raise InstrumentTimeoutException("in InstrumentProtocol._get_response()")
 
-            if time.time() > starttime + timeout:
-                raise InstrumentTimeoutException("in InstrumentProtocol._get_response()")
+        return response
 
     def _do_cmd_resp(self, cmd, *args, **kwargs):
         """
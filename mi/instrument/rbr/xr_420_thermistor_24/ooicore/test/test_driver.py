@@ -36,7 +36,6 @@ import time
 import unittest
 import ntplib
 import datetime
-import json
 
 # 3rd party imports
 from nose.plugins.attrib import attr
@@ -345,7 +344,7 @@ class TestUNIT(InstrumentDriverUnitTestCase, UtilMixin):
         # Find all particles of the correct data particle types (not raw)
         particles = []
         for p in self._data_particle_received:
-            particle_dict = json.loads(p)
+            particle_dict = self.get_sample_value(p)
             stream_type = particle_dict.get('stream_name')
             self.assertIsNotNone(stream_type)
             if(stream_type == DataParticleType.ENGINEERING):
@@ -142,7 +142,7 @@ class ISUS3UnitTestCase(InstrumentDriverUnitTestCase):
             DHE: Need to pull the list out of here.  It's coming out as a
             string like it is.
             """
-            particle_dict = json.loads(sample_value)
+            particle_dict = self.get_sample_value(sample_value)
             stream_type = particle_dict['stream_name']
             if stream_type == 'raw':
                 self.raw_stream_received += 1
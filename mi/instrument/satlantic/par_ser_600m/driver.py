@@ -36,7 +36,8 @@ from mi.core.exceptions import InstrumentDataException
 from mi.core.exceptions import InstrumentParameterException
 from mi.core.exceptions import SampleException
 from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
-from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.chunker import RingStringChunker
+from mi.core.instrument.chunker import PatternSieve
 
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey, DataParticleValue
 
@@ -187,7 +188,7 @@ class SatlanticPARDataParticle(DataParticle):
         
         @throws SampleException If there is a problem with sample creation
         """
-        match = SAMPLE_REGEX.match(self.raw_data)
+        match = self._match_raw_data(SAMPLE_REGEX)
         
         if not match:
             raise SampleException("No regex match of parsed sample data: [%s]" %
@@ -218,6 +219,10 @@ class SatlanticPARDataParticle(DataParticle):
         
         return result
         
+# Sieve for samples and the startup header, compiled once
+PAR_SIEVE = PatternSieve([(SatlanticPARDataParticle, SAMPLE_PATTERN),
+                          (None, HEADER_PATTERN)])
+
 ####################################################################
 # Satlantic PAR Sensor Protocol
 ####################################################################
@@ -306,27 +311,13 @@ class SatlanticPARInstrumentProtocol(CommandResponseInstrumentProtocol):
                              lambda match : match.group(3), str,
                              visibility=ParameterDictVisibility.READ_ONLY)
 
-        self._chunker = StringChunker(SatlanticPARInstrumentProtocol.sieve_function)
+        self._chunker = RingStringChunker(PAR_SIEVE)
 
     @staticmethod
     def sieve_function(raw_data):
         """ The method that splits samples
         """
-        patterns = []
-        matchers = []
-        return_list = []
-
-        patterns.append(SAMPLE_PATTERN)
-        patterns.append(HEADER_PATTERN)
-
-        for pattern in patterns:
-            matchers.append(re.compile(pattern))
-
-        for matcher in matchers:
-            for match in matcher.finditer(raw_data):
-                return_list.append((match.start(), match.end()))
-
-        return return_list
+        return PAR_SIEVE(raw_data)
 
 
     def _filter_capabilities(self, events):
@@ -31,7 +31,8 @@ from mi.core.instrument.instrument_driver import ResourceAgentState
 from mi.core.instrument.instrument_driver import ResourceAgentEvent
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey, DataParticleValue, CommonDataParticleType
 from mi.core.instrument.protocol_param_dict import ParameterDictVal
-from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.chunker import RingStringChunker
+from mi.core.instrument.chunker import PatternSieve
 from mi.core.exceptions import InstrumentTimeoutException
 from mi.core.exceptions import InstrumentParameterException
 from mi.core.exceptions import SampleException
@@ -260,7 +261,7 @@ class SBE16DataParticle(SeaBirdParticle):
         
         @throws SampleException If there is a problem with sample creation
         """
-        match = SBE16DataParticle.regex_compiled().match(self.raw_data)
+        match = self._match_raw_data(SBE16DataParticle.regex_compiled())
 
         if not match:
             raise SampleException("No regex match of parsed sample data: [%s]" %
@@ -449,7 +450,7 @@ class SBE16StatusParticle(SeaBirdParticle):
         
         @throws SampleException If there is a problem with sample creation
         """
-        match = SBE16StatusParticle.regex_compiled().match(self.raw_data)
+        match = self._match_raw_data(SBE16StatusParticle.regex_compiled())
         
         if not match:
             raise SampleException("No regex match of parsed status data: [%s]" %
@@ -661,7 +662,7 @@ class SBE16CalibrationParticle(SeaBirdParticle):
         Parse the output of the dcal command
         @throws SampleException If there is a problem with sample creation
         """
-        match = SBE16CalibrationParticle.regex_compiled().match(self.raw_data)
+        match = self._match_raw_data(SBE16CalibrationParticle.regex_compiled())
 
         if not match:
             raise SampleException("No regex match of parsed status data: [%s]" %
@@ -710,6 +711,11 @@ class SBE16InstrumentDriver(SeaBirdInstrumentDriver):
         """
         self._protocol = SBE16Protocol(Prompt, NEWLINE, self._driver_event)
 
+# Sieve for every sample type the instrument emits, compiled once
+SBE16_SIEVE = PatternSieve([(SBE16DataParticle, SBE16DataParticle.regex_compiled()),
+                            (SBE16StatusParticle, SBE16StatusParticle.regex_compiled()),
+                            (SBE16CalibrationParticle, SBE16CalibrationParticle.regex_compiled())])
+
 ###############################################################################
 # Seabird Electronics 37-SMP MicroCAT protocol.
 ###############################################################################
@@ -799,7 +805,7 @@ class SBE16Protocol(SeaBirdProtocol):
         # State state machine in UNKNOWN state. 
         self._protocol_fsm.start(ProtocolState.UNKNOWN)
         
-        self._chunker = StringChunker(self.sieve_function)
+        self._chunker = RingStringChunker(SBE16_SIEVE)
 
         self._add_scheduler_event(ScheduledJob.ACQUIRE_STATUS, ProtocolEvent.ACQUIRE_STATUS)
         self._add_scheduler_event(ScheduledJob.CONFIGURATION_DATA, ProtocolEvent.GET_CONFIGURATION)
@@ -809,18 +815,7 @@ class SBE16Protocol(SeaBirdProtocol):
     def sieve_function(raw_data):
         """ The method that splits samples
         """
-        matchers = []
-        return_list = []
-
-        matchers.append(SBE16DataParticle.regex_compiled())
-        matchers.append(SBE16StatusParticle.regex_compiled())
-        matchers.append(SBE16CalibrationParticle.regex_compiled())
-
-        for matcher in matchers:
-            for match in matcher.finditer(raw_data):
-                return_list.append((match.start(), match.end()))
-
-        return return_list
+        return SBE16_SIEVE(raw_data)
 
     def _filter_capabilities(self, events):
         """
@@ -968,7 +963,13 @@ class SBE16Protocol(SeaBirdProtocol):
             if(key == Parameter.PUMP_MODE and val not in [0, 1, 2]):
                 raise InstrumentParameterException("pump mode out of range")
 
-        for (key, val) in params.iteritems():
+        # Only set the parameters that differ from the instrument's values.
+        writes = self._param_dict.plan_writes(params)
+        if not writes:
+            log.debug("parameters already set")
+            return
+
+        for (key, val) in writes:
             log.debug("KEY = %s VALUE = %s", key, val)
 
             if(key in ConfirmedParameter.list()):
@@ -1600,8 +1601,7 @@ class SBE16Protocol(SeaBirdProtocol):
         if prompt not in [Prompt.COMMAND, Prompt.EXECUTED]: 
             raise InstrumentProtocolException('dsdc command not recognized: %s.' % response)
 
-        for line in response.split(NEWLINE):
-            self._param_dict.update(line)
+        self._param_dict.update_lines(response, NEWLINE)
 
         return response
 
@@ -1615,8 +1615,7 @@ class SBE16Protocol(SeaBirdProtocol):
         if prompt not in [Prompt.COMMAND, Prompt.EXECUTED]:
             raise InstrumentProtocolException('dcal command not recognized: %s.' % response)
             
-        for line in response.split(NEWLINE):
-            self._param_dict.update(line)
+        self._param_dict.update_lines(response, NEWLINE)
 
         return response
         
@@ -28,7 +28,8 @@ from mi.core.instrument.instrument_driver import DriverProtocolState
 from mi.core.instrument.instrument_driver import DriverParameter
 from mi.core.instrument.protocol_param_dict import ParameterDictVisibility
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey, CommonDataParticleType
-from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.chunker import RingStringChunker
+from mi.core.instrument.chunker import PatternSieve
 from mi.core.exceptions import InstrumentParameterException
 from mi.core.exceptions import SampleException
 from mi.core.exceptions import InstrumentStateException
@@ -1037,6 +1038,15 @@ class SBE26PlusInstrumentDriver(SeaBirdInstrumentDriver):
         self._protocol = Protocol(Prompt, NEWLINE, self._driver_event)
 
 
+# Sieve for every sample type the instrument emits, compiled once. Wave
+# bursts are only searched again once their end marker could have arrived.
+SBE26PLUS_SIEVE = PatternSieve([(SBE26plusTideSampleDataParticle, TS_REGEX_MATCHER),
+                                (SBE26plusTideSampleDataParticle, TIDE_REGEX_MATCHER),
+                                (SBE26plusWaveBurstDataParticle, WAVE_REGEX_MATCHER),
+                                (SBE26plusStatisticsDataParticle, STATS_REGEX_MATCHER),
+                                (SBE26plusDeviceStatusDataParticle, DS_REGEX_MATCHER),
+                                (SBE26plusDeviceCalibrationDataParticle, DC_REGEX_MATCHER)])
+
 ###############################################################################
 # Protocol
 ###############################################################################
@@ -1124,7 +1134,7 @@ class Protocol(SeaBirdProtocol):
         # commands sent sent to device to be filtered in responses for telnet DA
         self._sent_cmds = []
 
-        self._chunker = StringChunker(Protocol.sieve_function)
+        self._chunker = RingStringChunker(SBE26PLUS_SIEVE)
 
         self._add_scheduler_event(ScheduledJob.ACQUIRE_STATUS, ProtocolEvent.ACQUIRE_STATUS)
         self._add_scheduler_event(ScheduledJob.CALIBRATION_COEFFICIENTS, ProtocolEvent.ACQUIRE_CONFIGURATION)
@@ -1136,20 +1146,7 @@ class Protocol(SeaBirdProtocol):
         Chunker sieve method to help the chunker identify chunks.
         @returns a list of chunks identified, if any.  The chunks are all the same type.
         """
-        sieve_matchers = [TS_REGEX_MATCHER,
-                          TIDE_REGEX_MATCHER,
-                          WAVE_REGEX_MATCHER,
-                          STATS_REGEX_MATCHER,
-                          DS_REGEX_MATCHER,
-                          DC_REGEX_MATCHER]
-
-        return_list = []
-
-        for matcher in sieve_matchers:
-            for match in matcher.finditer(raw_data):
-                return_list.append((match.start(), match.end()))
-
-        return return_list
+        return SBE26PLUS_SIEVE(raw_data)
 
     def _filter_capabilities(self, events):
         """
@@ -1399,13 +1396,28 @@ class Protocol(SeaBirdProtocol):
             raise InstrumentParameterException('Set command requires a parameter dict.')
 
         (set_params, ss_params) = self._split_params(**params)
+
+        # Only set the parameters that differ from the instrument's values.
+        # setsampling is one dialog, so if any of its parameters differ all
+        # the requested ones are sent. TXWAVESTATS answers a prompt that ends
+        # the dialog when it is missing, so its cached value fills the gap.
+        set_writes = self._param_dict.plan_writes(set_params)
+        if self._param_dict.plan_writes(ss_params):
+            if Parameter.TXWAVESTATS not in ss_params and \
+               self._param_dict.get(Parameter.TXWAVESTATS) is not None:
+                ss_params[Parameter.TXWAVESTATS] = self._param_dict.get(Parameter.TXWAVESTATS)
+        else:
+            ss_params = {}
+
+        if not set_writes and not ss_params:
+            return
+
         log.debug("SetSampling Params: %s" % ss_params)
-        log.debug("General Set Params: %s" % set_params)
+        log.debug("General Set Params: %s" % set_writes)
 
-        if set_params != {}:
-            for (key, val) in set_params.iteritems():
-                log.debug("KEY = " + str(key) + " VALUE = " + str(val))
-                result = self._do_cmd_resp(InstrumentCmds.SET, key, val, **kwargs)
+        for (key, val) in set_writes:
+            log.debug("KEY = " + str(key) + " VALUE = " + str(val))
+            result = self._do_cmd_resp(InstrumentCmds.SET, key, val, **kwargs)
 
         if ss_params != {}:
             # ONLY do next if a param for it is present
@@ -2496,9 +2508,8 @@ class Protocol(SeaBirdProtocol):
         if prompt != Prompt.COMMAND:
             raise InstrumentProtocolException('ds command not recognized: %s.' % response)
 
-        for line in response.split(NEWLINE):
-            hit_count = self._param_dict.multi_match_update(line)
-            log.debug(str(hit_count) + "_parse_ds_response -- " + line )
+        changed = self._param_dict.update_lines(response, NEWLINE, multi_match=True)
+        log.debug("_parse_ds_response changed: %s", changed)
 
         # return the Ds as text
         match = DS_REGEX_MATCHER.search(response)
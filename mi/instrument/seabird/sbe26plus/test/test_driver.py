@@ -437,6 +437,51 @@ class SeaBird26PlusUnitTest(SeaBirdUnitTest, SeaBird26PlusMixin):
         # Verify "BOGUS_CAPABILITY was filtered out
         self.assertEquals(driver_capabilities, protocol._filter_capabilities(test_capabilities))
 
+    def test_set_params(self):
+        """
+        Verify only parameters that differ from the cached ds are set, and
+        that setsampling always answers the TXWAVESTATS prompt.
+        """
+        protocol = Protocol(Prompt, NEWLINE, Mock())
+        protocol._param_dict.update_lines(SAMPLE_DEVICE_STATUS, NEWLINE, multi_match=True)
+        protocol._do_cmd_resp = Mock()
+        protocol._update_params = Mock()
+
+        # Nothing differs, nothing is sent
+        protocol._set_params({Parameter.TXWAVESTATS: True,
+                              Parameter.NUM_WAVE_SAMPLES_PER_BURST_FOR_WAVE_STASTICS: 512,
+                              Parameter.TXREALTIME: True})
+        self.assertFalse(protocol._do_cmd_resp.called)
+        self.assertFalse(protocol._update_params.called)
+
+        # Unchanged setsampling parameters are still sent with the changed ones
+        protocol._set_params({Parameter.TXWAVESTATS: True,
+                              Parameter.NUM_WAVE_SAMPLES_PER_BURST_FOR_WAVE_STASTICS: 1024})
+        protocol._do_cmd_resp.assert_called_once_with(
+            InstrumentCmds.SETSAMPLING,
+            {Parameter.TXWAVESTATS: True,
+             Parameter.NUM_WAVE_SAMPLES_PER_BURST_FOR_WAVE_STASTICS: 1024},
+            expected_prompt=", new value = ")
+
+        # The cached TXWAVESTATS is sent when it isn't set
+        protocol._do_cmd_resp.reset_mock()
+        protocol._set_params({Parameter.NUM_WAVE_SAMPLES_PER_BURST_FOR_WAVE_STASTICS: 1024,
+                              Parameter.TXREALTIME: True,
+                              Parameter.USER_INFO: 'test'})
+        self.assertEqual(protocol._do_cmd_resp.call_args_list,
+                         [((InstrumentCmds.SET, Parameter.USER_INFO, 'test'), {}),
+                          ((InstrumentCmds.SETSAMPLING,
+                            {Parameter.TXWAVESTATS: True,
+                             Parameter.NUM_WAVE_SAMPLES_PER_BURST_FOR_WAVE_STASTICS: 1024}),
+                           {'expected_prompt': ", new value = "})])
+        self.assertFalse(protocol._update_params.called)
+
+        # Only plain set parameters, read back with ds
+        protocol._do_cmd_resp.reset_mock()
+        protocol._set_params({Parameter.TXREALTIME: False})
+        protocol._do_cmd_resp.assert_called_once_with(InstrumentCmds.SET, Parameter.TXREALTIME, False)
+        self.assertTrue(protocol._update_params.called)
+
 
     def test_driver_parameters(self):
         """
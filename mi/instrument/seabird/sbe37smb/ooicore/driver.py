@@ -32,10 +32,11 @@ from mi.core.instrument.instrument_driver import DriverParameter
 from mi.core.instrument.instrument_driver import ResourceAgentState
 from mi.core.instrument.instrument_driver import ResourceAgentEvent
 from mi.core.instrument.data_particle import DataParticle, DataParticleKey, CommonDataParticleType
-from mi.core.instrument.chunker import StringChunker
+from mi.core.instrument.data_particle import DataParticleField, DataParticleSchema
+from mi.core.instrument.chunker import RingStringChunker
+from mi.core.instrument.chunker import PatternSieve
 from mi.core.exceptions import InstrumentTimeoutException
 from mi.core.exceptions import InstrumentParameterException
-from mi.core.exceptions import SampleException
 from mi.core.exceptions import InstrumentStateException
 from mi.core.exceptions import InstrumentProtocolException
 from mi.core.log import get_logger
@@ -246,38 +247,14 @@ class SBE37DataParticle(DataParticle):
     Routines for parsing raw data into a data particle structure. Override
     the building of values, and the rest should come along for free.
     """
+    __slots__ = ()
     _data_particle_type = DataParticleType.PARSED
 
-    def _build_parsed_values(self):
-        """
-        Take something in the autosample/TS format and split it into
-        C, T, and D values (with appropriate tags)
-        
-        @throws SampleException If there is a problem with sample creation
-        """
-        match = SAMPLE_PATTERN_MATCHER.match(self.raw_data)
-        
-        if not match:
-            raise SampleException("No regex match of parsed sample data: [%s]" %
-                                  self.raw_data)
-            
-        try:
-            temperature = float(match.group(1))
-            conductivity = float(match.group(2))
-            depth = float(match.group(3))
-        except ValueError:
-            raise SampleException("ValueError while decoding floats in data: [%s]" %
-                                  self.raw_data)
-        
-        #TODO:  Get 'temp', 'cond', and 'depth' from a paramdict
-        result = [{DataParticleKey.VALUE_ID: SBE37DataParticleKey.TEMP,
-                   DataParticleKey.VALUE: temperature},
-                  {DataParticleKey.VALUE_ID: SBE37DataParticleKey.CONDUCTIVITY,
-                   DataParticleKey.VALUE: conductivity},
-                  {DataParticleKey.VALUE_ID: SBE37DataParticleKey.DEPTH,
-                    DataParticleKey.VALUE: depth}]
-        
-        return result
+    # C, T, and D values of something in the autosample/TS format
+    _schema = DataParticleSchema(SAMPLE_PATTERN_MATCHER, [
+        DataParticleField(SBE37DataParticleKey.TEMP, 1, float),
+        DataParticleField(SBE37DataParticleKey.CONDUCTIVITY, 2, float),
+        DataParticleField(SBE37DataParticleKey.DEPTH, 3, float)])
 
 ##
 ## BEFORE ADDITION
@@ -652,6 +629,11 @@ class SBE37DeviceStatusParticle(DataParticle):
 ## AFTER ADDITION
 ##
 
+# Sieve for every sample type the instrument emits, compiled once
+SBE37_SIEVE = PatternSieve([(SBE37DataParticle, SAMPLE_PATTERN_MATCHER),
+                            (SBE37DeviceStatusParticle, STATUS_DATA_REGEX_MATCHER),
+                            (SBE37DeviceCalibrationParticle, CALIBRATION_DATA_REGEX_MATCHER)])
+
 ###############################################################################
 # Seabird Electronics 37-SMP MicroCAT protocol.
 ###############################################################################
@@ -747,7 +729,7 @@ class SBE37Protocol(CommandResponseInstrumentProtocol):
         # commands sent sent to device to be filtered in responses for telnet DA
         self._sent_cmds = []
 
-        self._chunker = StringChunker(self.sieve_function)
+        self._chunker = RingStringChunker(SBE37_SIEVE)
 
 
     @staticmethod
@@ -756,17 +738,8 @@ class SBE37Protocol(CommandResponseInstrumentProtocol):
         Chunker sieve method to help the chunker identify chunks.
         @returns a list of chunks identified, if any.  The chunks are all the same type.
         """
-        sieve_matchers = [SAMPLE_PATTERN_MATCHER,
-                          STATUS_DATA_REGEX_MATCHER,
-                          CALIBRATION_DATA_REGEX_MATCHER]
-
-        return_list = []
-
-        for matcher in sieve_matchers:
-            for match in matcher.finditer(raw_data):
-                return_list.append((match.start(), match.end()))
+        return SBE37_SIEVE(raw_data)
 
-        return return_list
     def _filter_capabilities(self, events):
         """
         """ 
@@ -879,13 +852,16 @@ class SBE37Protocol(CommandResponseInstrumentProtocol):
         if not isinstance(params, dict):
             raise InstrumentParameterException('Set parameters not a dict.')
 
-        # For each key, val in the dict, issue set command to device.
+        # For each key, val in the dict that differs from the instrument's
+        # value, issue set command to device.
         # Raise if the command not understood.
         else:
 
-            for (key, val) in params.iteritems():
+            writes = self._param_dict.plan_writes(params)
+            for (key, val) in writes:
                 result = self._do_cmd_resp(InstrumentCmds.SET, key, val, **kwargs)
-            self._update_params()
+            if writes:
+                self._update_params()
 
         return (next_state, result)
 
@@ -1207,18 +1183,17 @@ class SBE37Protocol(CommandResponseInstrumentProtocol):
         @throws InstrumentTimeoutException if device cannot be timely woken.
         @throws InstrumentProtocolException if ds/dc misunderstood.
         """
-        # Get old param dict config.
-        old_config = self._param_dict.get_config()
+        # Get old param dict version.
+        version = self._param_dict.get_current_version()
 
         # Issue display commands and parse results.
         timeout = kwargs.get('timeout', SBE37_TIMEOUT)
         self._do_cmd_resp(InstrumentCmds.DISPLAY_STATUS,timeout=timeout)
         self._do_cmd_resp(InstrumentCmds.DISPLAY_CALIBRATION,timeout=timeout)
 
-        # Get new param dict config. If it differs from the old config,
-        # tell driver superclass to publish a config change event.
-        new_config = self._param_dict.get_config()
-        if new_config != old_config:
+        # If any parameter changed since, tell driver superclass to publish
+        # a config change event.
+        if self._param_dict.get_changes_since(version):
             self._driver_event(DriverAsyncEvent.CONFIG_CHANGE)
 
     def _build_simple_command(self, cmd):
@@ -1269,8 +1244,7 @@ class SBE37Protocol(CommandResponseInstrumentProtocol):
         if prompt.strip() != SBE37Prompt.COMMAND:
             raise InstrumentProtocolException('dsdc command not recognized: %s.' % response)
 
-        for line in response.split(NEWLINE):
-            self._param_dict.update(line)
+        self._param_dict.update_lines(response, NEWLINE)
 
     def _parse_ts_response(self, response, prompt):
         """
@@ -1961,7 +1961,12 @@ class Protocol(SeaBirdProtocol):
                 if key in readonly:
                     raise InstrumentParameterException("Attempt to set read only parameter (%s)" % key)
 
-        for (key, val) in params.iteritems():
+        # Only set the parameters that differ from the instrument's values.
+        writes = self._param_dict.plan_writes(params)
+        if not writes:
+            return
+
+        for (key, val) in writes:
             log.debug("KEY = " + str(key) + " VALUE = " + str(val))
             result = self._do_cmd_resp(InstrumentCmds.SET, key, val, **kwargs)
 
@@ -2090,14 +2095,12 @@ class Protocol(SeaBirdProtocol):
 
         log.debug("Run status command: %s" % InstrumentCmds.GET_STATUS_DATA)
         response = self._do_cmd_resp(InstrumentCmds.GET_STATUS_DATA, timeout=timeout)
-        for line in response.split(NEWLINE):
-            self._param_dict.update(line)
+        self._param_dict.update_lines(response, NEWLINE)
         log.debug("status command response: %s" % response)
 
         log.debug("Run configure command: %s" % InstrumentCmds.GET_CONFIGURATION_DATA)
         response = self._do_cmd_resp(InstrumentCmds.GET_CONFIGURATION_DATA, timeout=timeout)
-        for line in response.split(NEWLINE):
-            self._param_dict.update(line)
+        self._param_dict.update_lines(response, NEWLINE)
         log.debug("configure command response: %s" % response)
 
         # Get new param dict config. If it differs from the old config,
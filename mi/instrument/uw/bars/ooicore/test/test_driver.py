@@ -137,7 +137,7 @@ class UnitFromIDK(InstrumentDriverUnitTestCase):
         print str(event)
         if event_type == DriverAsyncEvent.SAMPLE:
             sample_value = event['value']
-	    particle_dict = json.loads(sample_value)
+	    particle_dict = self.get_sample_value(sample_value)
 	    stream_type = particle_dict['stream_name']	    
             if stream_type == 'raw':
                 self.raw_stream_received = True